@@ -1,30 +1,122 @@
 # IMPORTACIONES Y CONFIGURACIÓN INICIAL
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify
-import requests
+from flask import Flask, Response, g, render_template, request, jsonify
+import hmac
 import os
 import sys
+import threading
+import time
 
 # Configuración
 from config.settings import (
     TEMPLATE_FOLDER, STATIC_FOLDER, 
-    OCR_API_KEY, OCR_API_URL,
+    OCR_API_KEY,
     FLASK_ENV, FLASK_DEBUG, BERT_MODEL_PATH,
-    MODEL_INFO
+    MODEL_INFO, PREDICT_BATCH_MAX_ITEMS, ANALYZE_URLS_MAX_ITEMS, PRELOAD_MODEL, METRICS_ARTIFACT_PATH,
+    PROFILING_ADMIN_TOKEN, STATS_STREAM_MAX_CLIENTS, STATS_STREAM_HEARTBEAT_SECONDS
 )
 
 # Utilidades modularizadas
-from utils.models.model_manager import get_truth_lens_model, get_news_extractor
-from utils.file_extractors import extract_text_from_file
-from utils.response_helpers import create_debug_info, create_standard_response, create_error_response
+from utils.models.model_manager import (
+    get_model_pool_stats, get_prediction_cache, get_predictor, preload_models
+)
+from utils.models.evaluation import load_model_info
+from utils.analysis import analyze_text, analyze_document, analyze_url, analyze_urls, analyze_image
+from utils.jobs import get_job_manager, JobQueueFull
+from utils.admission import Overloaded, admission, get_admission_controller
+from utils.profiling import get_profiler
+from utils.metrics import (
+    current_timings, get_metrics_registry, stage, start_timings, stop_timings, timings_ms
+)
+from utils.response_helpers import create_standard_response, create_error_response, create_overload_response
 from utils.models.update_stats import (
-    cargar_stats, guardar_stats, registrar_analisis
+    get_stats_store, registrar_analisis_lote
 )
+from utils.stats_snapshot import get_stats_snapshot
+from utils.fetch_cache import get_fetch_cache
 
 
 # CONFIGURACIÓN DE LA APLICACIÓN FLASK
 app = Flask(__name__, template_folder=TEMPLATE_FOLDER, static_folder=STATIC_FOLDER)
 
+# Métricas medidas por `python -m utils.models.evaluation` (se actualiza en el sitio para
+# que todos los módulos que importaron MODEL_INFO vean los mismos valores)
+MODEL_INFO.update(load_model_info(METRICS_ARTIFACT_PATH))
+
+# Precarga opcional: con `gunicorn --preload` ocurre una sola vez en el proceso maestro
+# y los workers comparten los pesos copy-on-write. En modo debug, el proceso padre del
+# reloader no sirve tráfico, así que solo precarga el proceso hijo.
+_is_reloader_parent = __name__ == "__main__" and FLASK_DEBUG and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+if PRELOAD_MODEL and not _is_reloader_parent:
+    preload_models()
+
+# Cada cliente de /stats/stream ocupa un hilo del servidor mientras está conectado
+_stream_slots = threading.BoundedSemaphore(STATS_STREAM_MAX_CLIENTS)
+
+# MÉTRICAS POR ETAPA: cada petición acumula sus tiempos en un diccionario propio
+@app.before_request
+def begin_request_timings():
+    if get_metrics_registry() is not None:
+        g.metrics_token = start_timings()
+        g.metrics_start = time.perf_counter()
+
+@app.after_request
+def record_request_timings(response):
+    registry = get_metrics_registry()
+    if registry is not None and 'metrics_start' in g and request.url_rule is not None:
+        registry.record(request.url_rule.rule, response.status_code,
+                        time.perf_counter() - g.metrics_start, current_timings())
+    return response
+
+@app.teardown_request
+def end_request_timings(exc):
+    token = g.pop('metrics_token', None)
+    if token is not None:
+        stop_timings(token)
+
+# PERFILADO POR MUESTREO: los hooks solo existen con PROFILING_ENABLED (coste cero si no)
+profiler = get_profiler()
+if profiler is not None:
+    @app.before_request
+    def begin_profiling():
+        if profiler.should_profile():
+            profiler.begin(request.url_rule.rule if request.url_rule is not None else request.path)
+            g.profiling = True
+
+    @app.teardown_request
+    def end_profiling(exc):
+        if g.pop('profiling', False):
+            profiler.end()
+
+def respond(result):
+    """Convierte una tupla (cuerpo, código HTTP[, cabeceras]) en respuesta Flask"""
+    body, *status_and_headers = result
+    # Con ?timings=1, los tiempos por etapa hasta ahora (la serialización aún no) van en debug_info
+    if request.args.get('timings', '').lower() in ('1', 'true') and isinstance(body.get('debug_info'), dict):
+        body['debug_info']['timings_ms'] = timings_ms()
+    with stage("serialization"):
+        return (jsonify(body), *status_and_headers)
+
+def dispatch(job_type, func, *args):
+    """
+    Ejecuta un análisis en la petición o, con ?async=1, como trabajo en segundo plano
+
+    En modo asíncrono responde 202 con el id del trabajo; el resultado se obtiene
+    en /jobs/<id>/result con el mismo cuerpo y código que la ruta síncrona.
+    """
+    if request.args.get('async', '').lower() not in ('1', 'true'):
+        return respond(func(*args))
+
+    try:
+        job_id = get_job_manager().submit(job_type, func, *args)
+    except JobQueueFull as e:
+        return respond(create_error_response(f"Servicio ocupado: {str(e)}", 503))
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}",
+        "result_url": f"/jobs/{job_id}/result"
+    }), 202
+
 # RUTAS PRINCIPALES
 @app.route("/")
 def index():
@@ -34,284 +126,297 @@ def index():
 @app.route("/predict", methods=["POST"])
 def predict():
     """Endpoint para predecir si una noticia es falsa o real usando BERT"""
-    text = ""
-    title = ""
-    content = None  # Inicializar para evitar errores
-
     # 1) Si viene un archivo (multipart/form-data)
     if 'file' in request.files:
         f = request.files['file']
-        filename = (f.filename or '').lower()
-        content = f.read()
+        with stage("upload_read"):
+            content = f.read()
 
         if not content:
-            return jsonify(*create_error_response("Archivo vacío", 400))
-
-        text, error = extract_text_from_file(filename, content)
-        if error:
-            return jsonify(*create_error_response(error, 400))
-            
-        # Para archivos: usar las primeras líneas como título, resto como contenido
-        lines = text.split('\n')
-        # Buscar la primera línea significativa como título
-        title = ""
-        content_lines = []
-        
-        for line in lines:
-            line_clean = line.strip()
-            if not title and line_clean and len(line_clean) > 10:
-                title = line_clean[:100]  # Limitar título a 100 chars
-            elif title:  # Ya tenemos título, el resto es contenido
-                content_lines.append(line_clean)
-        
-        text = '\n'.join(content_lines)
-        
-        # Si no se encontró título adecuado, usar el nombre del archivo
-        if not title:
-            title = f"Documento: {f.filename or 'archivo'}"
-
-    else:
-        # 2) Si no hay archivo, intentar JSON {'text': '...', 'title': '...'}
-        payload = request.get_json(silent=True) or {}
-        text = payload.get("text", "")
-        title = payload.get("title", "")
-        # Si el usuario no proporciona título, analizamos solo el contenido; Esto evita la duplicación y es más transparente
-            
-    # Validación
-    combined_text = f"{title} {text}".strip()
-    if not combined_text or len(combined_text) < 5:
-        return jsonify(*create_error_response("No se encontró texto suficiente para analizar", 400))
-
-    # Realizar predicción con BERT usando título y contenido separados
+            return respond(create_error_response("Archivo vacío", 400))
+
+        return dispatch("document", analyze_document, f.filename or '', content)
+
+    # 2) Si no hay archivo, intentar JSON {'text': '...', 'title': '...'}
+    payload = request.get_json(silent=True) or {}
+    text = payload.get("text", "")
+    title = payload.get("title", "")
+    # Si el usuario no proporciona título, analizamos solo el contenido; Esto evita la duplicación y es más transparente
+    return dispatch("text", analyze_text, title, text)
+
+@app.route("/predict_batch", methods=["POST"])
+def predict_batch():
+    """Endpoint para predecir muchas noticias en una sola llamada: JSON [{'title', 'text'}, ...]"""
+    payload = request.get_json(silent=True)
+    items = payload.get("items") if isinstance(payload, dict) else payload
+
+    if not isinstance(items, list) or not items:
+        return respond(create_error_response("Se requiere un arreglo JSON de objetos {title, text}", 400))
+
+    if len(items) > PREDICT_BATCH_MAX_ITEMS:
+        return respond(create_error_response(f"Máximo {PREDICT_BATCH_MAX_ITEMS} elementos por llamada", 413))
+
+    # Validación por elemento: los inválidos reciben su error sin pasar por BERT
+    results = [None] * len(items)
+    valid_indices = []
+    valid_items = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[i] = {"error": "Elemento inválido, se esperaba un objeto {title, text}"}
+            continue
+        title = str(item.get("title") or "")
+        text = str(item.get("text") or "")
+        if len(f"{title} {text}".strip()) < 5:
+            results[i] = {"error": "No se encontró texto suficiente para analizar"}
+            continue
+        valid_indices.append(i)
+        valid_items.append({"title": title, "text": text})
+
     try:
-        result = get_truth_lens_model().predict(title, text)
-        # Determinar si la predicción es fake
-        es_fake = (result.get('prediction', '').lower() == 'fake')
-        # No hay ground truth, así que asumimos correcto si el modelo predice con alta confianza (>0.8)
-        es_correcto = result.get('confidence', 0) > 0.8
-        registrar_analisis(es_fake, es_correcto)
-        # Determinar el tipo de entrada para debug
-        is_file_upload = 'file' in request.files
-        extraction_method = "Archivo subido" if is_file_upload else "Texto Manual"
-        file_info = ""
-        if is_file_upload and content:
-            f = request.files['file']
-            file_size_mb = len(content) / (1024 * 1024)  # Usar content ya leído
-            file_info = f"Archivo: {f.filename or 'sin_nombre'} ({file_size_mb:.2f} MB)"
-        
-        response = create_standard_response(result) # Crear respuesta usando funciones auxiliares
-        response["debug_info"] = create_debug_info(
-            result, 
-            title=title, 
-            text=text, 
-            extraction_method=extraction_method,
-            file_info=file_info
-        )
-        response["extracted_preview"] = (combined_text[:180] + '...') if combined_text else None
-        
-        return jsonify(response)
+        started = time.perf_counter()
+        with admission(len(valid_items)):
+            predictions = get_predictor().predict_batch(valid_items)
+        with stage("registrar_analisis"):
+            registrar_analisis_lote(
+                (
+                    (result.get('prediction', '').lower() == 'fake', result.get('confidence', 0) > 0.8,
+                     result.get('confidence'), len(item['title']) + len(item['text']) + 1)
+                    for item, result in zip(valid_items, predictions) if result.get('prediction') != 'Error'
+                ),
+                route="batch",
+                latency_ms=(time.perf_counter() - started) * 1000 / max(1, len(valid_items))
+            )
+        for i, result in zip(valid_indices, predictions):
+            results[i] = create_standard_response(result)
+
+        with stage("serialization"):
+            return jsonify({"count": len(results), "results": results})
+    except Overloaded as e:
+        return respond(create_overload_response(e))
     except Exception as e:
-        return jsonify(*create_error_response(f"Error en predicción BERT: {str(e)}", 500))
+        return respond(create_error_response(f"Error en predicción BERT: {str(e)}", 500))
 
 @app.route("/analyze_url", methods=["POST"])
-def analyze_url():
+def analyze_url_route():
     """Endpoint para analizar una noticia desde una URL"""
     payload = request.get_json(silent=True) or {}
     url = payload.get("url", "").strip()
     
     if not url:
-        return jsonify(*create_error_response("Se requiere una URL válida", 400))
+        return respond(create_error_response("Se requiere una URL válida", 400))
     
     # Validar formato básico de URL
     if not (url.startswith('http://') or url.startswith('https://')):
         url = 'https://' + url
     
-    try:
-        # Extraer contenido usando el scraper
-        article_data = get_news_extractor().extract_content(url)
-        
-        if not article_data:
-            return jsonify(*create_error_response("No se pudo extraer el contenido de la URL", 400))
-        
-        # Obtener los componentes de la noticia
-        title = article_data.get('title', '')
-        content = article_data.get('content', '')
-        description = article_data.get('description', '')
-        author = article_data.get('author', '')
-        publish_date = article_data.get('publish_date', '')
-        
-        # Verificar que hay contenido suficiente para analizar
-        if not any([title, content, description]) or len(title + content + description) < 20:
-            return jsonify(*create_error_response("No se encontró contenido suficiente para analizar en la URL", 400))
-        
-        # 🎯 OPTIMIZACIÓN PARA BERT: Limitar contenido a 400-500 caracteres
-        # Priorizar: título completo + descripción + primeros párrafos del contenido
-        
-        # Calcular límites inteligentes
-        title_length = len(title)
-        description_length = len(description)
-        
-        # Reservar espacio para título y descripción (son más importantes)
-        reserved_space = title_length + description_length
-        available_for_content = max(200, 500 - reserved_space)  # Mínimo 200 chars para contenido
-        
-        # Truncar contenido inteligentemente (por párrafos)
-        content_truncated = content
-        truncation_applied = False
-        
-        if len(content) > available_for_content:
-            # Intentar cortar por párrafos primero
-            paragraphs = content.split('\n\n')
-            truncated_content = ""
-            
-            for paragraph in paragraphs:
-                if len(truncated_content + paragraph) <= available_for_content:
-                    truncated_content += paragraph + "\n\n"
-                else:
-                    # Si el párrafo completo no cabe, tomar solo parte
-                    remaining_space = available_for_content - len(truncated_content)
-                    if remaining_space > 50:  # Solo si queda espacio significativo
-                        truncated_content += paragraph[:remaining_space] + "..."
-                    break
-            
-            content_truncated = truncated_content.strip()
-            truncation_applied = True
-        
-        # Realizar análisis con contenido optimizado usando BERT directamente
-        result = get_truth_lens_model().predict(title, content_truncated + " " + description)
-        es_fake = (result.get('prediction', '').lower() == 'fake')
-        es_correcto = result.get('confidence', 0) > 0.8
-        registrar_analisis(es_fake, es_correcto)
-        
-        if not result or result.get('prediction') == 'Error':
-            return jsonify(*create_error_response("No se pudo analizar el contenido extraído", 400))
-        
-        # Crear preview del contenido extraído
-        preview_parts = []
-        if title: preview_parts.append(f"Título: {title[:100]}...")
-        if description: preview_parts.append(f"Descripción: {description[:100]}...")
-        if content_truncated: preview_parts.append(f"Contenido: {content_truncated[:200]}...")
-        
-        extracted_preview = " | ".join(preview_parts)
+    return dispatch("url", analyze_url, url)
 
-        # Guardar el artículo completo en un archivo para referencia futura
-        get_news_extractor().save_to_file(article_data)
-        
-        response = create_standard_response(result) # Crear respuesta usando funciones auxiliares
-        response.update({
-            "url": url,
-            "article_data": {
-                "title": title,
-                "author": author,
-                "publish_date": publish_date,
-                "description": description,
-                "content_length": len(content),
-                "content_truncated_length": len(content_truncated),
-                "truncation_applied": truncation_applied,
-                "images_count": len(article_data.get('images', []))
-            },
-            "model_info": {
-                **MODEL_INFO,
-                "content_optimization": "Contenido limitado a 400-500 chars para BERT" if truncation_applied else "Contenido original usado"
-            },
-            "extracted_preview": extracted_preview
-        })
-        
-        # Agregar debug_info con campos específicos para URL
-        response["debug_info"] = create_debug_info(
-            result,
-            title=title,
-            text=content_truncated,
-            extraction_method="URL Scraping",
-            # Campos específicos para análisis de URL
-            original_content_length=len(content),
-            truncated_content_length=len(content_truncated),
-            truncation_applied=truncation_applied,
-            optimization_applied="Smart truncation by paragraphs" if truncation_applied else "No truncation needed"
-        )
-        
-        return jsonify(response)
-        
-    except requests.RequestException as e:
-        return jsonify(*create_error_response(f"Error al acceder a la URL: {str(e)}", 502))
-    except Exception as e:
-        return jsonify(*create_error_response(f"Error al procesar la noticia: {str(e)}", 500))
+@app.route("/analyze_urls", methods=["POST"])
+def analyze_urls_route():
+    """Endpoint para analizar varias noticias desde URLs: JSON {'urls': [...]} o [...]"""
+    payload = request.get_json(silent=True)
+    urls = payload.get("urls") if isinstance(payload, dict) else payload
+
+    if not isinstance(urls, list) or not urls or not all(isinstance(url, str) and url.strip() for url in urls):
+        return respond(create_error_response("Se requiere un arreglo JSON de URLs", 400))
+
+    if len(urls) > ANALYZE_URLS_MAX_ITEMS:
+        return respond(create_error_response(f"Máximo {ANALYZE_URLS_MAX_ITEMS} URLs por llamada", 413))
+
+    urls = [url.strip() for url in urls]
+    urls = [url if url.startswith(('http://', 'https://')) else 'https://' + url for url in urls]
+
+    return dispatch("url", analyze_urls, urls)
 
 @app.route("/ocr_predict", methods=["POST"])
 def ocr_predict():
     """Endpoint para procesar imágenes con OCR y predecir"""
     if 'image' not in request.files:
-        return jsonify(*create_error_response("No se encontró la imagen", 400))
+        return respond(create_error_response("No se encontró la imagen", 400))
         
     f = request.files['image']
-    content = f.read()
+    with stage("upload_read"):
+        content = f.read()
     
     if not content:
-        return jsonify(*create_error_response("Imagen vacía", 400))
+        return respond(create_error_response("Imagen vacía", 400))
 
-    # Procesar con OCR
-    try:
-        ocr = requests.post(OCR_API_URL, 
-                           files={'file': (f.filename or 'image.jpg', content)},
-                           data={'apikey': OCR_API_KEY, 
-                                 'language': 'spa', 
-                                 'isOverlayRequired': False}, 
-                           timeout=30)
-    except requests.RequestException as e:
-        return jsonify(*create_error_response(f"Fallo OCR: {str(e)}", 502))
-        
-    if ocr.status_code != 200:
-        return jsonify(*create_error_response(f"OCR.space devolvió {ocr.status_code}", 502))
-        
-    data = ocr.json()
-    results = data.get('ParsedResults') or []
-    text = (results[0].get('ParsedText') or '').strip() if results else ''
-    
-    if not text:
-        return jsonify(*create_error_response("No se detectó texto en la imagen", 400))
+    return dispatch("ocr", analyze_image, f.filename or '', content)
 
-    # Realizar predicción con BERT
-    try:
-        result = get_truth_lens_model().predict(text, "")
-        es_fake = (result.get('prediction', '').lower() == 'fake')
-        es_correcto = result.get('confidence', 0) > 0.8
-        registrar_analisis(es_fake, es_correcto)
-        
-        # Crear respuesta usando funciones auxiliares
-        response = create_standard_response(result)
-        response.update({
-            "text": text,
-            "extracted_preview": (text[:180] + '...') if len(text) > 180 else text
-        })
-        
-        # Agregar debug_info específico para OCR
-        response["debug_info"] = create_debug_info(
-            result,
-            title="",  # OCR no tiene título separado
-            text=text,
-            extraction_method="OCR"
-        )
-        
-        return jsonify(response)
-    except Exception as e:
-        return jsonify(*create_error_response(f"Error en predicción BERT: {str(e)}", 500))
+# TRABAJOS ASÍNCRONOS
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Estado de un trabajo enviado con ?async=1"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return respond(create_error_response("Trabajo no encontrado o expirado", 404))
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Resultado de un trabajo: la misma respuesta que la ruta síncrona, o 202 si no ha terminado"""
+    found = get_job_manager().result(job_id)
+    if found is None:
+        return respond(create_error_response("Trabajo no encontrado o expirado", 404))
+    job, result = found
+    if result is None:
+        return jsonify(job), 202
+    return respond(result)
+
+@app.route('/jobs/stats', methods=['GET'])
+def jobs_stats():
+    """Trabajos por tipo y estado"""
+    return jsonify(get_job_manager().stats())
 
 # Ruta principal con stats
 @app.route('/stats', methods=['GET'])
 def get_stats():
-    caller = request.args.get('caller', 'unknown')
-    
-    print(f"Fetching stats for /stats endpoint... Caller: {caller}")
-    """Endpoint para obtener estadísticas en formato JSON"""
-    stats = cargar_stats()
-    hoy = datetime.now().strftime('%Y-%m-%d')
+    """Endpoint para obtener estadísticas en formato JSON (304 si no cambiaron desde el ETag del cliente)"""
+    body, etag, _ = get_stats_snapshot().get()
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/stats/stream', methods=['GET'])
+def stats_stream():
+    """Server-Sent Events: un evento 'stats' con el mismo JSON que /stats cada vez que cambia"""
+    # Con workers síncronos (gunicorn -k sync) cada conexión bloquearía un worker entero
+    if not request.environ.get('wsgi.multithread'):
+        return respond(create_error_response(
+            "/stats/stream requiere workers con hilos o asíncronos (gunicorn -k gthread)", 503
+        ))
+    if not _stream_slots.acquire(blocking=False):
+        return respond(create_error_response("Demasiadas conexiones a /stats/stream", 503))
+    try:
+        snapshot = get_stats_snapshot()
+        last_seen = request.headers.get('Last-Event-ID')
+
+        def events():
+            body, etag, version = snapshot.get()
+            if etag != last_seen:
+                yield f"id: {etag}\nevent: stats\ndata: {body}\n\n"
+            while True:
+                new_body, new_etag, new_version = snapshot.wait_for_change(version, STATS_STREAM_HEARTBEAT_SECONDS)
+                if new_version == version:
+                    # Comentario de latido: mantiene vivos los proxies y detecta clientes desconectados
+                    yield ": ping\n\n"
+                    continue
+                version = new_version
+                if new_etag != etag:
+                    etag = new_etag
+                    yield f"id: {etag}\nevent: stats\ndata: {new_body}\n\n"
+
+        response = Response(events(), mimetype="text/event-stream")
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'  # nginx: no acumular el stream
+        # El servidor WSGI llama a close() aunque el cuerpo no llegue a iterarse: el hueco se libera siempre
+        response.call_on_close(_stream_slots.release)
+        return response
+    except Exception:
+        _stream_slots.release()
+        raise
+
+@app.route('/stats/history', methods=['GET'])
+def stats_history():
+    """Agregados por hora o día: ?granularity=daily|hourly&start=&end=&route=&group_by=bucket,route"""
+    store = get_stats_store()
+    if store is None:
+        return respond(create_error_response("Histórico no disponible con STATS_BACKEND=json", 404))
+    granularity = request.args.get('granularity', 'daily')
+    if granularity not in ('daily', 'hourly'):
+        return respond(create_error_response("granularity debe ser 'daily' u 'hourly'", 400))
+    group_by = tuple(column.strip() for column in request.args.get('group_by', 'bucket').split(',') if column.strip())
     return jsonify({
-        'total_analisis': stats.get('total_analisis', 0),
-        'analisis_hoy': stats.get('analisis_diarios', {}).get(hoy, 0),
-        'total_fakes': stats.get('total_fakes', 0),
-        'fakes_hoy': stats.get('fakes_diarios', {}).get(hoy, 0)
+        "granularity": granularity,
+        "rows": store.rollups(granularity, request.args.get('start'), request.args.get('end'),
+                              request.args.get('route'), group_by)
     })
 
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Endpoint con los contadores de aciertos/fallos de la caché de predicciones"""
+    cache = get_prediction_cache()
+    if cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **cache.stats()})
+
+@app.route('/fetch_cache/stats', methods=['GET'])
+def get_fetch_cache_stats():
+    """Endpoint con el tamaño y los aciertos de la caché de páginas descargadas"""
+    cache = get_fetch_cache()
+    if cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **cache.stats()})
+
+@app.route('/admission/stats', methods=['GET'])
+def admission_stats():
+    """Endpoint con la profundidad de la cola de inferencia y los rechazos (señales de autoescalado)"""
+    controller = get_admission_controller()
+    if controller is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **controller.stats()})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Histogramas de duración por ruta y por etapa en formato de texto de Prometheus"""
+    registry = get_metrics_registry()
+    if registry is None:
+        return respond(create_error_response("Métricas desactivadas (METRICS_ENABLED=False)", 404))
+    return Response(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+# ADMINISTRACIÓN DEL PERFILADOR (requiere PROFILING_ENABLED y la cabecera X-Admin-Token)
+def profiler_or_error():
+    """Devuelve (perfilador, None) o (None, respuesta de error)"""
+    if profiler is None:
+        return None, respond(create_error_response("Perfilado desactivado (PROFILING_ENABLED=False)", 404))
+    token = request.headers.get('X-Admin-Token', '')
+    if not PROFILING_ADMIN_TOKEN or not hmac.compare_digest(token, PROFILING_ADMIN_TOKEN):
+        return None, respond(create_error_response("No autorizado", 403))
+    return profiler, None
+
+@app.route('/admin/profile', methods=['GET'])
+def profile_export():
+    """Pilas acumuladas: ?format=collapsed (por defecto), speedscope o stats"""
+    active, error = profiler_or_error()
+    if error:
+        return error
+    export_format = request.args.get('format', 'collapsed')
+    if export_format == 'speedscope':
+        response = jsonify(active.export_speedscope())
+        response.headers['Content-Disposition'] = 'attachment; filename=truthlens.speedscope.json'
+        return response
+    if export_format == 'stats':
+        return jsonify(active.stats())
+    return Response(active.export_collapsed(), content_type="text/plain; charset=utf-8")
+
+@app.route('/admin/profile/start', methods=['POST'])
+def profile_start():
+    """Perfila todas las peticiones durante {'seconds': N} (por defecto 60)"""
+    active, error = profiler_or_error()
+    if error:
+        return error
+    payload = request.get_json(silent=True) or {}
+    try:
+        seconds = active.start_window(payload.get('seconds', 60))
+    except (TypeError, ValueError):
+        return respond(create_error_response("'seconds' debe ser un número", 400))
+    return jsonify({"profiling_seconds": seconds, **active.stats()})
+
+@app.route('/admin/profile/reset', methods=['POST'])
+def profile_reset():
+    """Descarta las pilas acumuladas"""
+    active, error = profiler_or_error()
+    if error:
+        return error
+    active.reset()
+    return jsonify(active.stats())
+
+@app.route('/model_pool/stats', methods=['GET'])
+def model_pool_stats():
+    """Endpoint con la ocupación del pool de réplicas del modelo"""
+    return jsonify(get_model_pool_stats())
+
 # EJECUCIÓN PRINCIPAL
 if __name__ == "__main__":
     # Evitar mensajes duplicados en el reloader de Flask
@@ -324,6 +429,7 @@ if __name__ == "__main__":
         print(f"🐛 Debug: {FLASK_DEBUG}")
         print(f"🤖 Modelo BERT: {BERT_MODEL_PATH}")
         print(f"🔍 OCR API: {'Configurado' if OCR_API_KEY else 'No configurado'}")
-        print("⚡ Lazy loading habilitado - El modelo se cargará al primer uso")
+        if not PRELOAD_MODEL:
+            print("⚡ Lazy loading habilitado - El modelo se cargará al primer uso")
     
     app.run(debug=FLASK_DEBUG)
\ No newline at end of file
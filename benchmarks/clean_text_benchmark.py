@@ -0,0 +1,71 @@
+"""
+Micro-benchmark de la normalización de texto (utils.text_cleaning.clean_text)
+
+Compara la implementación original (cuatro re.sub sin compilar sobre todo el
+texto) con la versión precompilada/fusionada, completa y acotada al
+presupuesto de tokens, sobre entradas de distintos tamaños.
+"""
+import argparse
+import re
+import time
+
+from utils.text_cleaning import clean_text
+
+SAMPLE_PARAGRAPH = (
+    "El presidente anunció hoy nuevas medidas económicas durante una conferencia en la capital. "
+    "Según fuentes oficiales (https://www.gob.mx/comunicado?id=2019), el paquete incluye *NUMBER* "
+    "millones para infraestructura. @usuario_123 compartió la noticia con #ÚltimaHora y más de "
+    "5,000 reacciones; los analistas señalan que aún no está claro cómo se financiará el plan.\n\n"
+)
+
+
+def legacy_clean_text(text):
+    """Implementación original de TruthLensBERT.clean_text"""
+    if not text:
+        return ""
+    text = re.sub(r'http\S+|www\S+|https\S+', '', text)
+    text = re.sub(r'@\w+|#\w+', '', text)
+    text = re.sub(r'[^a-zA-ZáéíóúÁÉÍÓÚñÑüÜ\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def _time_call(func, text, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(sizes_kb, max_words, repeat):
+    print(f"{'Entrada':>10} | {'original':>10} | {'completa':>10} | {'acotada':>10} | {'aceleración':>11}")
+    print("-" * 64)
+    for size_kb in sizes_kb:
+        text = SAMPLE_PARAGRAPH * max(1, (size_kb * 1024) // len(SAMPLE_PARAGRAPH))
+
+        # La versión completa debe ser idéntica; la acotada, un prefijo por palabras completas
+        expected = legacy_clean_text(text)
+        assert clean_text(text) == expected
+        bounded = clean_text(text, max_words=max_words)
+        assert expected.startswith(bounded) and len(bounded.split()) >= min(max_words, len(expected.split()))
+
+        legacy_ms = _time_call(legacy_clean_text, text, repeat)
+        full_ms = _time_call(clean_text, text, repeat)
+        bounded_ms = _time_call(lambda t: clean_text(t, max_words=max_words), text, repeat)
+        print(f"{size_kb:>8}KB | {legacy_ms:>8.2f}ms | {full_ms:>8.2f}ms | {bounded_ms:>8.2f}ms | "
+              f"{legacy_ms / bounded_ms:>10.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark de clean_text')
+    parser.add_argument('--sizes', default='1,16,256,4096', help='Tamaños de entrada en KB, separados por comas')
+    parser.add_argument('--max-words', type=int, default=512, help='Presupuesto de palabras (max_length del modelo)')
+    parser.add_argument('--repeat', type=int, default=5, help='Repeticiones por medición (se toma la mejor)')
+    args = parser.parse_args()
+
+    run([int(s) for s in args.sizes.split(',') if s.strip()], args.max_words, args.repeat)
+
+if __name__ == "__main__":
+    main()
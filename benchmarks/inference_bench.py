@@ -0,0 +1,253 @@
+"""
+Benchmark de inferencia de TruthLensBERT por longitud, tamaño de lote, hilos y backend/precisión
+
+Cada combinación de backend y precisión se ejecuta en un subproceso propio para
+que el pico de RSS medido sea solo el suyo. Las entradas son muestras reales de
+data/development.xlsx y src/static/examples.json recortadas a cada longitud.
+
+Uso:
+    python -m benchmarks.inference_bench --output bench.json
+    python -m benchmarks.inference_bench --baseline bench_base.json   # marca regresiones (exit 1)
+    python -m benchmarks.inference_bench --configs torch:fp32,torch:int8,onnx:fp32 --threads 1,4
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+EXAMPLES_PATH = os.path.join("src", "static", "examples.json")
+
+
+def load_samples(dev_path, limit=64):
+    """Textos reales (titular + contenido) del dataset de desarrollo y de los ejemplos de la interfaz"""
+    from utils.datasets import load_labeled_dataset
+
+    samples = [(item['title'], item['text']) for item in load_labeled_dataset(dev_path, limit=limit)]
+    try:
+        with open(EXAMPLES_PATH, "r", encoding="utf-8") as f:
+            examples = json.load(f)
+        for group in examples.values():
+            samples.extend((example.get('title', ''), example.get('content', '')) for example in group)
+    except (OSError, ValueError):
+        pass
+    return samples
+
+
+def truncate_to_tokens(model, samples, length):
+    """
+    Recorta cada muestra a `length` tokens (incluidos [CLS]/[SEP])
+
+    Devuelve textos ya combinados para pasarlos como contenido con titular vacío,
+    de modo que predict no vuelva a duplicar el titular.
+    """
+    body = length - model.tokenizer.num_special_tokens_to_add(pair=False)
+    texts = []
+    for headline, text in samples:
+        ids = model.tokenizer(model.build_input(headline, text), add_special_tokens=False)["input_ids"]
+        if len(ids) >= body:
+            texts.append(model.tokenizer.decode(ids[:body]))
+    return texts
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_config(backend, precision, lengths, batch_sizes, threads_list, iterations, warmup, dev_path):
+    """Mide todas las combinaciones de un backend/precisión dentro del proceso actual"""
+    import torch
+    from config.settings import (
+        BERT_MODEL_PATH, BERT_MAX_LENGTH, BERT_PADDING_MODE, BERT_LENGTH_BUCKETS, ONNX_CACHE_DIR
+    )
+    from utils.models.backends import OnnxBackend
+    from utils.models.truthlens_bert import TruthLensBERT
+    from utils.process_metrics import memory_usage_mb
+
+    model = TruthLensBERT(
+        BERT_MODEL_PATH, max_length=BERT_MAX_LENGTH, padding_mode=BERT_PADDING_MODE,
+        length_buckets=BERT_LENGTH_BUCKETS, backend=backend, onnx_cache_dir=ONNX_CACHE_DIR,
+        precision=precision
+    )
+    samples = load_samples(dev_path)
+    results = []
+
+    for length in lengths:
+        if length > model.max_length:
+            continue
+        texts = truncate_to_tokens(model, samples, length)
+        if not texts:
+            print(f"⚠️ Ninguna muestra alcanza {length} tokens", file=sys.stderr)
+            continue
+
+        for threads in threads_list:
+            torch.set_num_threads(threads)
+            if backend == "onnx":
+                # ONNX Runtime fija sus hilos al crear la sesión; el grafo ya está en caché
+                model.backend = OnnxBackend(BERT_MODEL_PATH, ONNX_CACHE_DIR, None, intra_op_threads=threads)
+            for batch_size in batch_sizes:
+                def call(i):
+                    batch = [("", texts[(i * batch_size + j) % len(texts)], 0.7) for j in range(batch_size)]
+                    if batch_size == 1:
+                        return model.predict(*batch[0])
+                    return model.predict_many(batch)
+
+                for i in range(warmup):
+                    call(i)
+                latencies = []
+                for i in range(iterations):
+                    start = time.perf_counter()
+                    call(i)
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+                ordered = sorted(latencies)
+                results.append({
+                    'backend': backend,
+                    'precision': model.precision,
+                    'threads': threads,
+                    'length': length,
+                    'batch_size': batch_size,
+                    'iterations': iterations,
+                    'p50_ms': percentile(ordered, 0.50),
+                    'p95_ms': percentile(ordered, 0.95),
+                    'p99_ms': percentile(ordered, 0.99),
+                    'throughput_items_s': batch_size * iterations / (sum(latencies) / 1000),
+                })
+
+    peak_rss = memory_usage_mb().get('peak_rss')
+    for result in results:
+        result['peak_rss_mb'] = peak_rss
+    return {'model_version': model.model_version, 'results': results}
+
+
+def result_key(result):
+    return (result['backend'], result['precision'], result['threads'], result['length'], result['batch_size'])
+
+
+def compare(current, baseline, tolerance):
+    """
+    Regresiones frente a la línea base (p95 más lento o throughput menor que la tolerancia)
+
+    Returns:
+        list: Un diccionario por combinación que empeora
+    """
+    previous = {result_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        p95_change = result['p95_ms'] / old['p95_ms'] - 1
+        throughput_change = result['throughput_items_s'] / old['throughput_items_s'] - 1
+        if p95_change > tolerance or throughput_change < -tolerance:
+            regressions.append({
+                'key': dict(zip(('backend', 'precision', 'threads', 'length', 'batch_size'), result_key(result))),
+                'p95_ms': [old['p95_ms'], result['p95_ms']],
+                'throughput_items_s': [old['throughput_items_s'], result['throughput_items_s']],
+                'p95_change': p95_change,
+                'throughput_change': throughput_change
+            })
+    return regressions
+
+
+def _csv_ints(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def main():
+    from config.settings import DEV_DATA_PATH
+
+    parser = argparse.ArgumentParser(description='Benchmark de inferencia de TruthLensBERT')
+    parser.add_argument('--configs', default='torch:fp32,torch:int8,torch:bf16,onnx:fp32',
+                        help='Pares backend:precisión separados por comas (se omiten los no disponibles)')
+    parser.add_argument('--lengths', default='64,128,256,512', help='Longitudes en tokens')
+    parser.add_argument('--batch-sizes', default='1,8', help='Peticiones por llamada (1 = predict)')
+    parser.add_argument('--threads', default=str(os.cpu_count() or 1), help='Hilos de torch a probar')
+    parser.add_argument('--iterations', type=int, default=30, help='Llamadas medidas por combinación')
+    parser.add_argument('--warmup', type=int, default=3, help='Llamadas de calentamiento por combinación')
+    parser.add_argument('--dev-data', default=DEV_DATA_PATH, help='Dataset de muestras (xlsx)')
+    parser.add_argument('--output', help='Archivo JSON de resultados (por defecto, salida estándar)')
+    parser.add_argument('--baseline', help='Resultados previos con los que comparar')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Empeoramiento relativo tolerado')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    lengths, batch_sizes, threads = _csv_ints(args.lengths), _csv_ints(args.batch_sizes), _csv_ints(args.threads)
+
+    if args.worker:
+        backend, precision = args.worker.split(':')
+        report = run_config(backend, precision, lengths, batch_sizes, threads,
+                            args.iterations, args.warmup, args.dev_data)
+        print(json.dumps(report))
+        return
+
+    from utils.models.precision import bf16_supported
+
+    # El proceso principal solo orquesta: basta con saber si los subprocesos podrán importarlo
+    onnx_available = importlib.util.find_spec("onnxruntime") is not None
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec="seconds"),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'model_version': None,
+        'results': []
+    }
+    for config in (c.strip() for c in args.configs.split(',') if c.strip()):
+        backend, precision = config.split(':')
+        if backend == "onnx" and not onnx_available:
+            print(f"⏭️ {config}: onnxruntime no está instalado", file=sys.stderr)
+            continue
+        if precision == "bf16" and not bf16_supported():
+            print(f"⏭️ {config}: la CPU no soporta bf16", file=sys.stderr)
+            continue
+
+        print(f"⏱️ {config}...", file=sys.stderr)
+        command = [sys.executable, "-m", "benchmarks.inference_bench", "--worker", config,
+                   "--lengths", args.lengths, "--batch-sizes", args.batch_sizes, "--threads", args.threads,
+                   "--iterations", str(args.iterations), "--warmup", str(args.warmup),
+                   "--dev-data", args.dev_data]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"❌ {config} falló:\n{completed.stderr[-2000:]}", file=sys.stderr)
+            continue
+        # Los mensajes de carga del modelo van por stdout: el JSON es la última línea
+        worker_report = json.loads(completed.stdout.strip().splitlines()[-1])
+        report['model_version'] = report['model_version'] or worker_report['model_version']
+        report['results'].extend(worker_report['results'])
+
+    for r in report['results']:
+        print(f"   {r['backend']}:{r['precision']:<5} t={r['threads']:<2} len={r['length']:<4} b={r['batch_size']:<3} "
+              f"p50 {r['p50_ms']:8.1f} ms | p95 {r['p95_ms']:8.1f} ms | p99 {r['p99_ms']:8.1f} ms | "
+              f"{r['throughput_items_s']:8.1f} items/s | RSS {r['peak_rss_mb'] or 0:7.0f} MB", file=sys.stderr)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report['regressions'] = compare(report, baseline, args.tolerance)
+        for regression in report['regressions']:
+            key = regression['key']
+            print(f"🔴 Regresión {key['backend']}:{key['precision']} t={key['threads']} len={key['length']} "
+                  f"b={key['batch_size']}: p95 {regression['p95_change']:+.1%}, "
+                  f"throughput {regression['throughput_change']:+.1%}", file=sys.stderr)
+        if report['regressions']:
+            exit_code = 1
+        else:
+            print(f"✅ Sin regresiones frente a {args.baseline} (tolerancia {args.tolerance:.0%})", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
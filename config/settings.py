@@ -9,6 +9,108 @@ load_dotenv() # Cargar variables de entorno desde .env
 
 # CONFIGURACIÓN DEL MODELO BERT
 BERT_MODEL_PATH = os.getenv("BERT_MODEL_PATH", os.path.join("models", "truthlens_bert_model"))
+BERT_MAX_LENGTH = int(os.getenv("BERT_MAX_LENGTH", "512"))
+# "dynamic": rellena solo hasta el bucket más cercano a la longitud real; "max_length": siempre hasta BERT_MAX_LENGTH
+BERT_PADDING_MODE = os.getenv("BERT_PADDING_MODE", "dynamic")
+BERT_LENGTH_BUCKETS = [int(b) for b in os.getenv("BERT_LENGTH_BUCKETS", "64,128,256,384,512").split(",") if b.strip()]
+# Motor de inferencia: "torch" (PyTorch eager) u "onnx" (ONNX Runtime con optimizaciones de grafo)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", os.path.join("models", "onnx_cache"))
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+# Precisión del backend torch en CPU: "fp32", "int8" (cuantización dinámica de Linear) o "bf16"
+MODEL_PRECISION = os.getenv("MODEL_PRECISION", "fp32")
+# Medir accuracy/latencia frente a fp32 sobre DEV_DATA_PATH al cargar un modelo de precisión reducida
+PRECISION_EVAL_ON_LOAD = os.getenv("PRECISION_EVAL_ON_LOAD", "False").lower() == "true"
+PRECISION_EVAL_SAMPLES = int(os.getenv("PRECISION_EVAL_SAMPLES", "100"))
+# Salida temprana: cabezas ligeras en capas intermedias (python -m utils.models.early_exit train)
+EARLY_EXIT_ENABLED = os.getenv("EARLY_EXIT_ENABLED", "False").lower() == "true"
+EARLY_EXIT_HEADS_PATH = os.getenv("EARLY_EXIT_HEADS_PATH", os.path.join("models", "early_exit_heads.pt"))
+# Diferencia de probabilidades para salir antes (0.5 = límite de confianza HIGH de la calibración)
+EARLY_EXIT_THRESHOLD = float(os.getenv("EARLY_EXIT_THRESHOLD", "0.5"))
+# Cargar y calentar el modelo al arrancar (compatible con servidores pre-fork como gunicorn --preload)
+PRELOAD_MODEL = os.getenv("PRELOAD_MODEL", "False").lower() == "true"
+
+# CONFIGURACIÓN DEL POOL DE RÉPLICAS (concurrencia y hilos intra-op de torch)
+MODEL_POOL_SIZE = int(os.getenv("MODEL_POOL_SIZE", "1"))
+# 0 = núcleos disponibles / MODEL_POOL_SIZE
+MODEL_THREADS_PER_REPLICA = int(os.getenv("MODEL_THREADS_PER_REPLICA", "0"))
+MODEL_POOL_TIMEOUT = float(os.getenv("MODEL_POOL_TIMEOUT", "30"))
+
+# CONFIGURACIÓN DE MICRO-LOTES (agrupa peticiones concurrentes en un solo forward pass)
+BATCHING_ENABLED = os.getenv("BATCHING_ENABLED", "True").lower() == "true"
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+# CONFIGURACIÓN DE CONTROL DE ADMISIÓN (503 + Retry-After cuando la inferencia está saturada)
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "True").lower() == "true"
+# Peticiones en inferencia a la vez (0 = MODEL_POOL_SIZE * BATCH_MAX_SIZE con micro-lotes, o MODEL_POOL_SIZE)
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", "0"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+ADMISSION_DEADLINE_SECONDS = float(os.getenv("ADMISSION_DEADLINE_SECONDS", "10"))
+
+# CONFIGURACIÓN DE CACHÉ DE PREDICCIONES (clave: texto normalizado + versión del modelo)
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "True").lower() == "true"
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+# Ruta SQLite del nivel persistente; vacío = solo memoria
+CACHE_DISK_PATH = os.getenv("CACHE_DISK_PATH", "")
+CACHE_DISK_MAX_ENTRIES = int(os.getenv("CACHE_DISK_MAX_ENTRIES", "100000"))
+
+# CONFIGURACIÓN DE CASCADA (prefiltro lineal que solo escala a BERT dentro de la banda de duda)
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "False").lower() == "true"
+CASCADE_MODEL_PATH = os.getenv("CASCADE_MODEL_PATH", os.path.join("models", "cascade_prefilter.npz"))
+CASCADE_LOW = float(os.getenv("CASCADE_LOW", "0.3"))
+CASCADE_HIGH = float(os.getenv("CASCADE_HIGH", "0.7"))
+
+# CONFIGURACIÓN DE PREDICCIÓN POR LOTES (/predict_batch)
+PREDICT_BATCH_SIZE = int(os.getenv("PREDICT_BATCH_SIZE", "32"))
+PREDICT_BATCH_MAX_ITEMS = int(os.getenv("PREDICT_BATCH_MAX_ITEMS", "5000"))
+
+# CONFIGURACIÓN DE DOCUMENTOS LARGOS (ventanas deslizantes para PDF/DOCX/TXT)
+LONG_DOC_ENABLED = os.getenv("LONG_DOC_ENABLED", "True").lower() == "true"
+LONG_DOC_MAX_WINDOWS = int(os.getenv("LONG_DOC_MAX_WINDOWS", "16"))
+LONG_DOC_BATCH_SIZE = int(os.getenv("LONG_DOC_BATCH_SIZE", "8"))
+LONG_DOC_OVERLAP = int(os.getenv("LONG_DOC_OVERLAP", "128"))
+LONG_DOC_AGGREGATION = os.getenv("LONG_DOC_AGGREGATION", "mean")  # mean | max | length_weighted
+
+# CONFIGURACIÓN DE TRABAJOS ASÍNCRONOS (?async=1 en /predict, /analyze_url y /ocr_predict)
+# Hilos por tipo de trabajo: una cola de URLs lentas no retrasa las predicciones de texto
+JOBS_CONCURRENCY = {
+    job_type.strip(): int(workers)
+    for job_type, workers in (
+        pair.split(":") for pair in os.getenv("JOBS_CONCURRENCY", "text:4,document:2,url:4,ocr:2").split(",") if pair.strip()
+    )
+}
+JOBS_MAX_QUEUED = int(os.getenv("JOBS_MAX_QUEUED", "100"))  # por tipo de trabajo
+JOBS_TTL_SECONDS = int(os.getenv("JOBS_TTL_SECONDS", "600"))  # conservación del resultado tras terminar
+# Estado y resultados en SQLite para que cualquier worker responda a /jobs/<id>
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join("data", "jobs.sqlite3"))
+
+# CONFIGURACIÓN DE MÉTRICAS (tiempos por etapa en /metrics y en debug_info con ?timings=1)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+
+# CONFIGURACIÓN DE DESCARGA DE URLS (aiohttp: pool de conexiones keep-alive compartido)
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "64"))
+FETCH_PER_HOST_LIMIT = int(os.getenv("FETCH_PER_HOST_LIMIT", "4"))
+FETCH_CONNECT_TIMEOUT = float(os.getenv("FETCH_CONNECT_TIMEOUT", "5"))
+FETCH_READ_TIMEOUT = float(os.getenv("FETCH_READ_TIMEOUT", "10"))
+FETCH_TOTAL_TIMEOUT = float(os.getenv("FETCH_TOTAL_TIMEOUT", "20"))
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(5 * 1024 * 1024)))
+ANALYZE_URLS_MAX_ITEMS = int(os.getenv("ANALYZE_URLS_MAX_ITEMS", "50"))  # URLs por llamada a /analyze_urls
+
+# CONFIGURACIÓN DE CACHÉ DE DESCARGAS (páginas y article_data en SQLite, revalidadas con ETag/Last-Modified)
+FETCH_CACHE_ENABLED = os.getenv("FETCH_CACHE_ENABLED", "True").lower() == "true"
+FETCH_CACHE_PATH = os.getenv("FETCH_CACHE_PATH", os.path.join("data", "fetch_cache.sqlite3"))
+FETCH_CACHE_TTL_SECONDS = float(os.getenv("FETCH_CACHE_TTL_SECONDS", "900"))  # sin revalidar durante este tiempo
+FETCH_CACHE_MAX_BYTES = int(os.getenv("FETCH_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# CONFIGURACIÓN DE PERFILADO POR MUESTREO (pilas exportables como flame graph)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0.0"))  # fracción de peticiones perfiladas
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILING_MAX_WINDOW_SECONDS = float(os.getenv("PROFILING_MAX_WINDOW_SECONDS", "300"))
+PROFILING_MAX_STACKS = int(os.getenv("PROFILING_MAX_STACKS", "20000"))
+# Token para /admin/profile (cabecera X-Admin-Token); vacío = endpoints de administración cerrados
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN", "")
 
 # CONFIGURACIÓN OCR.SPACE API
 OCR_API_KEY = os.getenv("OCR_SPACE_API_KEY")
@@ -18,11 +120,37 @@ OCR_API_URL = os.getenv("OCR_API_URL")
 FLASK_ENV = os.getenv("FLASK_ENV", "development")
 FLASK_DEBUG = os.getenv("FLASK_DEBUG", "True").lower() == "true"
 
+# CONFIGURACIÓN DE ESTADÍSTICAS (src/static/stats_analisis.json se vuelca por lotes)
+STATS_FLUSH_EVERY = int(os.getenv("STATS_FLUSH_EVERY", "50"))  # análisis pendientes que fuerzan un volcado
+STATS_FLUSH_INTERVAL_SECONDS = float(os.getenv("STATS_FLUSH_INTERVAL_SECONDS", "5"))
+# "sqlite": eventos y agregados por hora/día en STATS_DB_PATH | "json": solo src/static/stats_analisis.json
+STATS_BACKEND = os.getenv("STATS_BACKEND", "sqlite").lower()
+STATS_DB_PATH = os.getenv("STATS_DB_PATH", os.path.join("data", "stats_analisis.sqlite3"))
+# Retención en días (0 = sin límite); los totales históricos no caducan
+STATS_EVENTS_RETENTION_DAYS = int(os.getenv("STATS_EVENTS_RETENTION_DAYS", "30"))
+STATS_HOURLY_RETENTION_DAYS = int(os.getenv("STATS_HOURLY_RETENTION_DAYS", "90"))
+STATS_DAILY_RETENTION_DAYS = int(os.getenv("STATS_DAILY_RETENTION_DAYS", "0"))
+# /stats y /stats/stream sirven una instantánea en memoria recalculada cada estos segundos
+STATS_SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("STATS_SNAPSHOT_INTERVAL_SECONDS", "1"))
+STATS_STREAM_MAX_CLIENTS = int(os.getenv("STATS_STREAM_MAX_CLIENTS", "100"))  # conexiones SSE por worker
+STATS_STREAM_HEARTBEAT_SECONDS = float(os.getenv("STATS_STREAM_HEARTBEAT_SECONDS", "15"))
+
+# DATASETS ETIQUETADOS
+TRAIN_DATA_PATH = os.getenv("TRAIN_DATA_PATH", os.path.join("data", "train.xlsx"))
+DEV_DATA_PATH = os.getenv("DEV_DATA_PATH", os.path.join("data", "development.xlsx"))
+
+# CONFIGURACIÓN DE EVALUACIÓN (python -m utils.models.evaluation)
+METRICS_ARTIFACT_PATH = os.getenv("METRICS_ARTIFACT_PATH", os.path.join("models", "model_metrics.json"))
+# Probabilidades por fila (hash del texto + versión del modelo) para repetir evaluaciones sin inferencia
+EVAL_CACHE_PATH = os.getenv("EVAL_CACHE_PATH", os.path.join("models", "eval_cache.sqlite3"))
+
 # CONFIGURACIÓN DE TEMPLATES Y STATIC
 TEMPLATE_FOLDER = "src/templates"
 STATIC_FOLDER = "src/static"
 
 # INFORMACIÓN DEL MODELO
+# Valores de referencia del notebook de entrenamiento; app.py los sustituye al arrancar
+# por los del artefacto METRICS_ARTIFACT_PATH si existe
 MODEL_INFO = {
     "type": "BERT",
     "accuracy": "83.05%",
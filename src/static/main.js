@@ -1458,23 +1458,69 @@ function addToHistory(text, result) {
 // =====================================================================
 // 19. ACTUALIZACIÓN DINÁMICA DE ESTADÍSTICAS
 // =====================================================================
+/**
+ * Pinta las estadísticas recibidas de /stats o de /stats/stream
+ */
+function renderStats(data) {
+    document.querySelector("#analisis-hoy").textContent = data.analisis_hoy;
+    document.querySelector("#total-analisis").textContent = data.total_analisis;
+    document.querySelector("#total-fakes").textContent = data.total_fakes;
+    document.querySelector("#fakes-hoy").textContent = data.fakes_hoy;
+}
+
+// Última respuesta de /stats y su ETag, para revalidar con If-None-Match
+let statsEtag = null;
+let statsCache = null;
+
 /**
  * Muestra los resultados dinàmicamente en la interfaz
  */
 function fetchAndUpdateStats() {
-    fetch("/stats")
-        .then((response) => response.json())
-        .then((data) => {
-            document.querySelector("#analisis-hoy").textContent = data.analisis_hoy;
-            document.querySelector("#total-analisis").textContent = data.total_analisis;
-            document.querySelector("#total-fakes").textContent = data.total_fakes;
-            document.querySelector("#fakes-hoy").textContent = data.fakes_hoy;
+    const headers = statsEtag ? { "If-None-Match": statsEtag } : {};
+    fetch("/stats", { headers })
+        .then((response) => {
+            if (response.status === 304 && statsCache) return statsCache;
+            const etag = response.headers.get("ETag");
+            return response.json().then((data) => {
+                statsEtag = etag;
+                statsCache = data;
+                return data;
+            });
         })
+        .then(renderStats)
         .catch((error) => {
             console.error("Error al obtener estadísticas:", error);
         });
 }
 
+/**
+ * Panel en vivo (solo con ?live=1 en la URL): suscripción a /stats/stream, que envía
+ * las estadísticas cuando cambian. Cada conexión ocupa un hilo del servidor, por eso
+ * no se abre para todos los visitantes. Si el servidor la rechaza (p. ej. workers
+ * síncronos), se cae a una única lectura de /stats
+ */
+function subscribeToStats() {
+    if (!window.EventSource) {
+        fetchAndUpdateStats();
+        return;
+    }
+    const source = new EventSource("/stats/stream");
+    source.addEventListener("stats", (event) => {
+        renderStats(JSON.parse(event.data));
+    });
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) {
+            fetchAndUpdateStats();
+            return;
+        }
+        console.warn("Conexión de estadísticas interrumpida, reintentando...");
+    };
+}
+
 document.addEventListener("DOMContentLoaded", () => {
-    fetchAndUpdateStats(); // Llamar explícitamente a la función para cargar estadísticas
+    if (new URLSearchParams(window.location.search).get("live") === "1") {
+        subscribeToStats(); // El primer evento del stream trae las estadísticas actuales
+    } else {
+        fetchAndUpdateStats(); // Llamar explícitamente a la función para cargar estadísticas
+    }
 });
\ No newline at end of file
@@ -0,0 +1,24 @@
+"""
+Fixtures compartidas: servidor HTTP de prueba en un hilo de fondo
+"""
+import threading
+
+import pytest
+
+from stub_server import StubServer
+
+
+@pytest.fixture(scope="session")
+def stub_server():
+    server = StubServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stub(stub_server):
+    stub_server.reset()
+    return stub_server
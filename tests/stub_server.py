@@ -0,0 +1,100 @@
+"""
+Servidor HTTP de prueba (http.server) para los tests de descarga de URLs
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+ARTICLE_TEXT = "El gobierno anunció hoy nuevas medidas económicas para el país. " * 20
+
+
+def article_html(title):
+    return (
+        f"<html><head><title>{title}</title>"
+        "<meta name='description' content='Descripción de la noticia de prueba'></head>"
+        f"<body><article><p>{ARTICLE_TEXT}</p><img src='/img/portada.jpg'></article></body></html>"
+    ).encode("utf-8")
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.requests = []
+        self.etag = '"v1"'
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def handle_error(self, request, client_address):
+        pass  # clientes que cortan la conexión a propósito (plazos, límite de bytes)
+
+    def reset(self):
+        with self.lock:
+            self.active = 0
+            self.peak = 0
+            self.requests = []
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Rutas:
+        /article/<nombre>?delay=s  Página de noticia (con ETag; responde 304 a If-None-Match)
+        /slow                      Tarda más que el plazo de lectura de los tests
+        /status/<código>           Responde ese código
+        /redirect/<nombre>         302 a /article/<nombre>
+        /big                       200 KB de HTML
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            server.requests.append((parts.path, dict(self.headers)))
+        try:
+            delay = float(parse_qs(parts.query).get("delay", ["0"])[0])
+            if delay:
+                time.sleep(delay)
+            if parts.path.startswith("/article/"):
+                if self.headers.get("If-None-Match") == server.etag:
+                    self._send(304, headers={"ETag": server.etag})
+                    return
+                self._send(200, article_html(f"Noticia {parts.path.rsplit('/', 1)[-1]}"),
+                           {"Content-Type": "text/html; charset=utf-8", "ETag": server.etag})
+            elif parts.path == "/slow":
+                time.sleep(2)
+                self._send(200, article_html("Lenta"), {"Content-Type": "text/html"})
+            elif parts.path.startswith("/status/"):
+                self._send(int(parts.path.rsplit("/", 1)[-1]), b"error", {"Content-Type": "text/plain"})
+            elif parts.path.startswith("/redirect/"):
+                self._send(302, headers={"Location": f"/article/{parts.path.rsplit('/', 1)[-1]}"})
+            elif parts.path == "/big":
+                self._send(200, b"<html>" + b"x" * 200 * 1024 + b"</html>", {"Content-Type": "text/html"})
+            else:
+                self._send(404, b"not found")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # el cliente cortó la conexión (plazo vencido o límite de bytes)
+        finally:
+            with server.lock:
+                server.active -= 1
@@ -0,0 +1,175 @@
+"""
+Tests de AsyncFetcher, NewsExtractor y /analyze_urls contra el servidor de prueba
+"""
+import time
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from utils.async_fetcher import AsyncFetcher
+from utils.news_scraper import NewsExtractor
+
+
+@pytest.fixture
+def fetcher():
+    fetcher = AsyncFetcher(max_connections=16, per_host_limit=2, connect_timeout=2, read_timeout=0.5,
+                           total_timeout=5, max_bytes=64 * 1024)
+    yield fetcher
+    fetcher.close()
+
+
+def test_per_host_limit(stub, fetcher):
+    urls = [f"{stub.base_url}/article/{i}?delay=0.2" for i in range(6)]
+    started = time.perf_counter()
+    pages = fetcher.fetch_many(urls)
+    elapsed = time.perf_counter() - started
+
+    assert [page['status'] for page in pages] == [200] * 6
+    assert [page['url'] for page in pages] == urls
+    assert stub.peak == 2
+    # 6 páginas de 0.2 s de dos en dos: unas 3 rondas, ni en serie ni todas a la vez
+    assert 0.5 < elapsed < 1.2
+
+
+def test_read_timeout(stub, fetcher):
+    started = time.perf_counter()
+    page = fetcher.fetch(f"{stub.base_url}/slow")
+
+    assert page['content'] is None
+    assert page['error'] == "Tiempo de espera agotado"
+    assert time.perf_counter() - started < 1.5
+
+
+@pytest.mark.parametrize("status", [404, 500, 503])
+def test_http_errors(stub, fetcher, status):
+    page = fetcher.fetch(f"{stub.base_url}/status/{status}")
+
+    assert page['status'] == status
+    assert page['content'] is None
+    assert page['error'].startswith(f"HTTP {status}")
+
+
+def test_connection_error(fetcher):
+    page = fetcher.fetch("http://127.0.0.1:1/")
+
+    assert page['content'] is None
+    assert page['error']
+
+
+def test_redirect(stub, fetcher):
+    url = f"{stub.base_url}/redirect/destino"
+    page = fetcher.fetch(url)
+
+    assert page['status'] == 200
+    assert page['url'] == url
+    assert page['final_url'] == f"{stub.base_url}/article/destino"
+
+
+def test_max_bytes(stub, fetcher):
+    page = fetcher.fetch(f"{stub.base_url}/big")
+
+    assert page['truncated'] is True
+    assert len(page['content']) == fetcher.max_bytes
+
+
+def test_extract_many_keeps_requested_url(stub, fetcher):
+    url = f"{stub.base_url}/redirect/destino"
+    (article, error), (missing, missing_error) = NewsExtractor(fetcher).extract_many(
+        [url, f"{stub.base_url}/status/404"]
+    )
+
+    assert error is None
+    assert article['url'] == url
+    assert article['final_url'] == f"{stub.base_url}/article/destino"
+    assert article['title'] == "Noticia destino"
+    assert article['images'] == [f"{stub.base_url}/img/portada.jpg"]
+    assert missing is None
+    assert missing_error == "Error al acceder a la URL: HTTP 404 Not Found"
+
+
+class _StubPredictor:
+    """Predictor de prueba: el test comprueba la ruta, no el modelo"""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict_batch(self, items, threshold=0.7):
+        self.batches.append(items)
+        return [
+            {'prediction': 'Fake', 'label': 1, 'probability_fake': 0.9, 'probability_true': 0.1, 'confidence': 0.9}
+            for _ in items
+        ]
+
+
+@pytest.fixture
+def client(monkeypatch, fetcher):
+    import app as app_module
+    import utils.analysis as analysis
+
+    predictor = _StubPredictor()
+    monkeypatch.setattr(analysis, "get_news_extractor", lambda: NewsExtractor(fetcher))
+    monkeypatch.setattr(analysis, "get_predictor", lambda: predictor)
+    monkeypatch.setattr(analysis, "registrar_analisis_lote", lambda *args, **kwargs: None)
+    app_module.app.config["TESTING"] = True
+    client = app_module.app.test_client()
+    client.predictor = predictor
+    return client
+
+
+def test_analyze_urls_response_shape(stub, client):
+    urls = [
+        f"{stub.base_url}/article/uno",
+        f"{stub.base_url}/status/404",
+        f"{stub.base_url}/redirect/dos",
+        f"{stub.base_url}/status/500",
+    ]
+    response = client.post("/analyze_urls", json={"urls": urls})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['count'] == 4
+    first, not_found, redirected, server_error = body['results']
+
+    assert first['url'] == urls[0]
+    assert first['final_url'] == urls[0]
+    assert first['prediction'] == "Fake"
+    assert first['article_data']['title'] == "Noticia uno"
+    assert set(first['article_data']) >= {
+        "title", "author", "publish_date", "description", "content_length",
+        "content_truncated_length", "truncation_applied", "images_count",
+    }
+    assert redirected['url'] == urls[2]
+    assert redirected['final_url'] == f"{stub.base_url}/article/dos"
+    assert not_found == {"url": urls[1], "error": "Error al acceder a la URL: HTTP 404 Not Found"}
+    assert server_error['url'] == urls[3]
+    assert server_error['error'].startswith("Error al acceder a la URL: HTTP 500")
+
+    # Las dos páginas válidas van a BERT en un solo lote
+    assert len(client.predictor.batches) == 1
+    assert len(client.predictor.batches[0]) == 2
+
+
+def test_analyze_urls_accepts_list_and_adds_scheme(stub, client):
+    host = stub.base_url.removeprefix("http://")
+    response = client.post("/analyze_urls", json=[f"{host}/article/x"])
+
+    assert response.status_code == 200
+    # Sin esquema se antepone https://, como en /analyze_url; el servidor de prueba solo habla HTTP
+    assert response.get_json()['results'][0]['url'] == f"https://{host}/article/x"
+
+
+@pytest.mark.parametrize("payload", [None, {}, {"urls": []}, {"urls": ["  "]}, {"urls": [1]}])
+def test_analyze_urls_rejects_invalid_payload(client, payload):
+    response = client.post("/analyze_urls", json=payload)
+
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_analyze_urls_limits_items(client):
+    from config.settings import ANALYZE_URLS_MAX_ITEMS
+
+    response = client.post("/analyze_urls", json={"urls": ["http://example.com/"] * (ANALYZE_URLS_MAX_ITEMS + 1)})
+
+    assert response.status_code == 413
@@ -0,0 +1,135 @@
+"""
+Tests de FetchCache y de su uso en NewsExtractor contra el servidor de prueba
+"""
+import time
+
+import pytest
+
+from utils.async_fetcher import fetch_result
+from utils.fetch_cache import FetchCache, canonical_url
+from utils.news_scraper import PARSER_VERSION, NewsExtractor
+from stub_server import article_html
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = FetchCache(str(tmp_path / "fetch_cache.sqlite3"), ttl_seconds=60, max_bytes=10 ** 6)
+    yield cache
+    cache.close()
+
+
+def _stored_page(url, title="Guardada"):
+    return fetch_result(url, url, 200, article_html(title), {"ETag": '"v1"'})
+
+
+def _summary(cache):
+    return cache._db.execute("SELECT entries, bytes FROM pages_summary").fetchone()
+
+
+def _scan(cache):
+    return cache._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://Example.COM:443/a?utm_source=x&b=2&a=1&fbclid=z#frag", "https://example.com/a?a=1&b=2"),
+    ("http://example.com", "http://example.com/"),
+    ("http://example.com:8080/p?q=", "http://example.com:8080/p?q="),
+])
+def test_canonical_url(url, expected):
+    assert canonical_url(url) == expected
+
+
+def test_fresh_hit_skips_network(stub, cache):
+    extractor = NewsExtractor(cache=cache)
+    url = f"{stub.base_url}/article/uno"
+
+    first, _ = extractor.extract_many([url + "?utm_source=tw"])[0]
+    second, _ = extractor.extract_many([url + "#comentarios"])[0]
+
+    assert len(stub.requests) == 1
+    assert second['title'] == first['title'] == "Noticia uno"
+    assert second['url'] == url + "#comentarios"
+    assert cache.stats()['hits'] == 1
+
+
+def test_stale_entry_revalidates_with_304(stub, cache):
+    cache.ttl_seconds = 0
+    extractor = NewsExtractor(cache=cache)
+    url = f"{stub.base_url}/article/dos"
+
+    extractor.extract_many([url])
+    article, error = extractor.extract_many([url])[0]
+
+    assert error is None
+    assert article['title'] == "Noticia dos"
+    assert stub.requests[-1][1].get("If-None-Match") == '"v1"'
+    assert cache.stats()['revalidated'] == 1
+
+
+@pytest.mark.parametrize("path", ["/status/503", None])
+def test_stale_copy_served_when_revalidation_fails(stub, cache, path):
+    cache.ttl_seconds = 0
+    url = f"{stub.base_url}{path}" if path else "http://127.0.0.1:1/noticia"
+    cache.store(url, _stored_page(url), NewsExtractor().parse(article_html("Guardada"), url), PARSER_VERSION)
+
+    article, error = NewsExtractor(cache=cache).extract_many([url])[0]
+
+    assert error is None
+    assert article['stale'] is True
+    assert article['title'] == "Guardada"
+    assert cache.stats()['stale_served'] == 1
+
+
+def test_stale_copy_not_served_on_404(stub, cache):
+    cache.ttl_seconds = 0
+    url = f"{stub.base_url}/status/404"
+    cache.store(url, _stored_page(url), NewsExtractor().parse(article_html("Borrada"), url), PARSER_VERSION)
+
+    article, error = NewsExtractor(cache=cache).extract_many([url])[0]
+
+    assert article is None
+    assert error.startswith("Error al acceder a la URL: HTTP 404")
+
+
+def test_summary_row_tracks_inserts_replacements_and_evictions(tmp_path):
+    cache = FetchCache(str(tmp_path / "lru.sqlite3"), ttl_seconds=60, max_bytes=10 ** 6)
+    for i in range(5):
+        url = f"http://example.com/{i}"
+        cache.store(url, _stored_page(url, f"Noticia {i}"), {"title": f"Noticia {i}"}, PARSER_VERSION)
+    cache.store("http://example.com/0", _stored_page("http://example.com/0", "Otra"), {"title": "Otra"},
+                PARSER_VERSION)
+    cache.update_article(canonical_url("http://example.com/1"), {"title": "x" * 500}, PARSER_VERSION)
+    assert _summary(cache) == _scan(cache)
+    assert _summary(cache)[0] == 5
+
+    # Las entradas 0 y 1 se usaron hace más tiempo; 2-4 se marcan como recientes
+    for i in range(5):
+        cache._db.execute("UPDATE pages SET accessed_at = ? WHERE key = ?",
+                          (time.time() - 3600 + i, canonical_url(f"http://example.com/{i}")))
+    cache._db.commit()
+    cache.max_bytes = _scan(cache)[1] - 1
+    cache.store("http://example.com/5", _stored_page("http://example.com/5"), {"title": "5"}, PARSER_VERSION)
+
+    assert _summary(cache) == _scan(cache)
+    assert _summary(cache)[1] <= cache.max_bytes
+    assert cache.lookup("http://example.com/0") is None
+    assert cache.lookup("http://example.com/5") is not None
+    assert cache.stats()['evictions'] >= 1
+    cache.close()
+
+
+def test_fresh_hit_does_not_rewrite_accessed_at(cache):
+    url = "http://example.com/noticia"
+    cache.store(url, _stored_page(url), {"title": "Noticia"}, PARSER_VERSION)
+    key = canonical_url(url)
+    before = cache._db.execute("SELECT accessed_at FROM pages WHERE key = ?", (key,)).fetchone()[0]
+    changes = cache._db.total_changes
+
+    assert cache.lookup(url)['fresh'] is True
+    assert cache._db.total_changes == changes
+
+    cache._db.execute("UPDATE pages SET accessed_at = ? WHERE key = ?", (before - 3600, key))
+    cache._db.commit()
+    cache.lookup(url)
+    after = cache._db.execute("SELECT accessed_at FROM pages WHERE key = ?", (key,)).fetchone()[0]
+    assert after > before - 3600
@@ -0,0 +1,96 @@
+"""
+Tests de la cadena de predictores por lotes (caché → cascada → pool) sin cargar BERT
+"""
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from utils.models.cascade import CascadePredictor
+from utils.models.model_pool import ModelPool
+from utils.models.prediction_cache import CachedPredictor, PredictionCache
+from utils.models.truthlens_bert import TruthLensBERT
+
+
+class _FakeReplica:
+    """Réplica de prueba: probabilidad de falsa fija y registro de los forward pass"""
+
+    plan_batches = TruthLensBERT.plan_batches
+
+    def __init__(self, prob_fake=0.9, batch_size=4, calls=None):
+        self.prob_fake = prob_fake
+        self.batch_size = batch_size
+        self.calls = calls if calls is not None else []
+
+    def replicate(self):
+        return _FakeReplica(self.prob_fake, self.batch_size, self.calls)
+
+    def predict(self, headline, text="", threshold=0.7):
+        return self.predict_many([(headline, text, threshold)])[0]
+
+    def predict_many(self, requests):
+        self.calls.append([headline for headline, _, _ in requests])
+        return [TruthLensBERT.calibrate(self.prob_fake, 1.0 - self.prob_fake, threshold) for _, _, threshold in requests]
+
+
+class _FixedPrefilter:
+    """Prefiltro de prueba: la probabilidad viene en el titular"""
+
+    version = "fixed"
+
+    def predict_proba(self, headline, text=""):
+        return float(headline)
+
+
+def _items(n):
+    return [{"title": f"Noticia {i}", "text": "x" * i} for i in range(n)]
+
+
+def test_pool_releases_replica_between_chunks():
+    pool = ModelPool(_FakeReplica(batch_size=4), size=1, checkout_timeout=1.0)
+
+    results = pool.predict_batch(_items(10))
+
+    assert len(results) == 10
+    assert [len(call) for call in pool.replicas[0].calls] == [4, 4, 2]
+    assert pool.stats()["checkouts"] == 3
+    assert pool.stats()["in_use"] == 0
+
+
+def test_cached_predictor_batch_only_sends_misses():
+    pool = ModelPool(_FakeReplica(batch_size=8), size=1)
+    cached = CachedPredictor(pool, PredictionCache(max_entries=64), lambda headline, text: f"{headline} {text}", "test")
+    items = _items(3)
+
+    first = cached.predict_batch(items)
+    second = cached.predict_batch(items + [{"title": "Nueva", "text": ""}])
+
+    assert [result["cache_hit"] for result in first] == [False] * 3
+    assert [result["cache_hit"] for result in second] == [True, True, True, False]
+    assert pool.replicas[0].calls[-1] == ["Nueva"]
+    assert second[0]["prediction"] == first[0]["prediction"]
+
+
+@pytest.mark.parametrize("prob_fake, prediction, decided_by", [
+    (0.0, "True", "prefilter"),
+    (0.3, "True", "prefilter"),
+    (0.31, None, "bert"),
+    (0.69, None, "bert"),
+    (0.7, "Fake", "prefilter"),
+    # Entre el borde de la banda y el umbral de calibración de BERT (0.75)
+    (0.72, "Fake", "prefilter"),
+    (1.0, "Fake", "prefilter"),
+])
+def test_cascade_band_edges(prob_fake, prediction, decided_by):
+    bert = ModelPool(_FakeReplica(prob_fake=0.1), size=1)
+    cascade = CascadePredictor(_FixedPrefilter(), bert)
+
+    single = cascade.predict(str(prob_fake))
+    batch = cascade.predict_batch([(str(prob_fake), "")])[0]
+
+    assert single == batch
+    assert single["decided_by"] == decided_by
+    assert single["prediction"] == (prediction or "True")
+    assert len(bert.replicas[0].calls) == (2 if decided_by == "bert" else 0)
+    if decided_by == "prefilter":
+        assert single["confidence"] == pytest.approx(max(prob_fake, 1.0 - prob_fake))
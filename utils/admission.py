@@ -0,0 +1,164 @@
+"""
+Control de admisión para la ruta de inferencia (cola acotada con plazo por petición)
+"""
+import math
+import threading
+from collections import deque
+import time
+from contextlib import contextmanager, nullcontext
+
+from config.settings import (
+    ADMISSION_ENABLED, ADMISSION_CONCURRENCY, ADMISSION_MAX_QUEUE, ADMISSION_DEADLINE_SECONDS,
+    MODEL_POOL_SIZE, BATCHING_ENABLED, BATCH_MAX_SIZE
+)
+
+
+class Overloaded(Exception):
+    """Petición rechazada por cola llena o plazo imposible; incluye el Retry-After sugerido"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Limita las peticiones que esperan a inferencia y rechaza pronto las que no llegarían a tiempo
+
+    Hay `concurrency` huecos de inferencia y otras `max_queue_depth` peticiones
+    esperan turno. Una petición ocupa tantos huecos como textos analiza (`cost`,
+    hasta `concurrency`), así que un lote pesa como sus elementos sueltos. La
+    cola es FIFO: mientras alguien espera, las peticiones que llegan después no
+    le adelantan aunque quepan en los huecos libres, y un lote grande no se queda
+    esperando para siempre. Se rechaza al llegar si la cola está llena o si la
+    espera estimada (media móvil exponencial del tiempo de servicio por texto)
+    supera su plazo, y también si el plazo vence mientras espera.
+    """
+
+    def __init__(self, concurrency, max_queue_depth=32, deadline_seconds=10.0, ewma_alpha=0.2):
+        self.concurrency = max(1, concurrency)
+        self.max_queue_depth = max_queue_depth
+        self.deadline_seconds = deadline_seconds
+        self.ewma_alpha = ewma_alpha
+
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._in_use = 0
+        self._running = 0
+        self._queue = deque()
+        self._waiting_cost = 0
+        self._admitted = 0
+        self._rejected_queue_full = 0
+        self._rejected_deadline = 0
+        self._service_ewma = None
+
+    def _estimated_wait(self, cost):
+        """Segundos hasta que queden libres `cost` huecos detrás de las peticiones en espera"""
+        if self._in_use + self._waiting_cost + cost <= self.concurrency or not self._service_ewma:
+            return 0.0
+        return (self._waiting_cost + cost) / self.concurrency * self._service_ewma
+
+    def _retry_after(self):
+        """Segundos (entero >= 1) para vaciar la cola actual al ritmo reciente"""
+        service = self._service_ewma or 1.0
+        return max(1, math.ceil((self._waiting_cost + 1) / self.concurrency * service))
+
+    @contextmanager
+    def admit(self, deadline_seconds=None, cost=1):
+        """
+        Reserva huecos de inferencia o lanza Overloaded
+
+        Args:
+            deadline_seconds: Tiempo máximo de espera por un hueco (por defecto, el configurado)
+            cost: Huecos que ocupa la petición (número de textos de un lote; máximo `concurrency`)
+        """
+        deadline = self.deadline_seconds if deadline_seconds is None else deadline_seconds
+        cost = min(max(1, int(cost)), self.concurrency)
+        with self._lock:
+            waiting = len(self._queue)
+            if waiting >= self.max_queue_depth and (waiting or self._in_use + cost > self.concurrency):
+                self._rejected_queue_full += 1
+                raise Overloaded(f"Cola de inferencia llena ({waiting} en espera)", self._retry_after())
+            estimated = self._estimated_wait(cost)
+            if estimated > deadline:
+                self._rejected_deadline += 1
+                raise Overloaded(
+                    f"Espera estimada de {estimated:.1f}s supera el plazo de {deadline:.1f}s", self._retry_after()
+                )
+            # Turno propio: solo la cabeza de la cola puede ocupar huecos
+            ticket = object()
+            self._queue.append(ticket)
+            self._waiting_cost += cost
+            try:
+                acquired = self._slot_freed.wait_for(
+                    lambda: self._queue[0] is ticket and self._in_use + cost <= self.concurrency, deadline
+                )
+            finally:
+                self._queue.remove(ticket)
+                self._waiting_cost -= cost
+                # La nueva cabeza puede caber ya en los huecos libres
+                if self._queue:
+                    self._slot_freed.notify_all()
+            if not acquired:
+                self._rejected_deadline += 1
+                raise Overloaded(f"Plazo de {deadline:.1f}s vencido esperando turno", self._retry_after())
+            self._in_use += cost
+            self._running += 1
+            self._admitted += 1
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._in_use -= cost
+                self._running -= 1
+                # Tiempo por texto: un lote largo no infla la estimación de las peticiones sueltas
+                service = elapsed / cost
+                if self._service_ewma is None:
+                    self._service_ewma = service
+                else:
+                    self._service_ewma += self.ewma_alpha * (service - self._service_ewma)
+                self._slot_freed.notify_all()
+
+    def stats(self):
+        """Señales para autoescalado: profundidad de cola, ocupación y rechazos"""
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "max_queue_depth": self.max_queue_depth,
+                "deadline_seconds": self.deadline_seconds,
+                "running": self._running,
+                "slots_in_use": self._in_use,
+                "queue_depth": len(self._queue),
+                "admitted": self._admitted,
+                "rejected_queue_full": self._rejected_queue_full,
+                "rejected_deadline": self._rejected_deadline,
+                "service_time_ms_ewma": (self._service_ewma or 0.0) * 1000,
+            }
+
+
+_admission_controller = None
+_admission_lock = threading.Lock()
+
+
+def get_admission_controller():
+    """AdmissionController del proceso (None si ADMISSION_ENABLED es False)"""
+    global _admission_controller
+
+    if ADMISSION_ENABLED and _admission_controller is None:
+        with _admission_lock:
+            if _admission_controller is None:
+                # Por defecto, tantas peticiones simultáneas como caben en los micro-lotes de todas las réplicas
+                concurrency = ADMISSION_CONCURRENCY or MODEL_POOL_SIZE * (BATCH_MAX_SIZE if BATCHING_ENABLED else 1)
+                _admission_controller = AdmissionController(
+                    concurrency, ADMISSION_MAX_QUEUE, ADMISSION_DEADLINE_SECONDS
+                )
+    return _admission_controller
+
+
+def admission(cost=1):
+    """Contexto de admisión para un bloque de inferencia de `cost` textos (no hace nada si está desactivado)"""
+    controller = get_admission_controller()
+    return controller.admit(cost=cost) if controller is not None else nullcontext()
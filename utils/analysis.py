@@ -0,0 +1,351 @@
+"""
+Flujos de análisis de las rutas (texto, documento, URL e imagen)
+
+Cada función recibe datos ya leídos de la petición y devuelve una tupla
+(cuerpo, código HTTP[, cabeceras]), de modo que la misma lógica sirve a las rutas síncronas
+y a los trabajos en segundo plano de utils.jobs.
+"""
+import time
+
+import requests
+
+from config.settings import OCR_API_KEY, OCR_API_URL, MODEL_INFO, LONG_DOC_ENABLED
+from utils.admission import Overloaded, admission
+from utils.file_extractors import extract_text_from_file
+from utils.metrics import stage
+from utils.models.model_manager import get_predictor, get_model_pool, get_news_extractor
+from utils.models.update_stats import registrar_analisis, registrar_analisis_lote
+from utils.response_helpers import (
+    create_debug_info, create_standard_response, create_error_response, create_overload_response
+)
+
+
+def _registrar(result, route, input_chars, started):
+    es_fake = (result.get('prediction', '').lower() == 'fake')
+    # No hay ground truth, así que asumimos correcto si el modelo predice con alta confianza (>0.8)
+    es_correcto = result.get('confidence', 0) > 0.8
+    with stage("registrar_analisis"):
+        registrar_analisis(es_fake, es_correcto, route=route, confidence=result.get('confidence'),
+                           latency_ms=(time.perf_counter() - started) * 1000, input_chars=input_chars)
+
+
+def analyze_text(title, text, extraction_method="Texto Manual", file_info="", long_document=False,
+                 route="text", started=None):
+    """Predicción sobre título y contenido (JSON de /predict o texto extraído de un archivo)"""
+    started = started or time.perf_counter()
+    # Validación
+    combined_text = f"{title} {text}".strip()
+    if not combined_text or len(combined_text) < 5:
+        return create_error_response("No se encontró texto suficiente para analizar", 400)
+
+    # Realizar predicción con BERT usando título y contenido separados
+    try:
+        with admission():
+            if long_document:
+                # Documentos: ventanas deslizantes para no ignorar lo que excede 512 tokens
+                result = get_model_pool().predict_long(title, text)
+            else:
+                result = get_predictor().predict(title, text)
+        _registrar(result, route, len(combined_text), started)
+
+        response = create_standard_response(result) # Crear respuesta usando funciones auxiliares
+        response["debug_info"] = create_debug_info(
+            result,
+            title=title,
+            text=text,
+            extraction_method=extraction_method,
+            file_info=file_info
+        )
+        if result.get('long_document'):
+            response["long_document"] = {
+                "aggregation": result['aggregation'],
+                "tokens_analyzed": result['tokens_analyzed'],
+                "windows_used": result['windows_used'],
+                "windows_truncated": result['windows_truncated'],
+                "window_scores": result['window_scores']
+            }
+        response["extracted_preview"] = (combined_text[:180] + '...') if combined_text else None
+        return response, 200
+    except Overloaded as e:
+        return create_overload_response(e)
+    except Exception as e:
+        return create_error_response(f"Error en predicción BERT: {str(e)}", 500)
+
+
+def analyze_document(filename, content):
+    """Extrae el texto de un PDF/DOCX/TXT y lo analiza (modo documento largo si está activo)"""
+    started = time.perf_counter()
+    with stage("extract_text"):
+        text, error = extract_text_from_file(filename.lower(), content)
+    if error:
+        return create_error_response(error, 400)
+
+    # Para archivos: usar las primeras líneas como título, resto como contenido
+    lines = text.split('\n')
+    # Buscar la primera línea significativa como título
+    title = ""
+    content_lines = []
+
+    for line in lines:
+        line_clean = line.strip()
+        if not title and line_clean and len(line_clean) > 10:
+            title = line_clean[:100]  # Limitar título a 100 chars
+        elif title:  # Ya tenemos título, el resto es contenido
+            content_lines.append(line_clean)
+
+    text = '\n'.join(content_lines)
+
+    # Si no se encontró título adecuado, usar el nombre del archivo
+    if not title:
+        title = f"Documento: {filename or 'archivo'}"
+
+    file_size_mb = len(content) / (1024 * 1024)
+    file_info = f"Archivo: {filename or 'sin_nombre'} ({file_size_mb:.2f} MB)"
+    return analyze_text(title, text, extraction_method="Archivo subido", file_info=file_info,
+                        long_document=LONG_DOC_ENABLED, route="document", started=started)
+
+
+def _truncate_for_bert(title, content, description):
+    """
+    Recorta el contenido de una noticia a 400-500 caracteres para BERT
+
+    Returns:
+        tuple: (contenido recortado, si se recortó)
+    """
+    # 🎯 OPTIMIZACIÓN PARA BERT: Limitar contenido a 400-500 caracteres
+    # Priorizar: título completo + descripción + primeros párrafos del contenido
+
+    # Calcular límites inteligentes
+    title_length = len(title)
+    description_length = len(description)
+
+    # Reservar espacio para título y descripción (son más importantes)
+    reserved_space = title_length + description_length
+    available_for_content = max(200, 500 - reserved_space)  # Mínimo 200 chars para contenido
+
+    # Truncar contenido inteligentemente (por párrafos)
+    content_truncated = content
+    truncation_applied = False
+
+    if len(content) > available_for_content:
+        # Intentar cortar por párrafos primero
+        paragraphs = content.split('\n\n')
+        truncated_content = ""
+
+        for paragraph in paragraphs:
+            if len(truncated_content + paragraph) <= available_for_content:
+                truncated_content += paragraph + "\n\n"
+            else:
+                # Si el párrafo completo no cabe, tomar solo parte
+                remaining_space = available_for_content - len(truncated_content)
+                if remaining_space > 50:  # Solo si queda espacio significativo
+                    truncated_content += paragraph[:remaining_space] + "..."
+                break
+
+        content_truncated = truncated_content.strip()
+        truncation_applied = True
+
+    return content_truncated, truncation_applied
+
+
+def _article_summary(article_data, content_truncated, truncation_applied):
+    """Campos de la noticia extraída que se devuelven en la respuesta"""
+    return {
+        "title": article_data.get('title', ''),
+        "author": article_data.get('author', ''),
+        "publish_date": article_data.get('publish_date', ''),
+        "description": article_data.get('description', ''),
+        "content_length": len(article_data.get('content', '')),
+        "content_truncated_length": len(content_truncated),
+        "truncation_applied": truncation_applied,
+        "images_count": len(article_data.get('images', [])),
+        "stale": article_data.get('stale', False)
+    }
+
+
+def analyze_url(url):
+    """Extrae una noticia desde una URL y la analiza con el contenido optimizado para BERT"""
+    started = time.perf_counter()
+    try:
+        # Extraer contenido usando el scraper
+        with stage("scraping"):
+            article_data = get_news_extractor().extract_content(url)
+
+        if not article_data:
+            return create_error_response("No se pudo extraer el contenido de la URL", 400)
+
+        # Obtener los componentes de la noticia
+        title = article_data.get('title', '')
+        content = article_data.get('content', '')
+        description = article_data.get('description', '')
+
+        # Verificar que hay contenido suficiente para analizar
+        if not any([title, content, description]) or len(title + content + description) < 20:
+            return create_error_response("No se encontró contenido suficiente para analizar en la URL", 400)
+
+        content_truncated, truncation_applied = _truncate_for_bert(title, content, description)
+
+        # Realizar análisis con contenido optimizado usando BERT directamente
+        with admission():
+            result = get_predictor().predict(title, content_truncated + " " + description)
+        _registrar(result, "url", len(title) + len(content_truncated) + len(description), started)
+
+        if not result or result.get('prediction') == 'Error':
+            return create_error_response("No se pudo analizar el contenido extraído", 400)
+
+        # Crear preview del contenido extraído
+        preview_parts = []
+        if title: preview_parts.append(f"Título: {title[:100]}...")
+        if description: preview_parts.append(f"Descripción: {description[:100]}...")
+        if content_truncated: preview_parts.append(f"Contenido: {content_truncated[:200]}...")
+
+        extracted_preview = " | ".join(preview_parts)
+
+        # Guardar el artículo completo en un archivo para referencia futura
+        get_news_extractor().save_to_file(article_data)
+
+        response = create_standard_response(result) # Crear respuesta usando funciones auxiliares
+        response.update({
+            "url": url,
+            "final_url": article_data.get('final_url', url),
+            "article_data": _article_summary(article_data, content_truncated, truncation_applied),
+            "model_info": {
+                **MODEL_INFO,
+                "content_optimization": "Contenido limitado a 400-500 chars para BERT" if truncation_applied else "Contenido original usado"
+            },
+            "extracted_preview": extracted_preview
+        })
+
+        # Agregar debug_info con campos específicos para URL
+        response["debug_info"] = create_debug_info(
+            result,
+            title=title,
+            text=content_truncated,
+            extraction_method="URL Scraping",
+            # Campos específicos para análisis de URL
+            original_content_length=len(content),
+            truncated_content_length=len(content_truncated),
+            truncation_applied=truncation_applied,
+            optimization_applied="Smart truncation by paragraphs" if truncation_applied else "No truncation needed"
+        )
+
+        return response, 200
+
+    except Overloaded as e:
+        return create_overload_response(e)
+    except requests.RequestException as e:
+        return create_error_response(f"Error al acceder a la URL: {str(e)}", 502)
+    except Exception as e:
+        return create_error_response(f"Error al procesar la noticia: {str(e)}", 500)
+
+
+def analyze_urls(urls):
+    """
+    Descarga varias noticias a la vez y las analiza con BERT en lotes
+
+    Las descargas comparten el pool de conexiones del fetcher asíncrono (con
+    límite por host); los textos extraídos se envían juntos al predictor (caché → cascada → BERT).
+    Cada URL recibe su resultado o su error, en el orden de entrada.
+    """
+    started = time.perf_counter()
+    try:
+        with stage("scraping"):
+            extracted = get_news_extractor().extract_many(urls)
+
+        results = [None] * len(urls)
+        indices, items, prepared = [], [], []
+        for i, (url, (article_data, error)) in enumerate(zip(urls, extracted)):
+            if error or not article_data:
+                results[i] = {"url": url, "error": error or "No se pudo extraer el contenido de la URL"}
+                continue
+            title = article_data.get('title', '')
+            content = article_data.get('content', '')
+            description = article_data.get('description', '')
+            if len(title + content + description) < 20:
+                results[i] = {"url": url, "error": "No se encontró contenido suficiente para analizar en la URL"}
+                continue
+            content_truncated, truncation_applied = _truncate_for_bert(title, content, description)
+            indices.append(i)
+            items.append({"title": title, "text": content_truncated + " " + description})
+            prepared.append((article_data, content_truncated, truncation_applied))
+
+        predictions = []
+        if items:
+            with admission(len(items)):
+                predictions = get_predictor().predict_batch(items)
+        with stage("registrar_analisis"):
+            registrar_analisis_lote(
+                (
+                    (result.get('prediction', '').lower() == 'fake', result.get('confidence', 0) > 0.8,
+                     result.get('confidence'), len(item['title']) + len(item['text']))
+                    for item, result in zip(items, predictions) if result.get('prediction') != 'Error'
+                ),
+                route="urls",
+                latency_ms=(time.perf_counter() - started) * 1000 / max(1, len(items))
+            )
+        for i, result, (article_data, content_truncated, truncation_applied) in zip(indices, predictions, prepared):
+            results[i] = {
+                "url": urls[i],
+                "final_url": article_data.get('final_url', urls[i]),
+                **create_standard_response(result),
+                "article_data": _article_summary(article_data, content_truncated, truncation_applied)
+            }
+
+        return {"count": len(results), "results": results}, 200
+    except Overloaded as e:
+        return create_overload_response(e)
+    except Exception as e:
+        return create_error_response(f"Error al procesar las noticias: {str(e)}", 500)
+
+
+def analyze_image(filename, content):
+    """Extrae el texto de una imagen con OCR.space y lo analiza"""
+    started = time.perf_counter()
+    # Procesar con OCR
+    try:
+        with stage("ocr"):
+            ocr = requests.post(OCR_API_URL,
+                               files={'file': (filename or 'image.jpg', content)},
+                               data={'apikey': OCR_API_KEY,
+                                     'language': 'spa',
+                                     'isOverlayRequired': False},
+                               timeout=30)
+    except requests.RequestException as e:
+        return create_error_response(f"Fallo OCR: {str(e)}", 502)
+
+    if ocr.status_code != 200:
+        return create_error_response(f"OCR.space devolvió {ocr.status_code}", 502)
+
+    data = ocr.json()
+    results = data.get('ParsedResults') or []
+    text = (results[0].get('ParsedText') or '').strip() if results else ''
+
+    if not text:
+        return create_error_response("No se detectó texto en la imagen", 400)
+
+    # Realizar predicción con BERT
+    try:
+        with admission():
+            result = get_predictor().predict(text, "")
+        _registrar(result, "ocr", len(text), started)
+
+        # Crear respuesta usando funciones auxiliares
+        response = create_standard_response(result)
+        response.update({
+            "text": text,
+            "extracted_preview": (text[:180] + '...') if len(text) > 180 else text
+        })
+
+        # Agregar debug_info específico para OCR
+        response["debug_info"] = create_debug_info(
+            result,
+            title="",  # OCR no tiene título separado
+            text=text,
+            extraction_method="OCR"
+        )
+
+        return response, 200
+    except Overloaded as e:
+        return create_overload_response(e)
+    except Exception as e:
+        return create_error_response(f"Error en predicción BERT: {str(e)}", 500)
@@ -0,0 +1,178 @@
+"""
+Descarga asíncrona de páginas con un pool de conexiones compartido (aiohttp)
+
+Un bucle de asyncio propio corre en un hilo de fondo con una única ClientSession.
+Su TCPConnector reutiliza conexiones HTTP/1.1 keep-alive y limita las conexiones
+totales y por host. Las rutas Flask, que son síncronas, llaman a `fetch` o
+`fetch_many` y esperan el resultado sin ocupar un hilo por cada URL.
+"""
+import asyncio
+import os
+import threading
+
+from config.settings import (
+    FETCH_MAX_CONNECTIONS, FETCH_PER_HOST_LIMIT, FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT,
+    FETCH_TOTAL_TIMEOUT, FETCH_MAX_BYTES
+)
+
+try:
+    import aiohttp  # type: ignore
+except ImportError:  # Sin aiohttp, NewsExtractor descarga con requests
+    aiohttp = None
+
+USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/91.0.4472.124 Safari/537.36'
+)
+
+
+def fetch_result(url, final_url=None, status=None, content=None, headers=None, truncated=False, error=None):
+    """Respuesta descargada; content es None si hubo error (y error lo describe)"""
+    return {
+        'url': url,
+        'final_url': final_url or url,
+        'status': status,
+        'content': content,
+        'headers': headers or {},
+        'truncated': truncated,
+        'error': error,
+    }
+
+
+class AsyncFetcher:
+    """
+    Cliente HTTP asíncrono con límites de conexión por host y plazos de conexión y lectura
+
+    Args:
+        max_connections: Conexiones simultáneas en total
+        per_host_limit: Conexiones simultáneas por host
+        connect_timeout: Segundos para establecer la conexión
+        read_timeout: Segundos máximos sin recibir datos
+        total_timeout: Segundos máximos por URL (incluye redirecciones)
+        max_bytes: Bytes máximos del cuerpo (el resto se descarta)
+    """
+
+    def __init__(self, max_connections=64, per_host_limit=4, connect_timeout=5.0, read_timeout=10.0,
+                 total_timeout=20.0, max_bytes=5 * 1024 * 1024):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp no está instalado (pip install aiohttp)")
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, sock_connect=connect_timeout,
+                                             sock_read=read_timeout)
+        self.max_bytes = max_bytes
+
+        self._loop = asyncio.new_event_loop()
+        self._session = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, name="truthlens-fetcher", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    async def _create_session(self):
+        # La sesión y su conector deben crearse dentro del bucle que los usará
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.max_connections, limit_per_host=self.per_host_limit,
+                keepalive_timeout=30, ttl_dns_cache=300
+            ),
+            timeout=self.timeout,
+            headers={'User-Agent': USER_AGENT}
+        )
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._create_session())
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _fetch(self, url, headers=None):
+        try:
+            async with self._session.get(url, headers=headers) as response:
+                chunks = []
+                size = 0
+                truncated = False
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= self.max_bytes:
+                        truncated = True
+                        break
+                content = b"".join(chunks)[:self.max_bytes]
+                if response.status >= 400:
+                    return fetch_result(url, str(response.url), response.status,
+                                        error=f"HTTP {response.status} {response.reason or ''}".strip())
+                return fetch_result(url, str(response.url), response.status, content,
+                                    dict(response.headers), truncated)
+        except asyncio.TimeoutError:
+            return fetch_result(url, error="Tiempo de espera agotado")
+        except aiohttp.ClientError as e:
+            return fetch_result(url, error=f"{type(e).__name__}: {str(e)}")
+        except ValueError as e:  # URL inválida
+            return fetch_result(url, error=str(e))
+
+    async def _fetch_many(self, urls, headers):
+        return await asyncio.gather(*(self._fetch(url, extra) for url, extra in zip(urls, headers)))
+
+    def fetch(self, url, headers=None):
+        """Descarga una URL (bloquea el hilo que llama, no el bucle)"""
+        return self.fetch_many([url], [headers])[0]
+
+    def fetch_many(self, urls, headers=None):
+        """
+        Descarga varias URLs a la vez respetando los límites de conexión
+
+        Args:
+            urls: Lista de URLs
+            headers: Cabeceras adicionales por URL (lista paralela de diccionarios o None),
+                p. ej. If-None-Match para revalidar una copia en caché
+
+        Returns:
+            list: Un diccionario de fetch_result por URL, en el mismo orden
+        """
+        if not urls:
+            return []
+        urls = list(urls)
+        headers = list(headers) if headers is not None else [None] * len(urls)
+        future = asyncio.run_coroutine_threadsafe(self._fetch_many(urls, headers), self._loop)
+        return future.result()
+
+    def close(self):
+        """Cierra las conexiones y detiene el bucle"""
+        if self._loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_async_fetcher():
+    """AsyncFetcher del proceso con la configuración de config/settings.py (None sin aiohttp)"""
+    global _fetcher
+
+    if aiohttp is None:
+        return None
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                _fetcher = AsyncFetcher(
+                    FETCH_MAX_CONNECTIONS, FETCH_PER_HOST_LIMIT, FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT,
+                    FETCH_TOTAL_TIMEOUT, FETCH_MAX_BYTES
+                )
+    return _fetcher
+
+
+def _reset_after_fork():
+    """El hilo del bucle no sobrevive a un fork: el worker crea su propio cliente"""
+    global _fetcher, _fetcher_lock
+
+    _fetcher = None
+    _fetcher_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
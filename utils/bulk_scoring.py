@@ -0,0 +1,311 @@
+"""
+Puntuación masiva offline de archivos de noticias (xlsx, CSV o JSONL)
+
+Lee la entrada en streaming, reparte bloques entre procesos con su propio
+TruthLensBERT y escribe los resultados en orden y de forma incremental, con
+un checkpoint que permite reanudar tras una interrupción.
+
+Uso:
+    python -m utils.bulk_scoring archivo.csv resultados.jsonl --workers 4
+    python -m utils.bulk_scoring archivo.jsonl resultados_parquet/ --format parquet
+    python -m utils.bulk_scoring archivo.csv resultados.jsonl --resume
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+    pq = None
+
+# Columnas aceptadas para título y contenido (la primera que exista)
+TITLE_COLUMNS = ("Headline", "headline", "title", "Title", "titulo")
+TEXT_COLUMNS = ("Text", "text", "content", "Content", "contenido")
+# Campos escritos por cada elemento (esquema fijo para que todos los archivos Parquet coincidan)
+OUTPUT_FIELDS = ("row", "id", "prediction", "label", "confidence", "probability_fake",
+                 "probability_true", "decision_confidence", "error")
+
+# Modelo de cada proceso worker (se crea una vez en _init_worker)
+_worker_model = None
+
+
+def detect_format(path):
+    """Formato de entrada según la extensión ("xlsx", "csv" o "jsonl")"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        return "xlsx"
+    if extension in (".csv", ".tsv"):
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Formato de entrada no soportado: {extension}")
+
+
+def _pick(record, columns, override):
+    if override:
+        return record.get(override)
+    for column in columns:
+        if column in record:
+            return record[column]
+    return None
+
+
+def iter_items(path, input_format=None, title_column=None, text_column=None, id_column=None):
+    """
+    Recorre la entrada registro a registro sin cargarla entera en memoria
+
+    Yields:
+        dict: {'id', 'title', 'text'} por registro
+    """
+    input_format = input_format or detect_format(path)
+
+    if input_format == "xlsx":
+        from openpyxl import load_workbook
+
+        # read_only lee las filas en streaming desde el XML de la hoja
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell) if cell is not None else "" for cell in next(rows, ())]
+            records = (dict(zip(header, row)) for row in rows)
+            yield from _normalize(records, title_column, text_column, id_column)
+        finally:
+            workbook.close()
+    elif input_format == "csv":
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            delimiter = "\t" if path.lower().endswith(".tsv") else ","
+            yield from _normalize(csv.DictReader(f, delimiter=delimiter), title_column, text_column, id_column)
+    elif input_format == "jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            records = (json.loads(line) for line in f if line.strip())
+            yield from _normalize(records, title_column, text_column, id_column)
+    else:
+        raise ValueError(f"Formato de entrada no soportado: {input_format}")
+
+
+def _normalize(records, title_column, text_column, id_column):
+    for record in records:
+        title = _pick(record, TITLE_COLUMNS, title_column)
+        text = _pick(record, TEXT_COLUMNS, text_column)
+        yield {
+            'id': record.get(id_column) if id_column else None,
+            'title': "" if title is None else str(title),
+            'text': "" if text is None else str(text),
+        }
+
+
+def _init_worker(threads):
+    """Carga un TruthLensBERT por proceso (configuración de config/settings.py)"""
+    global _worker_model
+    import torch
+    from utils.models.model_manager import get_truth_lens_model
+
+    torch.set_num_threads(threads)
+    _worker_model = get_truth_lens_model()
+
+
+def _score_chunk(chunk, threshold, batch_size):
+    """Puntúa un bloque [(fila, id, título, texto)] dentro de un worker"""
+    results = _worker_model.predict_batch([(title, text) for _, _, title, text in chunk], threshold, batch_size)
+    records = []
+    for (row, item_id, _, _), result in zip(chunk, results):
+        record = {field: result.get(field) for field in OUTPUT_FIELDS}
+        record.update({'row': row, 'id': item_id})
+        records.append(record)
+    return records
+
+
+class _JsonlWriter:
+    """Salida JSONL en un único archivo; el checkpoint guarda el tamaño confirmado"""
+
+    def __init__(self, path, resume_state):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "ab" if resume_state else "wb")
+        if resume_state:
+            # Descartar líneas escritas después del último checkpoint
+            self._file.truncate(resume_state.get('output_bytes', 0))
+            self._file.seek(0, os.SEEK_END)
+
+    def write(self, records):
+        for record in records:
+            self._file.write((json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def state(self):
+        return {'output_bytes': self._file.tell()}
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    """Salida Parquet como directorio de archivos part-NNNNN.parquet (uno por bloque confirmado)"""
+
+    def __init__(self, path, resume_state):
+        if pa is None:
+            raise RuntimeError("pyarrow no está instalado (pip install pyarrow) para escribir Parquet")
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.parts = resume_state.get('parts', 0) if resume_state else 0
+        # Eliminar partes huérfanas posteriores al último checkpoint
+        for name in os.listdir(path):
+            if name.startswith("part-") and name.endswith(".parquet") and int(name[5:10]) >= self.parts:
+                os.remove(os.path.join(path, name))
+
+    def write(self, records):
+        columns = {field: [record[field] for record in records] for field in OUTPUT_FIELDS}
+        columns['id'] = [None if value is None else str(value) for value in columns['id']]
+        table = pa.table(columns)
+        part_path = os.path.join(self.path, f"part-{self.parts:05d}.parquet")
+        pq.write_table(table, f"{part_path}.tmp")
+        os.replace(f"{part_path}.tmp", part_path)
+        self.parts += 1
+
+    def state(self):
+        return {'parts': self.parts}
+
+    def close(self):
+        pass
+
+
+def _load_checkpoint(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save_checkpoint(path, state):
+    """Escritura atómica: un corte a mitad nunca deja un checkpoint corrupto"""
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def score_file(input_path, output_path, output_format="jsonl", workers=1, chunk_size=256,
+               batch_size=32, threshold=0.7, resume=False, input_format=None,
+               title_column=None, text_column=None, id_column=None, report_every=10.0):
+    """
+    Puntúa un archivo completo con memoria acotada
+
+    Como mucho `2 * workers` bloques de `chunk_size` elementos están en vuelo a la
+    vez, y los resultados se escriben en el orden de entrada: la memoria no
+    depende del tamaño del archivo.
+
+    Returns:
+        dict: Elementos procesados, segundos y elementos por segundo
+    """
+    checkpoint_path = f"{output_path.rstrip(os.sep)}.checkpoint.json"
+    state = _load_checkpoint(checkpoint_path) if resume else None
+    if state and state.get('input') != os.path.abspath(input_path):
+        raise ValueError(f"El checkpoint {checkpoint_path} corresponde a otra entrada: {state.get('input')}")
+    skip = state['processed'] if state else 0
+    if state:
+        print(f"↩️ Reanudando desde el elemento {skip}")
+
+    writer_class = _ParquetWriter if output_format == "parquet" else _JsonlWriter
+    writer = writer_class(output_path, state)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    def chunks():
+        chunk = []
+        for row, item in enumerate(iter_items(input_path, input_format, title_column, text_column, id_column)):
+            if row < skip:
+                continue
+            chunk.append((row, item['id'], item['title'], item['text']))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    processed = skip
+    start = last_report = time.perf_counter()
+    in_flight = deque()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                 initializer=_init_worker, initargs=(threads,)) as executor:
+            pending = chunks()
+            exhausted = False
+            while True:
+                # Mantener la ventana de bloques en vuelo llena
+                while not exhausted and len(in_flight) < 2 * workers:
+                    chunk = next(pending, None)
+                    if chunk is None:
+                        exhausted = True
+                        break
+                    in_flight.append(executor.submit(_score_chunk, chunk, threshold, batch_size))
+                if not in_flight:
+                    break
+
+                # Escribir en orden: esperar siempre al bloque más antiguo
+                records = in_flight.popleft().result()
+                writer.write(records)
+                processed += len(records)
+                _save_checkpoint(checkpoint_path, {
+                    'input': os.path.abspath(input_path),
+                    'processed': processed,
+                    **writer.state()
+                })
+
+                now = time.perf_counter()
+                if now - last_report >= report_every:
+                    rate = (processed - skip) / (now - start)
+                    print(f"⏳ {processed} elementos ({rate:.1f} elementos/s)", file=sys.stderr)
+                    last_report = now
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        'processed': processed,
+        'processed_this_run': processed - skip,
+        'seconds': elapsed,
+        'items_per_second': (processed - skip) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    from config.settings import PREDICT_BATCH_SIZE
+
+    parser = argparse.ArgumentParser(description='Puntuación masiva offline con TruthLensBERT')
+    parser.add_argument('input', help='Archivo de entrada (.xlsx, .csv o .jsonl)')
+    parser.add_argument('output', help='Archivo JSONL o directorio Parquet de salida')
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl', help='Formato de salida')
+    parser.add_argument('--input-format', choices=['xlsx', 'csv', 'jsonl'], help='Forzar el formato de entrada')
+    parser.add_argument('--workers', type=int, default=1, help='Procesos worker (cada uno con su modelo)')
+    parser.add_argument('--chunk-size', type=int, default=256, help='Elementos por bloque enviado a un worker')
+    parser.add_argument('--batch-size', type=int, default=PREDICT_BATCH_SIZE, help='Elementos por forward pass')
+    parser.add_argument('--threshold', type=float, default=0.7, help='Umbral de predicción')
+    parser.add_argument('--title-column', help='Columna del título (por defecto Headline/title)')
+    parser.add_argument('--text-column', help='Columna del contenido (por defecto Text/text)')
+    parser.add_argument('--id-column', help='Columna de identificador a copiar en la salida')
+    parser.add_argument('--resume', action='store_true', help='Reanudar desde el checkpoint de la salida')
+    args = parser.parse_args()
+
+    if args.workers < 1 or args.chunk_size < 1:
+        parser.error("--workers y --chunk-size deben ser >= 1")
+
+    summary = score_file(
+        args.input, args.output, output_format=args.format, workers=args.workers,
+        chunk_size=args.chunk_size, batch_size=args.batch_size, threshold=args.threshold,
+        resume=args.resume, input_format=args.input_format, title_column=args.title_column,
+        text_column=args.text_column, id_column=args.id_column
+    )
+    print(f"✅ {summary['processed_this_run']} elementos en {summary['seconds']:.1f}s "
+          f"({summary['items_per_second']:.1f} elementos/s); total en la salida: {summary['processed']}")
+
+if __name__ == "__main__":
+    main()
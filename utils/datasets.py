@@ -0,0 +1,29 @@
+"""
+Carga de los datasets etiquetados (data/train.xlsx, data/development.xlsx)
+"""
+import pandas as pd
+
+
+def load_labeled_dataset(file_path, limit=None):
+    """
+    Carga un dataset etiquetado con las columnas Headline, Text y Category
+
+    Args:
+        file_path: Ruta del archivo Excel
+        limit: Número máximo de filas a cargar (None = todas)
+
+    Returns:
+        list: Diccionarios {'title', 'text', 'label'} con label 1 = Fake, 0 = True
+    """
+    df = pd.read_excel(file_path).fillna("")
+    if limit:
+        df = df.head(limit)
+
+    return [
+        {
+            'title': str(row['Headline']),
+            'text': str(row['Text']),
+            'label': 1 if str(row['Category']).strip().lower() == 'fake' else 0
+        }
+        for _, row in df.iterrows()
+    ]
@@ -0,0 +1,289 @@
+"""
+Caché persistente de páginas descargadas (SQLite) con revalidación condicional
+
+Cada URL se guarda con su clave canónica (sin fragmento ni parámetros de
+seguimiento como utm_*), el cuerpo comprimido con zlib, sus validadores
+(ETag / Last-Modified) y el article_data ya extraído. Mientras la entrada está
+fresca (FETCH_CACHE_TTL_SECONDS) se devuelve el article_data sin descargar ni
+parsear; después se revalida con un GET condicional y un 304 solo renueva la
+entrada. Si la revalidación falla por red o por un 5xx, se sirve la copia
+caducada marcada como `stale`. El tamaño total se limita expulsando las
+entradas usadas hace más tiempo.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config.settings import FETCH_CACHE_ENABLED, FETCH_CACHE_PATH, FETCH_CACHE_TTL_SECONDS, FETCH_CACHE_MAX_BYTES
+
+# Parámetros de consulta que no cambian el contenido de la página
+TRACKING_PARAMS = frozenset((
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "ref_src", "ref_url", "cmpid", "ocid",
+))
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Un acierto solo reescribe accessed_at si el valor guardado tiene más de estos segundos
+ACCESS_UPDATE_INTERVAL_SECONDS = 60
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS pages ("
+    "key TEXT PRIMARY KEY, final_url TEXT NOT NULL, status INTEGER, body BLOB NOT NULL, "
+    "etag TEXT, last_modified TEXT, article TEXT NOT NULL, parser_version INTEGER NOT NULL, "
+    "size INTEGER NOT NULL, validated_at REAL NOT NULL, accessed_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)",
+    # Entradas y bytes totales mantenidos por triggers: leerlos no recorre la tabla
+    "CREATE TABLE IF NOT EXISTS pages_summary (id INTEGER PRIMARY KEY CHECK (id = 1), "
+    "entries INTEGER NOT NULL, bytes INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO pages_summary (id, entries, bytes) SELECT 1, COUNT(*), COALESCE(SUM(size), 0) FROM pages",
+    "CREATE TRIGGER IF NOT EXISTS pages_summary_insert AFTER INSERT ON pages BEGIN "
+    "UPDATE pages_summary SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS pages_summary_delete AFTER DELETE ON pages BEGIN "
+    "UPDATE pages_summary SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS pages_summary_update AFTER UPDATE OF size ON pages BEGIN "
+    "UPDATE pages_summary SET bytes = bytes + NEW.size - OLD.size WHERE id = 1; END",
+)
+
+
+def canonical_url(url):
+    """
+    Clave de caché de una URL
+
+    Esquema y host en minúsculas, sin puerto por defecto, sin fragmento, sin
+    parámetros de seguimiento (utm_*, fbclid, ...) y con la consulta ordenada.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith("utm_") and name.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+def _header(headers, name):
+    # aiohttp y requests devuelven las cabeceras con su capitalización original
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+class FetchCache:
+    """
+    Páginas descargadas y su article_data en una base SQLite compartida por los workers
+
+    Args:
+        path: Ruta del archivo SQLite
+        ttl_seconds: Segundos que una entrada se sirve sin revalidar
+        max_bytes: Tamaño máximo de los cuerpos comprimidos y article_data guardados
+    """
+
+    def __init__(self, path, ttl_seconds=900, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._stale = 0
+        self._revalidated = 0
+        self._stale_served = 0
+        self._misses = 0
+        self._evictions = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            # Resumen y triggers en la misma transacción: ninguna escritura de otro worker queda sin contar
+            self._db.execute("BEGIN IMMEDIATE")
+            for statement in _SCHEMA:
+                self._db.execute(statement)
+
+    def lookup(self, url):
+        """
+        Entrada guardada para la URL (sin el cuerpo) o None
+
+        Returns:
+            dict: key, final_url, etag, last_modified, article (copia), parser_version
+                y fresh (True si no hace falta revalidar)
+        """
+        key = canonical_url(url)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT final_url, etag, last_modified, article, parser_version, validated_at, accessed_at "
+                "FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            final_url, etag, last_modified, article, parser_version, validated_at, accessed_at = row
+            # El orden LRU no necesita precisión de segundos: la mayoría de aciertos no escriben
+            if now - accessed_at > ACCESS_UPDATE_INTERVAL_SECONDS:
+                with self._db:
+                    self._db.execute("UPDATE pages SET accessed_at = ? WHERE key = ?", (now, key))
+            fresh = now - validated_at < self.ttl_seconds
+            if fresh:
+                self._hits += 1
+            else:
+                self._stale += 1
+        return {
+            'key': key,
+            'final_url': final_url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'article': json.loads(article),
+            'parser_version': parser_version,
+            'fresh': fresh,
+        }
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Cabeceras If-None-Match / If-Modified-Since para revalidar una entrada"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def body(self, key):
+        """Cuerpo descomprimido de una entrada, o None"""
+        with self._lock:
+            row = self._db.execute("SELECT body FROM pages WHERE key = ?", (key,)).fetchone()
+        return zlib.decompress(row[0]) if row is not None else None
+
+    def store(self, url, page, article, parser_version):
+        """
+        Guarda una respuesta 200 (diccionario de fetch_result) y su article_data
+
+        Las respuestas con Cache-Control: no-store no se guardan.
+        """
+        headers = page.get('headers')
+        if "no-store" in (_header(headers, "cache-control") or "").lower():
+            return
+        key = canonical_url(url)
+        body = zlib.compress(page.get('content') or b"", 6)
+        article = json.dumps(article, ensure_ascii=False)
+        size = len(body) + len(article.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._db:
+            # UPSERT en lugar de INSERT OR REPLACE: el borrado implícito de REPLACE no dispara triggers
+            self._db.execute(
+                "INSERT INTO pages (key, final_url, status, body, etag, last_modified, article, "
+                "parser_version, size, validated_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET final_url = excluded.final_url, status = excluded.status, "
+                "body = excluded.body, etag = excluded.etag, last_modified = excluded.last_modified, "
+                "article = excluded.article, parser_version = excluded.parser_version, size = excluded.size, "
+                "validated_at = excluded.validated_at, accessed_at = excluded.accessed_at",
+                (key, page.get('final_url') or url, page.get('status'), body, _header(headers, "etag"),
+                 _header(headers, "last-modified"), article, parser_version, size, now, now)
+            )
+            self._evict()
+
+    def revalidated(self, key, headers=None):
+        """Marca una entrada como vigente tras un 304 (y renueva sus validadores si llegan)"""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE pages SET validated_at = ?, etag = COALESCE(?, etag), "
+                "last_modified = COALESCE(?, last_modified) WHERE key = ?",
+                (time.time(), _header(headers, "etag"), _header(headers, "last-modified"), key)
+            )
+            self._revalidated += 1
+
+    def served_stale(self):
+        """Cuenta una entrada caducada servida porque la revalidación falló"""
+        with self._lock:
+            self._stale_served += 1
+
+    def update_article(self, key, article, parser_version):
+        """Sustituye el article_data de una entrada (re-parseado con otra versión del extractor)"""
+        article = json.dumps(article, ensure_ascii=False)
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE pages SET article = ?, parser_version = ?, size = length(body) + ? WHERE key = ?",
+                (article, parser_version, len(article.encode("utf-8")), key)
+            )
+
+    def _evict(self):
+        """Expulsa las entradas accedidas hace más tiempo hasta quedar por debajo de max_bytes"""
+        total = self._db.execute("SELECT bytes FROM pages_summary WHERE id = 1").fetchone()[0]
+        while total > self.max_bytes:
+            rows = self._db.execute("SELECT key, size FROM pages ORDER BY accessed_at LIMIT 64").fetchall()
+            if not rows:
+                break
+            expelled = []
+            for key, size in rows:
+                expelled.append((key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+            self._db.executemany("DELETE FROM pages WHERE key = ?", expelled)
+            self._evictions += len(expelled)
+
+    def stats(self):
+        """
+        Entradas, bytes y contadores
+
+        stale son las consultas de entradas caducadas; de ellas, revalidated se
+        confirmaron con 304 y stale_served se sirvieron porque la revalidación falló.
+        """
+        with self._lock:
+            entries, size = self._db.execute("SELECT entries, bytes FROM pages_summary WHERE id = 1").fetchone()
+            lookups = self._hits + self._stale + self._misses
+            return {
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "stale": self._stale,
+                "revalidated": self._revalidated,
+                "stale_served": self._stale_served,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": ((self._hits + self._revalidated) / lookups) if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_fetch_cache():
+    """FetchCache del proceso, o None con FETCH_CACHE_ENABLED=False"""
+    global _cache
+
+    if not FETCH_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FetchCache(FETCH_CACHE_PATH, FETCH_CACHE_TTL_SECONDS, FETCH_CACHE_MAX_BYTES)
+    return _cache
+
+
+def _reset_after_fork():
+    """La conexión SQLite del padre no debe usarse en el hijo"""
+    global _cache, _cache_lock
+
+    _cache = None
+    _cache_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,241 @@
+"""
+Trabajos asíncronos para análisis lentos (documentos largos, URLs, OCR)
+
+Una petición con `?async=1` recibe un id de trabajo al instante; el análisis se
+ejecuta en un pool de hilos propio de cada tipo de trabajo, así que una cola de
+URLs lentas no retrasa las predicciones de texto. El estado y el resultado de
+cada trabajo se guardan en SQLite (modo WAL), de modo que cualquier worker de
+gunicorn puede responder a /jobs/<id> aunque el trabajo se ejecute en otro.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config.settings import JOBS_CONCURRENCY, JOBS_MAX_QUEUED, JOBS_TTL_SECONDS, JOBS_DB_PATH
+from utils.metrics import collect, get_metrics_registry
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    "id TEXT PRIMARY KEY, type TEXT NOT NULL, status TEXT NOT NULL, pid INTEGER NOT NULL, "
+    "created_at REAL NOT NULL, started_at REAL, finished_at REAL, result TEXT)",
+    "CREATE INDEX IF NOT EXISTS jobs_status_type ON jobs (status, type)",
+    "CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)",
+)
+_PUBLIC_FIELDS = ("id", "type", "status", "created_at", "started_at", "finished_at")
+
+
+class JobQueueFull(Exception):
+    """Demasiados trabajos pendientes de este tipo"""
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobManager:
+    """
+    Registro de trabajos compartido en SQLite con un ThreadPoolExecutor acotado por tipo
+
+    Cada trabajo se ejecuta en el worker que lo recibió. Un hilo de limpieza
+    elimina cada poco los trabajos terminados hace más de `ttl_seconds`, y marca
+    como fallidos los pendientes de un worker que ya no existe.
+    """
+
+    def __init__(self, concurrency, max_queued=100, ttl_seconds=600, path=JOBS_DB_PATH):
+        """
+        Args:
+            concurrency: Diccionario {tipo: hilos} (los tipos no listados usan 1 hilo)
+            max_queued: Máximo de trabajos en cola o en ejecución por tipo en este worker
+            ttl_seconds: Segundos que se conserva el resultado de un trabajo terminado
+            path: Ruta del archivo SQLite compartido por los workers
+        """
+        self.concurrency = dict(concurrency)
+        self.max_queued = max_queued
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._executors = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="truthlens-jobs-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def submit(self, job_type, func, *args):
+        """
+        Encola `func(*args)`, que debe devolver (cuerpo, código HTTP[, cabeceras])
+
+        Returns:
+            str: Id del trabajo
+
+        Raises:
+            JobQueueFull: Si el tipo ya tiene `max_queued` trabajos pendientes en este worker
+        """
+        pid = os.getpid()
+        with self._lock, self._db:
+            pending = self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running') AND type = ? AND pid = ?",
+                (job_type, pid)
+            ).fetchone()[0]
+            if pending >= self.max_queued:
+                raise JobQueueFull(f"Hay {pending} trabajos '{job_type}' pendientes")
+
+            job_id = uuid.uuid4().hex
+            self._db.execute(
+                "INSERT INTO jobs (id, type, status, pid, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, job_type, pid, time.time())
+            )
+            executor = self._executors.get(job_type)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=max(1, self.concurrency.get(job_type, 1)),
+                    thread_name_prefix=f"truthlens-job-{job_type}"
+                )
+                self._executors[job_type] = executor
+
+        executor.submit(self._run, job_id, job_type, func, args)
+        return job_id
+
+    def get(self, job_id):
+        """Estado público del trabajo (sin el resultado) o None si no existe o expiró"""
+        found = self.result(job_id)
+        return found[0] if found is not None else None
+
+    def result(self, job_id):
+        """
+        Resultado del trabajo
+
+        Returns:
+            tuple: (estado, (cuerpo, código HTTP[, cabeceras]) o None si aún no terminó); None si no existe
+        """
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(_PUBLIC_FIELDS)}, result FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(_PUBLIC_FIELDS, row))
+        if job['finished_at'] is not None and job['finished_at'] < time.time() - self.ttl_seconds:
+            return None
+        return job, (tuple(json.loads(row[-1])) if row[-1] is not None else None)
+
+    def stats(self):
+        """Trabajos por tipo y estado (de todos los workers)"""
+        with self._lock:
+            rows = self._db.execute("SELECT type, status, COUNT(*) FROM jobs GROUP BY type, status").fetchall()
+        counts = {}
+        for job_type, status, count in rows:
+            counts.setdefault(job_type, {"queued": 0, "running": 0, "done": 0, "failed": 0})[status] = count
+        return {
+            "concurrency": self.concurrency,
+            "max_queued": self.max_queued,
+            "ttl_seconds": self.ttl_seconds,
+            "jobs": counts,
+        }
+
+    def _run(self, job_id, job_type, func, args):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), job_id)
+            )
+
+        start = time.perf_counter()
+        with collect() as timings:
+            try:
+                result = tuple(func(*args))
+                if len(result) > 2:
+                    result = (result[0], result[1], dict(result[2]))
+                encoded = json.dumps(result, ensure_ascii=False)
+                outcome = "done"
+            except Exception as e:
+                print(f"❌ Error en trabajo {job_id}: {str(e)}")
+                result = ({"error": f"Error en el trabajo: {str(e)}"}, 500)
+                encoded = json.dumps(result, ensure_ascii=False)
+                outcome = "failed"
+
+        registry = get_metrics_registry()
+        if registry is not None:
+            # Los trabajos se miden aparte de la ruta que los encoló (que responde 202 al instante)
+            registry.record(f"job:{job_type}", result[1], time.perf_counter() - start, timings)
+
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ? WHERE id = ?",
+                (outcome, time.time(), encoded, job_id)
+            )
+
+    def sweep(self):
+        """
+        Elimina los trabajos terminados hace más de ttl_seconds y da por fallidos
+        los pendientes de workers que ya no existen
+
+        Returns:
+            int: Trabajos eliminados
+        """
+        now = time.time()
+        with self._lock, self._db:
+            deleted = self._db.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+            pids = [pid for (pid,) in self._db.execute(
+                "SELECT DISTINCT pid FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchall()]
+            orphaned = json.dumps(({"error": "El worker que ejecutaba el trabajo terminó"}, 500))
+            for pid in pids:
+                if pid != os.getpid() and not _pid_alive(pid):
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'failed', finished_at = ?, result = ? "
+                        "WHERE pid = ? AND status IN ('queued', 'running')", (now, orphaned, pid)
+                    )
+        return deleted
+
+    def _sweep_loop(self):
+        interval = min(60.0, max(1.0, self.ttl_seconds / 2))
+        while True:
+            time.sleep(interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️ No se pudieron limpiar los trabajos expirados: {str(e)}")
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """JobManager del proceso con la configuración de config/settings.py (creación perezosa)"""
+    global _job_manager
+
+    if _job_manager is None:
+        with _job_manager_lock:
+            if _job_manager is None:
+                _job_manager = JobManager(JOBS_CONCURRENCY, JOBS_MAX_QUEUED, JOBS_TTL_SECONDS)
+    return _job_manager
+
+
+def _reset_after_fork():
+    """La conexión SQLite, los pools y el hilo de limpieza del padre no sirven en el hijo"""
+    global _job_manager, _job_manager_lock
+
+    _job_manager = None
+    _job_manager_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,161 @@
+"""
+Tiempos por etapa de cada petición e histogramas por ruta en formato de texto de Prometheus
+
+Las etapas se miden con `stage(nombre)` en el código del análisis. Los tiempos se
+acumulan en un diccionario propio de la petición (contextvars), así que fuera de
+una petición medida `stage` solo consulta una variable de contexto y no mide nada.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from config.settings import METRICS_ENABLED
+
+# Segundos; el último cubo (+Inf) es implícito
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_timings = contextvars.ContextVar("truthlens_stage_timings", default=None)
+
+
+class _Stage:
+    __slots__ = ("name", "timings", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.timings = _timings.get()
+        if self.timings is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings[self.name] = self.timings.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+def stage(name):
+    """Suma el tiempo del bloque `with` a la etapa `name` de la petición actual (si se está midiendo)"""
+    return _Stage(name)
+
+
+def current_timings():
+    """Diccionario {etapa: segundos} de la petición actual, o None si no se está midiendo"""
+    return _timings.get()
+
+
+@contextmanager
+def collect(timings=None):
+    """
+    Mide las etapas del bloque en `timings` (un diccionario nuevo si se omite)
+
+    Sirve para hilos que trabajan por cuenta de otras peticiones: el planificador de
+    micro-lotes mide un lote y reparte sus tiempos con `merge_timings`.
+    """
+    timings = {} if timings is None else timings
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def start_timings():
+    """Empieza a medir las etapas en el contexto actual; devuelve el token para `stop_timings`"""
+    return _timings.set({})
+
+
+def stop_timings(token):
+    """Deja de medir y restaura el contexto anterior a `start_timings`"""
+    _timings.reset(token)
+
+
+def merge_timings(target, timings):
+    """Suma los tiempos de `timings` a `target` (sin efecto si target es None)"""
+    if target is None:
+        return
+    for name, seconds in timings.items():
+        target[name] = target.get(name, 0.0) + seconds
+
+
+def timings_ms(timings=None):
+    """Tiempos de la petición actual en milisegundos, para debug_info"""
+    timings = _timings.get() if timings is None else timings
+    return {name: round(seconds * 1000, 3) for name, seconds in (timings or {}).items()}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas (cubos fijos, como los de Prometheus)"""
+
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, labels, seconds):
+        """Registra una observación; llamar con el bloqueo del registro tomado"""
+        series = self._series.get(labels)
+        if series is None:
+            # Un contador por cubo más +Inf, suma y total
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, seconds)] += 1
+        series[1] += seconds
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label_text},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Histogramas de duración de peticiones y de etapas por ruta"""
+
+    def __init__(self, buckets=BUCKETS):
+        self._lock = threading.Lock()
+        self.requests = Histogram(
+            "truthlens_request_duration_seconds", "Duración de las peticiones por ruta y código HTTP",
+            ("route", "status"), buckets
+        )
+        self.stages = Histogram(
+            "truthlens_stage_duration_seconds", "Duración de cada etapa del análisis por ruta",
+            ("route", "stage"), buckets
+        )
+
+    def record(self, route, status, seconds, timings):
+        """Registra una petición terminada y el tiempo de cada una de sus etapas"""
+        with self._lock:
+            self.requests.observe((route, str(status)), seconds)
+            for name, stage_seconds in timings.items():
+                self.stages.observe((route, name), stage_seconds)
+
+    def render(self):
+        """Texto de exposición de Prometheus (text/plain; version=0.0.4)"""
+        with self._lock:
+            lines = self.requests.render() + self.stages.render()
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry():
+    """Registro de métricas del proceso (None si METRICS_ENABLED es False)"""
+    return _registry if METRICS_ENABLED else None
@@ -0,0 +1,133 @@
+"""
+Backends de inferencia intercambiables para TruthLensBERT (PyTorch y ONNX Runtime)
+"""
+import hashlib
+import os
+
+import torch
+
+# Dependencia opcional para el backend ONNX
+try:
+    import onnxruntime  # type: ignore
+except Exception:
+    onnxruntime = None
+
+BACKENDS = ("torch", "onnx")
+ONNX_OPSET = 17
+
+
+class TorchBackend:
+    """Forward pass con PyTorch eager (comportamiento original)"""
+
+    name = "torch"
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+
+    def __call__(self, inputs):
+        """Devuelve los logits (N, 2) como tensor de torch"""
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        with torch.no_grad():
+            return self.model(**inputs).logits
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Envoltorio para exportar solo los logits con entradas posicionales fijas"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        return self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            token_type_ids=token_type_ids
+        ).logits
+
+
+class OnnxBackend:
+    """
+    Forward pass con ONNX Runtime sobre un grafo exportado una sola vez
+
+    El grafo se guarda en `cache_dir` con un nombre derivado de los archivos del
+    modelo, de modo que un modelo reentrenado invalida la caché automáticamente.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path, cache_dir, load_torch_model, intra_op_threads=0):
+        """
+        Args:
+            model_path: Ruta del modelo fine-tuned (BERT_MODEL_PATH)
+            cache_dir: Directorio donde se guarda el grafo exportado
+            load_torch_model: Callable que devuelve el modelo PyTorch (solo se usa al exportar)
+            intra_op_threads: Hilos intra-op de ONNX Runtime (0 = valor por defecto)
+        """
+        if onnxruntime is None:
+            raise RuntimeError("onnxruntime no instalado en el servidor")
+
+        self.onnx_path = os.path.join(cache_dir, f"truthlens-{model_fingerprint(model_path)}.onnx")
+        if not os.path.exists(self.onnx_path):
+            export_onnx(load_torch_model(), self.onnx_path)
+        else:
+            print(f"♻️ Usando grafo ONNX en caché: {self.onnx_path}")
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+
+        self.session = onnxruntime.InferenceSession(
+            self.onnx_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def __call__(self, inputs):
+        """Devuelve los logits (N, 2) como tensor de torch"""
+        feeds = {}
+        for name in self.input_names:
+            value = inputs.get(name)
+            if value is None:  # token_type_ids ausentes en algunos tokenizers
+                value = torch.zeros_like(inputs["input_ids"])
+            feeds[name] = value.cpu().numpy().astype("int64")
+        logits = self.session.run(["logits"], feeds)[0]
+        return torch.from_numpy(logits)
+
+
+def model_fingerprint(model_path):
+    """Huella corta de los archivos del modelo (nombre, tamaño y fecha) más versión de torch"""
+    digest = hashlib.sha256(f"{torch.__version__}|opset{ONNX_OPSET}".encode())
+    for name in sorted(os.listdir(model_path)):
+        full_path = os.path.join(model_path, name)
+        if os.path.isfile(full_path):
+            stat = os.stat(full_path)
+            digest.update(f"{name}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def export_onnx(model, onnx_path):
+    """Exporta el modelo a ONNX con ejes dinámicos de lote y secuencia (escritura atómica)"""
+    print(f"📦 Exportando modelo a ONNX: {onnx_path}")
+    os.makedirs(os.path.dirname(onnx_path) or ".", exist_ok=True)
+
+    model = model.to("cpu").eval()
+    dummy = torch.ones((1, 16), dtype=torch.long)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in ("input_ids", "attention_mask", "token_type_ids")}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    tmp_path = f"{onnx_path}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model),
+            (dummy, dummy, torch.zeros_like(dummy)),
+            tmp_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+            dynamo=False
+        )
+    os.replace(tmp_path, onnx_path)
+    print("✅ Exportación ONNX completada")
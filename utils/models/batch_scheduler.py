@@ -0,0 +1,121 @@
+"""
+Planificador de micro-lotes para inferencia BERT entre peticiones concurrentes
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from utils.metrics import collect, current_timings, merge_timings
+
+
+class MicroBatchScheduler:
+    """
+    Agrupa peticiones concurrentes en micro-lotes y ejecuta un único forward pass
+
+    Cada llamada a `predict` encola la petición y bloquea hasta recibir su propio
+    diccionario de resultado, idéntico al que devolvería `TruthLensBERT.predict`.
+    Un hilo de fondo forma lotes de hasta `max_batch_size` peticiones, esperando
+    como mucho `max_wait_ms` desde la primera petición del lote. Con `workers > 1`
+    (por ejemplo, uno por réplica de ModelPool) varios lotes se ejecutan en paralelo.
+    """
+
+    def __init__(self, model, max_batch_size=8, max_wait_ms=5, workers=1):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size debe ser >= 1")
+
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._closed = False
+
+        self._workers = [
+            threading.Thread(target=self._run, name=f"truthlens-batcher-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def predict(self, headline, text="", threshold=0.7):
+        """Misma interfaz que TruthLensBERT.predict, pero agrupando en lotes"""
+        if self._closed:
+            raise RuntimeError("El planificador de lotes está cerrado")
+
+        future = Future()
+        # Los tiempos del lote se suman a los de la petición que espera (ver utils.metrics)
+        self._queue.put((headline, text, threshold, current_timings(), future))
+        return future.result()
+
+    def predict_batch(self, items, threshold=0.7):
+        """Los lotes explícitos ya vienen agrupados: van directos al modelo sin pasar por la cola"""
+        return self.model.predict_batch(items, threshold)
+
+    def close(self):
+        """Detiene los hilos de fondo tras procesar las peticiones pendientes"""
+        self._closed = True
+        self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def stats(self):
+        """Estadísticas de agrupamiento (lotes ejecutados y tamaño medio)"""
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": (self._items / self._batches) if self._batches else 0.0,
+                "queue_depth": self._queue.qsize(),
+            }
+
+    def _collect_batch(self, first):
+        """Reúne peticiones hasta llenar el lote o agotar el tiempo de espera"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Reencolar la señal de cierre para salir tras este lote
+                self._queue.put(None)
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                # Propagar la señal de cierre al resto de hilos
+                self._queue.put(None)
+                return
+
+            batch = self._collect_batch(first)
+            requests = [(headline, text, threshold) for headline, text, threshold, _, _ in batch]
+
+            try:
+                with collect() as timings:
+                    results = self.model.predict_many(requests)
+            except Exception as e:
+                for *_, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+
+            for (*_, request_timings, future), result in zip(batch, results):
+                merge_timings(request_timings, timings)
+                future.set_result(result)
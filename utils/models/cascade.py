@@ -0,0 +1,254 @@
+"""
+Cascada barata-primero: clasificador lineal de n-gramas con hashing que solo
+escala a TruthLensBERT cuando su probabilidad cae dentro de la banda de duda
+
+Uso:
+    python -m utils.models.cascade train   # entrena con data/train.xlsx y guarda CASCADE_MODEL_PATH
+    python -m utils.models.cascade tune    # compara accuracy vs % de llamadas a BERT evitadas
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import zlib
+
+import numpy as np
+
+from utils.text_cleaning import clean_text
+
+
+class HashedNgramClassifier:
+    """Regresión logística sobre unigramas y bigramas con hashing (sin vocabulario)"""
+
+    def __init__(self, n_features=2 ** 18, weights=None, bias=0.0, max_words=512):
+        self.n_features = n_features
+        self.weights = weights if weights is not None else np.zeros(n_features, dtype=np.float32)
+        self.bias = float(bias)
+        self.max_words = max_words
+
+    def features(self, headline, text=""):
+        """
+        Vector disperso (índices, valores) con la misma limpieza que TruthLensBERT
+
+        El titular se repite como en la entrada de BERT; los pesos son log(1 + tf)
+        normalizados a norma L2. crc32 es estable entre procesos (a diferencia de hash()).
+        """
+        headline_clean = clean_text(headline, max_words=self.max_words).lower()
+        text_clean = clean_text(text, max_words=self.max_words).lower()
+        words = f"{headline_clean} {headline_clean} {text_clean}".split()
+
+        counts = {}
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for gram in grams:
+            index = zlib.crc32(gram.encode("utf-8")) % self.n_features
+            counts[index] = counts.get(index, 0) + 1
+
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        return indices, values / np.linalg.norm(values)
+
+    def predict_proba(self, headline, text=""):
+        """Probabilidad de fake en [0, 1]"""
+        indices, values = self.features(headline, text)
+        return float(self._sigmoid(float(values @ self.weights[indices]) + self.bias))
+
+    def fit(self, items, epochs=15, learning_rate=0.5, l2=1e-5, seed=42):
+        """
+        Entrena con SGD sobre los diccionarios {'title', 'text', 'label'} de utils.datasets
+        """
+        samples = [(*self.features(item['title'], item['text']), item['label']) for item in items]
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(samples)
+            rate = learning_rate / (1 + epoch)
+            for indices, values, label in samples:
+                error = self._sigmoid(float(values @ self.weights[indices]) + self.bias) - label
+                self.weights[indices] -= rate * (error * values + l2 * self.weights[indices])
+                self.bias -= rate * float(error)
+        return self
+
+    @property
+    def version(self):
+        """Huella de los pesos (forma parte de la clave de la caché de predicciones)"""
+        digest = hashlib.sha256(self.weights.tobytes())
+        digest.update(float(self.bias).hex().encode())
+        return digest.hexdigest()[:12]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(f, weights=self.weights, bias=self.bias, n_features=self.n_features)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(int(data["n_features"]), weights=data["weights"].astype(np.float32), bias=float(data["bias"]))
+
+    @staticmethod
+    def _sigmoid(z):
+        return 1.0 / (1.0 + np.exp(-z)) if z >= 0 else np.exp(z) / (1.0 + np.exp(z))
+
+
+class CascadePredictor:
+    """
+    Interfaz `predict` que responde con el prefiltro si está seguro y, si no, con BERT
+
+    Fuera de la banda de duda el veredicto es el del propio prefiltro (Fake por
+    encima de `high`, True por debajo de `low`); la calibración de BERT, con
+    umbrales de hasta 0.85, lo contradiría justo en los bordes de la banda.
+    `decided_by` indica qué etapa decidió ("prefilter" o "bert").
+    """
+
+    def __init__(self, prefilter, predictor, low=0.3, high=0.7):
+        """
+        Args:
+            prefilter: HashedNgramClassifier entrenado
+            predictor: Objeto con `predict(headline, text, threshold)` (BERT)
+            low: Por debajo, el prefiltro responde True sin consultar BERT
+            high: Por encima, el prefiltro responde Fake sin consultar BERT
+        """
+        if not 0.0 <= low < high <= 1.0:
+            raise ValueError("La banda de duda debe cumplir 0 <= low < high <= 1")
+        self.prefilter = prefilter
+        self.predictor = predictor
+        self.low = low
+        self.high = high
+
+    @property
+    def version(self):
+        return f"cascade-{self.prefilter.version}-{self.low}-{self.high}"
+
+    def _prefilter_result(self, prob_fake, threshold):
+        """Resultado con el formato de BERT y la etiqueta que marca la banda del prefiltro"""
+        from utils.models.truthlens_bert import TruthLensBERT
+
+        result = TruthLensBERT.calibrate(prob_fake, 1.0 - prob_fake, threshold)
+        is_fake = prob_fake >= self.high
+        result.update({
+            'prediction': 'Fake' if is_fake else 'True',
+            'label': int(is_fake),
+            'confidence': prob_fake if is_fake else 1.0 - prob_fake,
+            'threshold_used': self.high,
+            'calibration_applied': False,
+        })
+        return result
+
+    def predict(self, headline, text="", threshold=0.7):
+        prob_fake = self.prefilter.predict_proba(headline, text)
+        if self.low < prob_fake < self.high:
+            result = self.predictor.predict(headline, text, threshold)
+            decided_by = "bert"
+        else:
+            result = self._prefilter_result(prob_fake, threshold)
+            decided_by = "prefilter"
+        return {**result, 'decided_by': decided_by, 'prefilter_probability': prob_fake}
+
+    def predict_batch(self, items, threshold=0.7):
+        """Como `predict` para una lista de {'title', 'text'}: solo la banda de duda llega a BERT"""
+        from utils.models.truthlens_bert import TruthLensBERT
+
+        pairs = TruthLensBERT.item_pairs(items)
+        probs = [self.prefilter.predict_proba(title, text) for title, text in pairs]
+        results = [None] * len(pairs)
+        doubtful = []
+        for i, prob_fake in enumerate(probs):
+            if self.low < prob_fake < self.high:
+                doubtful.append(i)
+            else:
+                results[i] = {**self._prefilter_result(prob_fake, threshold), 'decided_by': "prefilter", 'prefilter_probability': prob_fake}
+
+        if doubtful:
+            bert_results = self.predictor.predict_batch([pairs[i] for i in doubtful], threshold)
+            for i, result in zip(doubtful, bert_results):
+                results[i] = {**result, 'decided_by': "bert", 'prefilter_probability': probs[i]}
+        return results
+
+
+def tune(prefilter, bert_results, items, half_widths=None):
+    """
+    Tabla de compromiso entre accuracy y llamadas a BERT evitadas
+
+    Args:
+        prefilter: HashedNgramClassifier entrenado
+        bert_results: Resultados de TruthLensBERT para `items` (mismo orden)
+        items: Diccionarios {'title', 'text', 'label'}
+        half_widths: Semianchos de la banda de duda alrededor de 0.5
+
+    Returns:
+        list: Un diccionario por banda (low, high, bert_avoided, accuracy)
+    """
+    half_widths = half_widths or [0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.45]
+    prefilter_probs = [prefilter.predict_proba(item['title'], item['text']) for item in items]
+    bert_labels = [result['label'] for result in bert_results]
+    truth = [item['label'] for item in items]
+    n = max(len(items), 1)
+
+    rows = [{
+        'low': None, 'high': None, 'bert_avoided': 0.0,
+        'accuracy': sum(b == t for b, t in zip(bert_labels, truth)) / n,
+    }]
+    for half_width in half_widths:
+        low, high = round(0.5 - half_width, 4), round(0.5 + half_width, 4)
+        avoided = 0
+        correct = 0
+        for prob, bert_label, label in zip(prefilter_probs, bert_labels, truth):
+            if low < prob < high:
+                correct += bert_label == label
+            else:
+                # Mismo veredicto que CascadePredictor fuera de la banda
+                avoided += 1
+                correct += int(prob >= high) == label
+        rows.append({'low': low, 'high': high, 'bert_avoided': avoided / n, 'accuracy': correct / n})
+    return rows
+
+
+def main():
+    from config.settings import (
+        TRAIN_DATA_PATH, DEV_DATA_PATH, CASCADE_MODEL_PATH, CASCADE_LOW, CASCADE_HIGH
+    )
+    from utils.datasets import load_labeled_dataset
+
+    parser = argparse.ArgumentParser(description='Prefiltro lineal de la cascada TruthLens')
+    parser.add_argument('command', choices=['train', 'tune'], help='train: entrenar y guardar; tune: tabla de compromiso')
+    parser.add_argument('--train-data', default=TRAIN_DATA_PATH, help='Dataset de entrenamiento (xlsx)')
+    parser.add_argument('--dev-data', default=DEV_DATA_PATH, help='Dataset de evaluación (xlsx)')
+    parser.add_argument('--model', default=CASCADE_MODEL_PATH, help='Archivo del prefiltro (.npz)')
+    parser.add_argument('--epochs', type=int, default=15, help='Épocas de SGD')
+    parser.add_argument('--json', action='store_true', help='Imprimir la tabla de tune como JSON')
+    args = parser.parse_args()
+
+    dev_items = load_labeled_dataset(args.dev_data)
+
+    if args.command == 'train':
+        prefilter = HashedNgramClassifier().fit(load_labeled_dataset(args.train_data), epochs=args.epochs)
+        prefilter.save(args.model)
+        correct = sum(
+            (prefilter.predict_proba(item['title'], item['text']) >= 0.5) == bool(item['label'])
+            for item in dev_items
+        )
+        print(f"✅ Prefiltro guardado en {args.model} (versión {prefilter.version})")
+        print(f"📊 Accuracy del prefiltro solo en {args.dev_data}: {correct / max(len(dev_items), 1):.2%}")
+        return
+
+    from utils.models.model_manager import get_model_pool
+
+    prefilter = HashedNgramClassifier.load(args.model)
+    bert_results = get_model_pool().predict_batch(dev_items)
+    rows = tune(prefilter, bert_results, dev_items)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'banda de duda':>16} | {'BERT evitado':>12} | {'accuracy':>8}")
+    print("-" * 44)
+    for row in rows:
+        band = "solo BERT" if row['low'] is None else f"({row['low']:.2f}, {row['high']:.2f})"
+        marker = "  ← actual" if (row['low'], row['high']) == (CASCADE_LOW, CASCADE_HIGH) else ""
+        print(f"{band:>16} | {row['bert_avoided']:>12.1%} | {row['accuracy']:>8.2%}{marker}")
+
+if __name__ == "__main__":
+    main()
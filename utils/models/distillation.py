@@ -0,0 +1,163 @@
+"""
+Destilación de conocimiento: entrena un TruthLensBERT más pequeño (menos capas)
+imitando las probabilidades del modelo fine-tuned actual
+
+Uso:
+    python -m utils.models.distillation --layers 6 --output models/truthlens_bert_student
+"""
+import argparse
+import copy
+import os
+import random
+import time
+
+import torch
+from transformers import AutoModelForSequenceClassification
+
+from utils.models.evaluation import quick_evaluate
+from utils.models.precision import model_size_mb
+
+
+def build_student(teacher_model, num_layers):
+    """
+    Crea un BertForSequenceClassification con `num_layers` capas copiadas del profesor
+
+    Se conservan embeddings, pooler y clasificador, y se toman capas del encoder
+    repartidas uniformemente (la última siempre incluida), lo que converge mucho
+    más rápido que inicializar al azar.
+    """
+    teacher_layers = teacher_model.config.num_hidden_layers
+    if not 0 < num_layers < teacher_layers:
+        raise ValueError(f"El estudiante debe tener entre 1 y {teacher_layers - 1} capas")
+
+    config = copy.deepcopy(teacher_model.config)
+    config.num_hidden_layers = num_layers
+    student = AutoModelForSequenceClassification.from_config(config)
+
+    selected = [int((i + 1) * teacher_layers / num_layers) - 1 for i in range(num_layers)]
+    student.bert.embeddings.load_state_dict(teacher_model.bert.embeddings.state_dict())
+    for student_layer, teacher_index in zip(student.bert.encoder.layer, selected):
+        student_layer.load_state_dict(teacher_model.bert.encoder.layer[teacher_index].state_dict())
+    student.bert.pooler.load_state_dict(teacher_model.bert.pooler.state_dict())
+    student.classifier.load_state_dict(teacher_model.classifier.state_dict())
+    return student, selected
+
+
+def teacher_logits(teacher, texts, batch_size=32):
+    """Logits del profesor (soft targets) para cada texto, en el orden original"""
+    logits = []
+    for start in range(0, len(texts), batch_size):
+        inputs = teacher.tokenize(texts[start:start + batch_size])
+        logits.append(teacher.backend(inputs).float().cpu())
+    return torch.cat(logits)
+
+
+def distill(teacher, student, items, epochs=2, batch_size=16, learning_rate=5e-5,
+            temperature=2.0, alpha=0.5, seed=42):
+    """
+    Entrena el estudiante con KL(profesor || estudiante) a temperatura T más entropía cruzada
+
+    Args:
+        teacher: TruthLensBERT con backend torch (solo se usa para tokenizar y etiquetar)
+        student: Modelo creado con build_student
+        items: Diccionarios {'title', 'text', 'label'}
+        temperature: Suaviza las distribuciones del profesor y del estudiante
+        alpha: Peso de la pérdida de destilación frente a la de etiquetas reales
+
+    Returns:
+        list: Pérdida media por época
+    """
+    texts = [teacher.build_input(item['title'], item['text']) for item in items]
+    labels = torch.tensor([item['label'] for item in items])
+    print(f"🧑‍🏫 Etiquetando {len(texts)} ejemplos con el profesor...")
+    soft_targets = torch.softmax(teacher_logits(teacher, texts) / temperature, dim=-1)
+
+    student.to(teacher.device).train()
+    optimizer = torch.optim.AdamW(student.parameters(), lr=learning_rate)
+    rng = random.Random(seed)
+    order = list(range(len(texts)))
+    history = []
+
+    for epoch in range(epochs):
+        rng.shuffle(order)
+        total = 0.0
+        start_time = time.perf_counter()
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            inputs = {k: v.to(teacher.device) for k, v in teacher.tokenize([texts[i] for i in batch]).items()}
+            logits = student(**inputs).logits
+
+            log_probabilities = torch.log_softmax(logits / temperature, dim=-1)
+            kd_loss = torch.nn.functional.kl_div(
+                log_probabilities, soft_targets[batch].to(logits.device), reduction="batchmean"
+            ) * temperature ** 2
+            ce_loss = torch.nn.functional.cross_entropy(logits, labels[batch].to(logits.device))
+            loss = alpha * kd_loss + (1 - alpha) * ce_loss
+
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(batch)
+
+        history.append(total / max(len(order), 1))
+        print(f"📉 Época {epoch + 1}/{epochs}: pérdida {history[-1]:.4f} "
+              f"({time.perf_counter() - start_time:.0f}s)")
+
+    student.eval()
+    return history
+
+
+def main():
+    from config.settings import BERT_MODEL_PATH, TRAIN_DATA_PATH, DEV_DATA_PATH
+    from utils.datasets import load_labeled_dataset
+    from utils.models.truthlens_bert import TruthLensBERT
+
+    parser = argparse.ArgumentParser(description='Destilación de TruthLensBERT en un estudiante con menos capas')
+    parser.add_argument('--teacher', default=BERT_MODEL_PATH, help='Modelo profesor (fine-tuned)')
+    parser.add_argument('--output', default=os.path.join("models", "truthlens_bert_student"),
+                        help='Directorio del estudiante (formato save_pretrained)')
+    parser.add_argument('--layers', type=int, help='Capas del estudiante (por defecto, la mitad del profesor)')
+    parser.add_argument('--train-data', default=TRAIN_DATA_PATH, help='Dataset de entrenamiento (xlsx)')
+    parser.add_argument('--dev-data', default=DEV_DATA_PATH, help='Dataset de evaluación (xlsx)')
+    parser.add_argument('--epochs', type=int, default=2, help='Épocas de entrenamiento')
+    parser.add_argument('--batch-size', type=int, default=16, help='Ejemplos por paso')
+    parser.add_argument('--learning-rate', type=float, default=5e-5, help='Tasa de aprendizaje de AdamW')
+    parser.add_argument('--temperature', type=float, default=2.0, help='Temperatura de destilación')
+    parser.add_argument('--alpha', type=float, default=0.5, help='Peso de la pérdida de destilación (0-1)')
+    parser.add_argument('--max-length', type=int, default=256,
+                        help='Tokens por ejemplo durante el entrenamiento (menos = más rápido en CPU)')
+    args = parser.parse_args()
+
+    # Las ventanas de documentos largos no se usan al entrenar
+    teacher = TruthLensBERT(args.teacher, max_length=args.max_length, long_doc_overlap=0)
+    num_layers = args.layers or max(1, teacher.model.config.num_hidden_layers // 2)
+    student, selected = build_student(teacher.model, num_layers)
+    print(f"🎓 Estudiante de {num_layers} capas inicializado con las capas {selected} del profesor")
+
+    distill(teacher, student, load_labeled_dataset(args.train_data), epochs=args.epochs,
+            batch_size=args.batch_size, learning_rate=args.learning_rate,
+            temperature=args.temperature, alpha=args.alpha)
+
+    os.makedirs(args.output, exist_ok=True)
+    student.save_pretrained(args.output)
+    teacher.tokenizer.save_pretrained(args.output)
+    print(f"✅ Estudiante guardado en {args.output} (usar como BERT_MODEL_PATH)")
+    del teacher, student
+
+    # Comparación en desarrollo con la configuración de servicio (max_length por defecto)
+    dev_items = load_labeled_dataset(args.dev_data)
+    rows = []
+    for name, path in (("profesor", args.teacher), ("estudiante", args.output)):
+        model = TruthLensBERT(path)
+        metrics = quick_evaluate(model, dev_items)
+        rows.append((name, model.model.config.num_hidden_layers, metrics, model_size_mb(model.model)))
+        del model
+
+    print(f"\n{'modelo':>10} | {'capas':>5} | {'accuracy':>8} | {'F1':>6} | {'ms/petición':>11} | {'p95 ms':>7} | {'MB pesos':>8}")
+    print("-" * 73)
+    for name, layers, metrics, size in rows:
+        print(f"{name:>10} | {layers:>5} | {metrics['accuracy']:>8.2%} | {metrics['f1']:>6.3f} | "
+              f"{metrics['latency_ms_mean']:>11.1f} | {metrics['latency_ms_p95']:>7.1f} | {size:>8.1f}")
+
+if __name__ == "__main__":
+    main()
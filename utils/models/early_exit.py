@@ -0,0 +1,207 @@
+"""
+Salida temprana por capas: clasificadores ligeros sobre capas intermedias del encoder
+
+Cada cabeza lee el token [CLS] de una capa intermedia. Si su diferencia de
+probabilidades ya alcanza el límite de decisión HIGH de la calibración (0.5),
+el forward pass se detiene en esa capa para esa entrada.
+
+Uso:
+    python -m utils.models.early_exit train   # entrena las cabezas con data/train.xlsx
+"""
+import argparse
+import hashlib
+import os
+import time
+
+import torch
+
+
+class EarlyExitHeads(torch.nn.Module):
+    """Cabezas lineales (hidden_size → 2) indexadas por número de capa (1 = primera)"""
+
+    def __init__(self, hidden_size, layers):
+        super().__init__()
+        self.hidden_size = hidden_size
+        self.layers = sorted(set(layers))
+        self.heads = torch.nn.ModuleDict({str(layer): torch.nn.Linear(hidden_size, 2) for layer in self.layers})
+
+    def forward(self, layer, cls_hidden):
+        return self.heads[str(layer)](cls_hidden)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        torch.save({
+            'hidden_size': self.hidden_size,
+            'layers': self.layers,
+            'state_dict': self.state_dict()
+        }, path)
+
+    @classmethod
+    def load(cls, path):
+        data = torch.load(path, map_location="cpu")
+        heads = cls(data['hidden_size'], data['layers'])
+        heads.load_state_dict(data['state_dict'])
+        return heads.eval()
+
+
+@torch.no_grad()
+def forward_with_early_exit(model, heads, inputs, threshold=0.5):
+    """
+    Forward pass capa a capa de un BertForSequenceClassification con salida temprana
+
+    Las filas del lote que alcanzan `threshold` en una cabeza intermedia se
+    retiran del lote; el resto continúa hasta la siguiente cabeza o el final.
+
+    Returns:
+        tuple: (logits (N, 2) en float32, lista con la capa de salida de cada fila)
+    """
+    bert = model.bert
+    device = next(model.parameters()).device
+    inputs = {k: v.to(device) for k, v in inputs.items()}
+    layers = bert.encoder.layer
+    num_layers = len(layers)
+
+    input_ids = inputs['input_ids']
+    attention_mask = inputs['attention_mask']
+    hidden = bert.embeddings(input_ids=input_ids, token_type_ids=inputs.get('token_type_ids'))
+    extended_mask = bert.get_extended_attention_mask(attention_mask, input_ids.shape)
+
+    logits = torch.empty((input_ids.shape[0], 2), dtype=torch.float32, device=hidden.device)
+    exit_layers = [num_layers] * input_ids.shape[0]
+    active = torch.arange(input_ids.shape[0], device=hidden.device)
+
+    for index, layer in enumerate(layers, start=1):
+        hidden = layer(hidden, attention_mask=extended_mask)[0]
+        if index >= num_layers or str(index) not in heads.heads:
+            continue
+
+        head_logits = heads(index, hidden[:, 0].to(heads.heads[str(index)].weight.dtype)).float()
+        probabilities = torch.softmax(head_logits, dim=-1)
+        done = (probabilities[:, 1] - probabilities[:, 0]).abs() >= threshold
+        if not done.any():
+            continue
+
+        finished = active[done]
+        logits[finished] = head_logits[done]
+        for row in finished.tolist():
+            exit_layers[row] = index
+
+        keep = ~done
+        if not keep.any():
+            return logits, exit_layers
+        hidden = hidden[keep]
+        extended_mask = extended_mask[keep]
+        active = active[keep]
+
+    pooled = bert.pooler(hidden)
+    logits[active] = model.classifier(model.dropout(pooled)).float()
+
+    return logits, exit_layers
+
+
+def heads_fingerprint(path):
+    """Huella corta del archivo de cabezas (forma parte de model_version)"""
+    stat = os.stat(path)
+    return hashlib.sha256(f"{os.path.basename(path)}|{stat.st_size}|{stat.st_mtime_ns}".encode()).hexdigest()[:8]
+
+
+def _cls_features(truth_lens, items, layers, batch_size=16):
+    """[CLS] de cada capa candidata y probabilidades finales del modelo completo"""
+    features = {layer: [] for layer in layers}
+    final_probabilities = []
+    for start in range(0, len(items), batch_size):
+        texts = [truth_lens.build_input(item['title'], item['text']) for item in items[start:start + batch_size]]
+        inputs = truth_lens.tokenize(texts)
+        with torch.no_grad():
+            outputs = truth_lens.model(**inputs, output_hidden_states=True)
+        # hidden_states[0] son los embeddings; hidden_states[i] es la salida de la capa i
+        for layer in layers:
+            features[layer].append(outputs.hidden_states[layer][:, 0].float())
+        final_probabilities.append(torch.softmax(outputs.logits.float(), dim=-1))
+    return {layer: torch.cat(chunks) for layer, chunks in features.items()}, torch.cat(final_probabilities)
+
+
+def train_heads(truth_lens, items, layers, targets="model", epochs=200, learning_rate=1e-2):
+    """
+    Entrena una cabeza por capa sobre el encoder congelado
+
+    Args:
+        truth_lens: TruthLensBERT con backend torch
+        items: Diccionarios {'title', 'text', 'label'}
+        layers: Capas candidatas (1..num_layers-1)
+        targets: "model" (imitar las probabilidades del modelo completo) o "labels" (etiquetas reales)
+
+    Returns:
+        EarlyExitHeads
+    """
+    features, final_probabilities = _cls_features(truth_lens, items, layers)
+    if targets == "labels":
+        soft_targets = torch.nn.functional.one_hot(
+            torch.tensor([item['label'] for item in items]), num_classes=2
+        ).float()
+    else:
+        soft_targets = final_probabilities
+
+    heads = EarlyExitHeads(truth_lens.model.config.hidden_size, layers)
+    for layer in heads.layers:
+        head = heads.heads[str(layer)]
+        optimizer = torch.optim.Adam(head.parameters(), lr=learning_rate, weight_decay=1e-4)
+        for _ in range(epochs):
+            optimizer.zero_grad()
+            log_probabilities = torch.log_softmax(head(features[layer]), dim=-1)
+            loss = -(soft_targets * log_probabilities).sum(dim=-1).mean()
+            loss.backward()
+            optimizer.step()
+    return heads.eval()
+
+
+def main():
+    from config.settings import (
+        BERT_MODEL_PATH, TRAIN_DATA_PATH, DEV_DATA_PATH, EARLY_EXIT_HEADS_PATH, EARLY_EXIT_THRESHOLD
+    )
+    from utils.datasets import load_labeled_dataset
+    from utils.models.truthlens_bert import TruthLensBERT
+
+    parser = argparse.ArgumentParser(description='Cabezas de salida temprana para TruthLensBERT')
+    parser.add_argument('command', choices=['train'], help='train: entrenar, guardar y evaluar en desarrollo')
+    parser.add_argument('--model', default=BERT_MODEL_PATH, help='Ruta del modelo BERT')
+    parser.add_argument('--train-data', default=TRAIN_DATA_PATH, help='Dataset de entrenamiento (xlsx)')
+    parser.add_argument('--dev-data', default=DEV_DATA_PATH, help='Dataset de evaluación (xlsx)')
+    parser.add_argument('--output', default=EARLY_EXIT_HEADS_PATH, help='Archivo de las cabezas (.pt)')
+    parser.add_argument('--layers', help='Capas candidatas separadas por comas (por defecto, una de cada dos)')
+    parser.add_argument('--targets', choices=['model', 'labels'], default='model',
+                        help='Imitar al modelo completo o entrenar con las etiquetas reales')
+    args = parser.parse_args()
+
+    truth_lens = TruthLensBERT(args.model)
+    num_layers = truth_lens.model.config.num_hidden_layers
+    if args.layers:
+        layers = [int(layer) for layer in args.layers.split(',') if layer.strip()]
+    else:
+        layers = list(range(2, num_layers, 2))
+    if not layers or not all(0 < layer < num_layers for layer in layers):
+        parser.error(f"Las capas deben estar entre 1 y {num_layers - 1}")
+
+    print(f"🧠 Entrenando cabezas en capas {layers} ({args.targets})...")
+    heads = train_heads(truth_lens, load_labeled_dataset(args.train_data), layers, targets=args.targets)
+    heads.save(args.output)
+    print(f"✅ Cabezas guardadas en {args.output}")
+
+    # Evaluación petición a petición: accuracy, capa media de salida y tiempo frente al modelo completo
+    dev_items = load_labeled_dataset(args.dev_data)
+    timings = {}
+    for name, exit_heads in (("completo", None), ("salida temprana", heads)):
+        truth_lens.early_exit_heads = exit_heads
+        truth_lens.early_exit_threshold = EARLY_EXIT_THRESHOLD
+        start = time.perf_counter()
+        results = [truth_lens.predict(item['title'], item['text']) for item in dev_items]
+        elapsed = (time.perf_counter() - start) * 1000 / max(len(dev_items), 1)
+        accuracy = sum(r['label'] == item['label'] for r, item in zip(results, dev_items)) / max(len(dev_items), 1)
+        exit_layers = [r.get('exit_layer', num_layers) for r in results]
+        timings[name] = elapsed
+        print(f"📊 {name}: accuracy {accuracy:.2%}, capa media {sum(exit_layers) / len(exit_layers):.1f}/{num_layers}, "
+              f"{elapsed:.1f} ms por petición")
+    print(f"⚡ Reducción de tiempo: {1 - timings['salida temprana'] / timings['completo']:.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Evaluación de TruthLensBERT sobre datasets etiquetados
+
+Uso:
+    python -m utils.models.evaluation                       # data/development.xlsx → METRICS_ARTIFACT_PATH
+    python -m utils.models.evaluation --data otro.xlsx --calibration-thresholds 0.8,0.7,0.6
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+# Versión del formato del artefacto de métricas (cambiar si cambian sus claves)
+METRICS_SCHEMA_VERSION = 1
+
+
+def quick_evaluate(model, items):
+    """
+    Evalúa el modelo petición a petición, como en producción
+
+    Args:
+        model: Instancia de TruthLensBERT
+        items: Diccionarios {'title', 'text', 'label'} (ver utils.datasets)
+
+    Returns:
+        dict: accuracy y F1 (clase Fake) calibrados, latencia media y p95 en ms, y etiquetas predichas
+    """
+    latencies = []
+    labels = []
+    for item in items:
+        start = time.perf_counter()
+        result = model.predict(item['title'], item['text'])
+        latencies.append((time.perf_counter() - start) * 1000)
+        labels.append(result['label'])
+
+    correct = sum(1 for item, label in zip(items, labels) if item['label'] == label)
+    ordered = sorted(latencies)
+    return {
+        'samples': len(items),
+        'accuracy': correct / len(items) if items else 0.0,
+        'f1': f1_score([item['label'] for item in items], labels),
+        'latency_ms_mean': sum(latencies) / len(latencies) if latencies else 0.0,
+        'latency_ms_p95': ordered[int(0.95 * (len(ordered) - 1))] if ordered else 0.0,
+        'labels': labels
+    }
+
+
+def f1_score(truth, predicted, positive=1):
+    """F1 de la clase `positive` (1 = Fake)"""
+    tp = sum(1 for t, p in zip(truth, predicted) if t == positive and p == positive)
+    fp = sum(1 for t, p in zip(truth, predicted) if t != positive and p == positive)
+    fn = sum(1 for t, p in zip(truth, predicted) if t == positive and p != positive)
+    return 2 * tp / (2 * tp + fp + fn) if tp else 0.0
+
+
+def classification_metrics(truth, predicted):
+    """
+    Accuracy, precisión/recall/F1 por clase y matriz de confusión (1 = Fake)
+
+    Returns:
+        dict: La matriz usa filas = etiqueta real y columnas = predicción, en orden [True, Fake]
+    """
+    matrix = [[0, 0], [0, 0]]
+    for t, p in zip(truth, predicted):
+        matrix[t][p] += 1
+
+    per_class = {}
+    for index, name in ((0, "true"), (1, "fake")):
+        tp = matrix[index][index]
+        predicted_total = matrix[0][index] + matrix[1][index]
+        actual_total = matrix[index][0] + matrix[index][1]
+        precision = tp / predicted_total if predicted_total else 0.0
+        recall = tp / actual_total if actual_total else 0.0
+        per_class[name] = {
+            'precision': precision,
+            'recall': recall,
+            'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            'support': actual_total
+        }
+
+    total = len(truth)
+    return {
+        'accuracy': (matrix[0][0] + matrix[1][1]) / total if total else 0.0,
+        'f1': per_class['fake']['f1'],
+        'f1_macro': (per_class['true']['f1'] + per_class['fake']['f1']) / 2,
+        'per_class': per_class,
+        'confusion_matrix': {'labels': ["True", "Fake"], 'matrix': matrix}
+    }
+
+
+def reliability_curve(confidences, correct, bins=10):
+    """
+    Curva de calibración: accuracy observada frente a confianza media por intervalo
+
+    Returns:
+        dict: Intervalos no vacíos y error de calibración esperado (ECE)
+    """
+    curve = []
+    ece = 0.0
+    total = len(confidences)
+    for b in range(bins):
+        lower, upper = b / bins, (b + 1) / bins
+        members = [
+            (conf, ok) for conf, ok in zip(confidences, correct)
+            if lower <= conf < upper or (b == bins - 1 and conf == 1.0)
+        ]
+        if not members:
+            continue
+        mean_confidence = sum(conf for conf, _ in members) / len(members)
+        accuracy = sum(ok for _, ok in members) / len(members)
+        ece += len(members) / total * abs(accuracy - mean_confidence)
+        curve.append({
+            'bin_lower': lower,
+            'bin_upper': upper,
+            'count': len(members),
+            'mean_confidence': mean_confidence,
+            'accuracy': accuracy
+        })
+    return {'bins': curve, 'ece': ece}
+
+
+def latency_summary(latencies_ms):
+    """Media y percentiles (p50, p90, p95, p99) en ms"""
+    ordered = sorted(latencies_ms)
+    if not ordered:
+        return {'samples': 0}
+
+    def percentile(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        'samples': len(ordered),
+        'mean_ms': sum(ordered) / len(ordered),
+        'p50_ms': percentile(0.50),
+        'p90_ms': percentile(0.90),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'max_ms': ordered[-1]
+    }
+
+
+def predict_probabilities_cached(model, items, cache=None, batch_size=None):
+    """
+    Probabilidades [prob_true, prob_fake] por fila, reutilizando las de ejecuciones previas
+
+    La clave es el hash del texto normalizado y la versión del modelo (sin umbral),
+    así que cambiar los umbrales de calibración no obliga a repetir la inferencia.
+
+    Returns:
+        tuple: (lista de pares [prob_true, prob_fake], filas servidas desde la caché)
+    """
+    probabilities = [None] * len(items)
+    keys = [None] * len(items)
+    missing = []
+    for index, item in enumerate(items):
+        if cache is not None:
+            keys[index] = cache.make_key(model.model_version, model.build_input(item['title'], item['text']), None)
+            cached = cache.get(keys[index])
+            if cached is not None:
+                probabilities[index] = [cached['probability_true'], cached['probability_fake']]
+                continue
+        missing.append(index)
+
+    results = model.predict_batch([items[i] for i in missing], batch_size=batch_size) if missing else []
+    for index, result in zip(missing, results):
+        if result.get('prediction') == 'Error':
+            raise RuntimeError(f"Fallo de inferencia en la fila {index}: {result.get('error')}")
+        probabilities[index] = [result['probability_true'], result['probability_fake']]
+        if cache is not None:
+            cache.put(keys[index], {
+                'probability_true': result['probability_true'],
+                'probability_fake': result['probability_fake']
+            })
+
+    return probabilities, len(items) - len(missing)
+
+
+def evaluate(model, items, cache=None, calibration_thresholds=None, latency_samples=100, batch_size=None):
+    """
+    Evaluación completa: decisiones raw y calibradas, curvas de calibración y latencia
+
+    Args:
+        model: Instancia de TruthLensBERT
+        items: Diccionarios {'title', 'text', 'label'}
+        cache: PredictionCache para las probabilidades por fila (None = sin caché)
+        calibration_thresholds: Umbrales (LOW, MEDIUM, HIGH); None = los de TruthLensBERT
+        latency_samples: Peticiones individuales cronometradas (0 = no medir)
+
+    Returns:
+        dict: Métricas listas para serializar como artefacto
+    """
+    import torch
+    from utils.models.truthlens_bert import TruthLensBERT
+
+    start = time.perf_counter()
+    probabilities, cache_hits = predict_probabilities_cached(model, items, cache, batch_size)
+    inference_seconds = time.perf_counter() - start
+
+    thresholds = calibration_thresholds or TruthLensBERT.CALIBRATION_THRESHOLDS.tolist()
+    results = TruthLensBERT.calibrate_batch(
+        torch.tensor(probabilities, dtype=torch.float64), calibration_thresholds=thresholds
+    )
+    truth = [item['label'] for item in items]
+    raw_labels = [result['raw_prediction'] for result in results]
+    calibrated_labels = [result['label'] for result in results]
+    raw_confidences = [max(result['probability_fake'], result['probability_true']) for result in results]
+
+    # Latencia petición a petición (como en producción), independiente de la caché
+    latencies = []
+    for item in items[:latency_samples]:
+        request_start = time.perf_counter()
+        model.predict(item['title'], item['text'])
+        latencies.append((time.perf_counter() - request_start) * 1000)
+
+    return {
+        'samples': len(items),
+        'calibration_thresholds': dict(zip(TruthLensBERT.CALIBRATION_LEVELS, thresholds)),
+        'raw': {
+            **classification_metrics(truth, raw_labels),
+            'calibration_curve': reliability_curve(raw_confidences, [p == t for p, t in zip(raw_labels, truth)])
+        },
+        'calibrated': {
+            **classification_metrics(truth, calibrated_labels),
+            'calibration_curve': reliability_curve(
+                [result['confidence'] for result in results], [p == t for p, t in zip(calibrated_labels, truth)]
+            )
+        },
+        'probability_fake_curve': reliability_curve([result['probability_fake'] for result in results], truth),
+        'latency': latency_summary(latencies),
+        'inference': {
+            'seconds': inference_seconds,
+            'cache_hits': cache_hits,
+            'rows_inferred': len(items) - cache_hits
+        }
+    }
+
+
+def file_sha256(path):
+    """Hash del archivo evaluado (identifica la versión del dataset)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_metrics_artifact(path, metrics, model_version, data_path):
+    """Escribe el artefacto versionado (escritura atómica)"""
+    artifact = {
+        'schema_version': METRICS_SCHEMA_VERSION,
+        'created_at': datetime.now().isoformat(timespec="seconds"),
+        'model_version': model_version,
+        'dataset': {'path': data_path, 'sha256': file_sha256(data_path)},
+        **metrics
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(artifact, f, indent=2, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+    return artifact
+
+
+def load_model_info(path):
+    """
+    Campos de MODEL_INFO a partir del artefacto de métricas
+
+    Returns:
+        dict: accuracy y f1_score (mismo formato que MODEL_INFO) más la procedencia,
+        o un diccionario vacío si el artefacto no existe o no es legible
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            artifact = json.load(f)
+        calibrated = artifact['calibrated']
+        return {
+            "accuracy": f"{calibrated['accuracy'] * 100:.2f}%",
+            "f1_score": f"{calibrated['f1']:.3f}",
+            "evaluated_on": os.path.basename(artifact['dataset']['path']),
+            "evaluated_at": artifact['created_at'],
+            "samples": artifact['samples'],
+            "model_version": artifact['model_version']
+        }
+    except FileNotFoundError:
+        print(f"⚠️ Sin artefacto de métricas en {path}; ejecuta python -m utils.models.evaluation")
+        return {}
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Artefacto de métricas no válido ({path}): {str(e)}")
+        return {}
+
+
+def main():
+    from config.settings import DEV_DATA_PATH, METRICS_ARTIFACT_PATH, EVAL_CACHE_PATH
+    from utils.datasets import load_labeled_dataset
+    from utils.models.model_manager import get_truth_lens_model
+    from utils.models.prediction_cache import PredictionCache
+
+    parser = argparse.ArgumentParser(description='Evaluación reproducible de TruthLensBERT')
+    parser.add_argument('--data', default=DEV_DATA_PATH, help='Dataset etiquetado (xlsx)')
+    parser.add_argument('--output', default=METRICS_ARTIFACT_PATH, help='Artefacto de métricas (JSON)')
+    parser.add_argument('--calibration-thresholds', help='Umbrales LOW,MEDIUM,HIGH (por defecto, los del modelo)')
+    parser.add_argument('--latency-samples', type=int, default=100, help='Peticiones individuales cronometradas')
+    parser.add_argument('--batch-size', type=int, help='Elementos por forward pass')
+    parser.add_argument('--no-cache', action='store_true', help='Ignorar la caché de probabilidades por fila')
+    args = parser.parse_args()
+
+    thresholds = None
+    if args.calibration_thresholds:
+        thresholds = [float(t) for t in args.calibration_thresholds.split(',')]
+        if len(thresholds) != 3:
+            parser.error("--calibration-thresholds necesita tres valores (LOW,MEDIUM,HIGH)")
+
+    items = load_labeled_dataset(args.data)
+    model = get_truth_lens_model()
+    cache = None if args.no_cache else PredictionCache(max_entries=len(items), disk_path=EVAL_CACHE_PATH)
+
+    metrics = evaluate(model, items, cache, thresholds, args.latency_samples, args.batch_size)
+    save_metrics_artifact(args.output, metrics, model.model_version, args.data)
+
+    inference = metrics['inference']
+    print(f"\n📊 {args.data}: {metrics['samples']} filas "
+          f"({inference['cache_hits']} desde caché, {inference['seconds']:.1f}s de inferencia)")
+    for name in ('raw', 'calibrated'):
+        block = metrics[name]
+        (tn, fp), (fn, tp) = block['confusion_matrix']['matrix']
+        print(f"   {name:>10}: accuracy {block['accuracy']:.2%}, F1 {block['f1']:.3f}, "
+              f"ECE {block['calibration_curve']['ece']:.3f}, matriz [[{tn}, {fp}], [{fn}, {tp}]]")
+    if metrics['latency']['samples']:
+        latency = metrics['latency']
+        print(f"   ⏱️ latencia: p50 {latency['p50_ms']:.1f} ms, p95 {latency['p95_ms']:.1f} ms, "
+              f"p99 {latency['p99_ms']:.1f} ms")
+    print(f"✅ Métricas guardadas en {args.output}")
+
+if __name__ == "__main__":
+    main()
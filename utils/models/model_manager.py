@@ -1,36 +1,255 @@
 """
-Gestor de modelos con lazy loading
+Gestor de modelos con lazy loading (o precarga opcional antes de aceptar tráfico)
 """
-from config.settings import BERT_MODEL_PATH
+import gc
+import os
+import threading
+import time
+
+import torch
+
+from config.settings import (
+    BERT_MODEL_PATH, BERT_MAX_LENGTH, BERT_PADDING_MODE, BERT_LENGTH_BUCKETS,
+    BATCHING_ENABLED, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, PREDICT_BATCH_SIZE,
+    LONG_DOC_MAX_WINDOWS, LONG_DOC_BATCH_SIZE, LONG_DOC_OVERLAP, LONG_DOC_AGGREGATION,
+    INFERENCE_BACKEND, ONNX_CACHE_DIR, ONNX_INTRA_OP_THREADS,
+    MODEL_PRECISION, PRECISION_EVAL_ON_LOAD, PRECISION_EVAL_SAMPLES, DEV_DATA_PATH,
+    CACHE_ENABLED, CACHE_MAX_ENTRIES, CACHE_DISK_PATH, CACHE_DISK_MAX_ENTRIES,
+    MODEL_POOL_SIZE, MODEL_THREADS_PER_REPLICA, MODEL_POOL_TIMEOUT,
+    CASCADE_ENABLED, CASCADE_MODEL_PATH, CASCADE_LOW, CASCADE_HIGH,
+    EARLY_EXIT_ENABLED, EARLY_EXIT_HEADS_PATH, EARLY_EXIT_THRESHOLD
+)
+from utils.models.batch_scheduler import MicroBatchScheduler
+from utils.models.cascade import HashedNgramClassifier, CascadePredictor
+from utils.models.model_pool import ModelPool
+from utils.models.prediction_cache import PredictionCache, CachedPredictor
+from utils.models.precision import model_size_mb
 from utils.models.truthlens_bert import TruthLensBERT
+from utils.async_fetcher import get_async_fetcher
+from utils.fetch_cache import get_fetch_cache
 from utils.news_scraper import NewsExtractor
+from utils.process_metrics import format_memory
 
 # Variables globales para lazy loading
 _truth_lens_model = None
 _news_extractor = None
+_model_pool = None
+_predictor = None
+_prediction_cache = None
+# Evita que dos peticiones simultáneas carguen el modelo (o creen el pool) a la vez
+_init_lock = threading.RLock()
+
+def _create_model(precision=MODEL_PRECISION):
+    """Construye TruthLensBERT con la configuración de config/settings.py"""
+    return TruthLensBERT(
+        BERT_MODEL_PATH,
+        max_length=BERT_MAX_LENGTH,
+        padding_mode=BERT_PADDING_MODE,
+        length_buckets=BERT_LENGTH_BUCKETS,
+        batch_size=PREDICT_BATCH_SIZE,
+        long_doc_max_windows=LONG_DOC_MAX_WINDOWS,
+        long_doc_batch_size=LONG_DOC_BATCH_SIZE,
+        long_doc_overlap=LONG_DOC_OVERLAP,
+        long_doc_aggregation=LONG_DOC_AGGREGATION,
+        backend=INFERENCE_BACKEND,
+        onnx_cache_dir=ONNX_CACHE_DIR,
+        onnx_threads=ONNX_INTRA_OP_THREADS,
+        precision=precision,
+        early_exit_heads_path=EARLY_EXIT_HEADS_PATH if EARLY_EXIT_ENABLED else None,
+        early_exit_threshold=EARLY_EXIT_THRESHOLD
+    )
+
+def _log_precision_impact(model):
+    """Compara accuracy, latencia y tamaño del modelo frente a fp32 sobre el dataset de desarrollo"""
+    from utils.datasets import load_labeled_dataset
+    from utils.models.evaluation import quick_evaluate
+
+    try:
+        items = load_labeled_dataset(DEV_DATA_PATH, limit=PRECISION_EVAL_SAMPLES)
+        reference = _create_model(precision="fp32")
+        baseline = quick_evaluate(reference, items)
+        baseline_size = model_size_mb(reference.model)
+        del reference
+
+        reduced = quick_evaluate(model, items)
+        agreement = sum(1 for a, b in zip(baseline['labels'], reduced['labels']) if a == b) / max(len(items), 1)
+
+        print(f"📊 Impacto de precisión {model.precision} vs fp32 ({len(items)} muestras de {DEV_DATA_PATH}):")
+        print(f"   Accuracy: {baseline['accuracy']:.2%} → {reduced['accuracy']:.2%} "
+              f"(Δ {(reduced['accuracy'] - baseline['accuracy']) * 100:+.2f} pts, concordancia {agreement:.2%})")
+        print(f"   Latencia media: {baseline['latency_ms_mean']:.1f} ms → {reduced['latency_ms_mean']:.1f} ms "
+              f"(p95 {baseline['latency_ms_p95']:.1f} → {reduced['latency_ms_p95']:.1f} ms)")
+        print(f"   Tamaño de pesos: {baseline_size:.0f} MB → {model_size_mb(model.model):.0f} MB")
+    except Exception as e:
+        print(f"⚠️ No se pudo medir el impacto de precisión: {str(e)}")
 
 def get_truth_lens_model():
     """Lazy loading del modelo BERT - se carga solo cuando se necesita"""
     global _truth_lens_model
     
     if _truth_lens_model is None:
-        print("🚀 Cargando modelo BERT (primera vez)...")
-        try:
-            _truth_lens_model = TruthLensBERT(BERT_MODEL_PATH)
-            print("✅ TruthLens BERT inicializado correctamente")
-        except Exception as e:
-            print(f"❌ Error inicializando TruthLens BERT: {str(e)}")
-            print("⚠️ Verifica que el modelo esté en 'models/truthlens_bert_model/'")
-            raise
+        with _init_lock:
+            if _truth_lens_model is None:
+                print("🚀 Cargando modelo BERT (primera vez)...")
+                try:
+                    model = _create_model()
+                    print("✅ TruthLens BERT inicializado correctamente")
+                except Exception as e:
+                    print(f"❌ Error inicializando TruthLens BERT: {str(e)}")
+                    print("⚠️ Verifica que el modelo esté en 'models/truthlens_bert_model/'")
+                    raise
+                if model.precision != "fp32" and PRECISION_EVAL_ON_LOAD:
+                    _log_precision_impact(model)
+                _truth_lens_model = model
     
     return _truth_lens_model
 
+def get_model_pool():
+    """
+    Pool de réplicas del modelo, seguro entre hilos
+
+    Las rutas que usan el modelo directamente (lotes, documentos largos) deben
+    pasar por aquí para no compartir una réplica con otra petición en curso.
+    """
+    global _model_pool
+
+    if _model_pool is None:
+        with _init_lock:
+            if _model_pool is None:
+                _model_pool = ModelPool(
+                    get_truth_lens_model(),
+                    size=MODEL_POOL_SIZE,
+                    threads_per_replica=MODEL_THREADS_PER_REPLICA,
+                    checkout_timeout=MODEL_POOL_TIMEOUT
+                )
+                print(f"✅ Pool de modelos: {_model_pool.size} réplica(s) x "
+                      f"{_model_pool.threads_per_replica} hilo(s) intra-op")
+
+    return _model_pool
+
+def get_model_pool_stats():
+    """Ocupación del pool sin forzar la carga del modelo"""
+    if _model_pool is None:
+        return {"initialized": False}
+    return {"initialized": True, **_model_pool.stats()}
+
+def _build_predictor():
+    """Compone caché → cascada → micro-lotes → pool de modelos según config/settings.py"""
+    global _prediction_cache
+
+    model = get_truth_lens_model()
+    pool = get_model_pool()
+    predictor = pool
+
+    if BATCHING_ENABLED:
+        # Un hilo de lotes por réplica para que todas las réplicas trabajen en paralelo
+        predictor = MicroBatchScheduler(
+            pool,
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            workers=pool.size
+        )
+        print(f"✅ Micro-lotes habilitados (máx {BATCH_MAX_SIZE} peticiones / {BATCH_MAX_WAIT_MS} ms)")
+
+    model_version = model.model_version
+    if CASCADE_ENABLED:
+        predictor = CascadePredictor(
+            HashedNgramClassifier.load(CASCADE_MODEL_PATH), predictor, low=CASCADE_LOW, high=CASCADE_HIGH
+        )
+        model_version = f"{model_version}-{predictor.version}"
+        print(f"✅ Cascada habilitada: BERT solo para prefiltro en ({CASCADE_LOW}, {CASCADE_HIGH})")
+
+    if CACHE_ENABLED:
+        _prediction_cache = PredictionCache(
+            max_entries=CACHE_MAX_ENTRIES,
+            disk_path=CACHE_DISK_PATH or None,
+            disk_max_entries=CACHE_DISK_MAX_ENTRIES
+        )
+        predictor = CachedPredictor(predictor, _prediction_cache, model.build_input, model_version)
+        print(f"✅ Caché de predicciones habilitada ({CACHE_MAX_ENTRIES} en memoria"
+              f"{', disco: ' + CACHE_DISK_PATH if CACHE_DISK_PATH else ''})")
+
+    return predictor
+
+def get_predictor():
+    """
+    Devuelve el objeto a usar para predicciones individuales desde las rutas
+
+    Según la configuración, las peticiones pasan por la caché de predicciones y
+    por el planificador de micro-lotes antes de llegar al modelo. Todas las capas
+    exponen `predict(headline, text)` con el mismo formato de resultado.
+    """
+    global _predictor
+
+    if _predictor is None:
+        with _init_lock:
+            if _predictor is None:
+                _predictor = _build_predictor()
+
+    return _predictor
+
+def get_prediction_cache():
+    """Caché de predicciones activa (None si está deshabilitada o aún no se creó)"""
+    return _prediction_cache
+
+def preload_models():
+    """
+    Carga los pesos y calienta todos los buckets de longitud antes de servir
+
+    Pensado para servidores pre-fork (p. ej. `gunicorn --preload`): el proceso
+    maestro carga el modelo una vez y los workers heredan las páginas de pesos
+    copy-on-write. El calentamiento se hace con un solo hilo intra-op para no
+    crear el pool de OpenMP antes del fork, y al final se congela el GC para
+    que las recolecciones de los workers no toquen (y copien) esas páginas.
+    El planificador de lotes y la caché no se crean aquí: usan hilos y
+    conexiones que no sobreviven a un fork, así que cada worker los crea al
+    recibir su primera petición.
+    """
+    start = time.perf_counter()
+    print(f"🔥 Precargando modelo BERT... {format_memory()}")
+
+    pool = get_model_pool()
+    load_seconds = time.perf_counter() - start
+
+    threads = torch.get_num_threads()
+    torch.set_num_threads(1)
+    try:
+        passes = sum(replica.warmup() for replica in pool.replicas)
+    finally:
+        torch.set_num_threads(threads)
+
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+
+    total_seconds = time.perf_counter() - start
+    print(f"✅ Modelo precargado en {total_seconds:.2f}s (carga {load_seconds:.2f}s, "
+          f"{passes} pasadas de calentamiento) — {format_memory()}")
+    return total_seconds
+
+def _reset_after_fork():
+    """Reinicia en el worker el estado que no sobrevive a un fork"""
+    global _predictor, _prediction_cache, _init_lock, _news_extractor
+
+    _init_lock = threading.RLock()
+    _predictor = None
+    _prediction_cache = None
+    _news_extractor = None  # su cliente HTTP asíncrono vivía en un hilo del padre
+    if _model_pool is not None:
+        torch.set_num_threads(_model_pool.threads_per_replica)
+        print(f"👷 Worker {os.getpid()} iniciado con modelo heredado — {format_memory()}")
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
 def get_news_extractor():
     """Lazy loading del news extractor"""
     global _news_extractor
     
     if _news_extractor is None:
-        _news_extractor = NewsExtractor()
-        print("✅ NewsExtractor inicializado correctamente")
+        _news_extractor = NewsExtractor(get_async_fetcher(), get_fetch_cache())
+        print(f"✅ NewsExtractor inicializado correctamente "
+              f"({'aiohttp' if _news_extractor.fetcher is not None else 'requests'}"
+              f"{', caché: ' + _news_extractor.cache.path if _news_extractor.cache is not None else ''})")
     
     return _news_extractor
@@ -0,0 +1,129 @@
+"""
+Pool de réplicas de TruthLensBERT para servir peticiones concurrentes
+"""
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import torch
+
+
+class PoolTimeout(Exception):
+    """No hubo ninguna réplica libre dentro del tiempo de espera"""
+
+
+class ModelPool:
+    """
+    Pool de N réplicas que se prestan en exclusiva a cada petición
+
+    Las réplicas comparten los pesos del modelo (solo lectura en inferencia) pero
+    cada una tiene su propio tokenizer, que no es seguro entre hilos. Limitar la
+    concurrencia a N réplicas con `threads_per_replica` hilos intra-op cada una
+    evita que las peticiones simultáneas se peleen por los núcleos de la CPU.
+    """
+
+    def __init__(self, base_model, size=1, threads_per_replica=0, checkout_timeout=30.0):
+        """
+        Args:
+            base_model: Instancia de TruthLensBERT ya cargada (primera réplica)
+            size: Número de réplicas
+            threads_per_replica: Hilos intra-op de torch por réplica (0 = núcleos / size)
+            checkout_timeout: Segundos máximos de espera por una réplica libre
+        """
+        self.size = max(1, size)
+        self.threads_per_replica = threads_per_replica or max(1, (os.cpu_count() or 1) // self.size)
+        self.checkout_timeout = checkout_timeout
+
+        # OpenMP crea un equipo de hilos por cada hilo que ejecuta un forward,
+        # así que N réplicas activas usan como mucho N * threads_per_replica hilos
+        torch.set_num_threads(self.threads_per_replica)
+
+        self.replicas = [base_model] + [base_model.replicate() for _ in range(self.size - 1)]
+        self._available = queue.LifoQueue()
+        for replica in self.replicas:
+            self._available.put(replica)
+
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Presta una réplica en exclusiva; lanza PoolTimeout si no hay ninguna libre a tiempo"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        try:
+            replica = self._available.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(f"Sin réplicas libres tras {timeout:.1f}s ({self.size} en uso)")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        try:
+            yield replica
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._available.put(replica)
+
+    def predict(self, headline, text="", threshold=0.7):
+        with self.checkout() as model:
+            return model.predict(headline, text, threshold)
+
+    def predict_many(self, requests):
+        with self.checkout() as model:
+            return model.predict_many(requests)
+
+    def predict_batch(self, items, threshold=0.7, batch_size=None):
+        """
+        Igual que TruthLensBERT.predict_batch, pero prestando una réplica por lote
+
+        Entre lote y lote la réplica vuelve al pool, así que una llamada con miles
+        de elementos no deja sin réplica a las peticiones individuales.
+        """
+        base_model = self.replicas[0]
+        pairs, chunks = base_model.plan_batches(items, batch_size or base_model.batch_size)
+        results = [None] * len(pairs)
+        for chunk in chunks:
+            with self.checkout() as model:
+                chunk_results = model.predict_many([(*pairs[i], threshold) for i in chunk])
+            for i, result in zip(chunk, chunk_results):
+                results[i] = result
+        return results
+
+    def predict_long(self, headline, text="", threshold=0.7, aggregation=None):
+        with self.checkout() as model:
+            return model.predict_long(headline, text, threshold, aggregation)
+
+    def stats(self):
+        """Métricas de ocupación del pool"""
+        with self._lock:
+            return {
+                "size": self.size,
+                "threads_per_replica": self.threads_per_replica,
+                "in_use": self._in_use,
+                "available": self.size - self._in_use,
+                "waiting": self._waiting,
+                "occupancy": self._in_use / self.size,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "avg_wait_ms": (self._wait_total / self._checkouts * 1000) if self._checkouts else 0.0,
+                "max_wait_ms": self._wait_max * 1000,
+            }
@@ -0,0 +1,70 @@
+"""
+Verificación de paridad entre el backend ONNX Runtime y PyTorch
+
+Compara las probabilidades de ambos backends sobre el dataset de desarrollo y
+falla (código de salida 1) si la diferencia máxima supera la tolerancia.
+"""
+import argparse
+import sys
+
+from config.settings import BERT_MODEL_PATH, DEV_DATA_PATH, ONNX_CACHE_DIR
+from utils.datasets import load_labeled_dataset
+from utils.models.truthlens_bert import TruthLensBERT
+
+
+def check_parity(model_path, data_path, cache_dir, tolerance=1e-4, limit=None, batch_size=16):
+    """
+    Ejecuta ambos backends sobre el mismo dataset y resume las diferencias
+
+    Returns:
+        dict: Diferencias máxima y media de prob_fake, concordancia de decisiones y veredicto
+    """
+    items = load_labeled_dataset(data_path, limit=limit)
+    torch_model = TruthLensBERT(model_path, backend="torch")
+    onnx_model = TruthLensBERT(model_path, backend="onnx", onnx_cache_dir=cache_dir)
+
+    diffs = []
+    agreements = 0
+    for start in range(0, len(items), batch_size):
+        texts = [torch_model.build_input(item['title'], item['text']) for item in items[start:start + batch_size]]
+        torch_probs = torch_model.predict_probabilities(texts)
+        onnx_probs = onnx_model.predict_probabilities(texts)
+        diffs.extend((torch_probs[:, 1] - onnx_probs[:, 1]).abs().tolist())
+        torch_labels = [r['label'] for r in TruthLensBERT.calibrate_batch(torch_probs)]
+        onnx_labels = [r['label'] for r in TruthLensBERT.calibrate_batch(onnx_probs)]
+        agreements += sum(1 for a, b in zip(torch_labels, onnx_labels) if a == b)
+
+    max_diff = max(diffs, default=0.0)
+    return {
+        'samples': len(diffs),
+        'max_abs_diff': max_diff,
+        'mean_abs_diff': sum(diffs) / len(diffs) if diffs else 0.0,
+        'decision_agreement': agreements / len(diffs) if diffs else 1.0,
+        'tolerance': tolerance,
+        'passed': max_diff <= tolerance
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Paridad de probabilidades ONNX vs PyTorch')
+    parser.add_argument('--data', default=DEV_DATA_PATH, help='Dataset etiquetado (xlsx)')
+    parser.add_argument('--model', default=BERT_MODEL_PATH, help='Ruta del modelo BERT')
+    parser.add_argument('--cache-dir', default=ONNX_CACHE_DIR, help='Directorio del grafo ONNX')
+    parser.add_argument('--tolerance', type=float, default=1e-4, help='Diferencia absoluta máxima permitida')
+    parser.add_argument('--limit', type=int, help='Número máximo de muestras')
+    args = parser.parse_args()
+
+    report = check_parity(args.model, args.data, args.cache_dir, args.tolerance, args.limit)
+    print(f"Muestras: {report['samples']}")
+    print(f"Diferencia máxima: {report['max_abs_diff']:.2e} (tolerancia {report['tolerance']:.0e})")
+    print(f"Diferencia media: {report['mean_abs_diff']:.2e}")
+    print(f"Concordancia de decisiones: {report['decision_agreement']:.2%}")
+
+    if report['passed']:
+        print("✅ Paridad ONNX verificada")
+    else:
+        print("❌ ONNX fuera de tolerancia")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
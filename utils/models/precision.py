@@ -0,0 +1,54 @@
+"""
+Modos de precisión reducida para inferencia en CPU (int8 dinámico y bf16)
+"""
+import io
+
+import torch
+
+PRECISIONS = ("fp32", "int8", "bf16")
+
+
+def bf16_supported():
+    """Indica si la CPU tiene instrucciones bf16 nativas (AVX512-BF16 o AMX)"""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        pass
+    try:
+        with open('/proc/cpuinfo', 'r', encoding='utf-8') as f:
+            flags = f.read()
+        return 'avx512_bf16' in flags or 'amx_bf16' in flags
+    except OSError:
+        return False
+
+
+def apply_precision(model, precision):
+    """
+    Convierte un modelo PyTorch a la precisión solicitada
+
+    Args:
+        model: Modelo en fp32 (modo eval)
+        precision: "fp32", "int8" (cuantización dinámica de capas Linear) o "bf16"
+
+    Returns:
+        tuple: (modelo convertido, precisión efectivamente aplicada)
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Precisión no soportada: {precision}")
+
+    if precision == "int8":
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif precision == "bf16":
+        if not bf16_supported():
+            print("⚠️ La CPU no soporta bf16 de forma nativa, se mantiene fp32")
+            return model, "fp32"
+        model = model.to(torch.bfloat16)
+
+    return model.eval(), precision
+
+
+def model_size_mb(model):
+    """Tamaño serializado de los pesos del modelo en MB (incluye pesos cuantizados)"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes / (1024 * 1024)
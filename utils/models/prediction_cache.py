@@ -0,0 +1,175 @@
+"""
+Caché de predicciones direccionada por contenido (LRU en memoria + SQLite opcional)
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from utils.metrics import stage
+
+
+class PredictionCache:
+    """
+    Caché de dos niveles para resultados de TruthLensBERT
+
+    El nivel en memoria es un LRU acotado a `max_entries`. Si se indica
+    `disk_path`, los resultados también se guardan en SQLite (modo WAL), de modo
+    que sobreviven a reinicios; un acierto en disco se promueve a memoria.
+    """
+
+    def __init__(self, max_entries=2048, disk_path=None, disk_max_entries=100000):
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits_memory = 0
+        self._hits_disk = 0
+        self._misses = 0
+        self._disk_writes = 0
+
+        self._db = None
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model_version, normalized_input, threshold):
+        """Clave SHA-256 del texto normalizado, el umbral y la versión del modelo"""
+        payload = f"{model_version}\x00{threshold!r}\x00{normalized_input}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Devuelve una copia del resultado en caché o None"""
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self._hits_memory += 1
+                return dict(result)
+
+            if self._db is not None:
+                row = self._db.execute("SELECT result FROM predictions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    result = json.loads(row[0])
+                    self._store_memory(key, result)
+                    self._hits_disk += 1
+                    return dict(result)
+
+            self._misses += 1
+            return None
+
+    def put(self, key, result):
+        """Guarda una copia del resultado en memoria y, si está habilitado, en disco"""
+        result = dict(result)
+        with self._lock:
+            self._store_memory(key, result)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO predictions (key, result, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(result, ensure_ascii=False), time.time())
+                )
+                self._db.commit()
+                self._disk_writes += 1
+                if self._disk_writes % 500 == 0:
+                    self._prune_disk()
+
+    def stats(self):
+        """Contadores de aciertos y fallos por nivel"""
+        with self._lock:
+            lookups = self._hits_memory + self._hits_disk + self._misses
+            return {
+                "entries_memory": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_enabled": self._db is not None,
+                "hits_memory": self._hits_memory,
+                "hits_disk": self._hits_disk,
+                "misses": self._misses,
+                "hit_rate": ((self._hits_memory + self._hits_disk) / lookups) if lookups else 0.0,
+            }
+
+    def _store_memory(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _prune_disk(self):
+        """Elimina las entradas más antiguas del nivel en disco por encima del límite"""
+        self._db.execute(
+            "DELETE FROM predictions WHERE key IN ("
+            "SELECT key FROM predictions ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_entries,)
+        )
+        self._db.commit()
+
+
+class CachedPredictor:
+    """
+    Envoltorio con la interfaz `predict` que consulta la caché antes del modelo
+
+    Las respuestas en caché son idénticas a las frescas salvo el indicador
+    `cache_hit`; los resultados con error nunca se guardan.
+    """
+
+    def __init__(self, predictor, cache, normalize, model_version):
+        """
+        Args:
+            predictor: Objeto con `predict(headline, text, threshold)` (modelo o planificador)
+            cache: Instancia de PredictionCache
+            normalize: Función (headline, text) -> texto normalizado (TruthLensBERT.build_input)
+            model_version: Identificador de los pesos y la configuración del modelo
+        """
+        self.predictor = predictor
+        self.cache = cache
+        self.normalize = normalize
+        self.model_version = model_version
+
+    def predict(self, headline, text="", threshold=0.7):
+        with stage("clean_text"):
+            normalized = self.normalize(headline, text)
+        key = self.cache.make_key(self.model_version, normalized, threshold)
+        result = self.cache.get(key)
+        if result is not None:
+            result['cache_hit'] = True
+            return result
+
+        result = self.predictor.predict(headline, text, threshold)
+        if result.get('prediction') != 'Error':
+            self.cache.put(key, result)
+        return {**result, 'cache_hit': False}
+
+    def predict_batch(self, items, threshold=0.7):
+        """Como `predict` para una lista de {'title', 'text'}: solo los fallos de caché llegan al modelo"""
+        from utils.models.truthlens_bert import TruthLensBERT
+
+        pairs = TruthLensBERT.item_pairs(items)
+        with stage("clean_text"):
+            keys = [self.cache.make_key(self.model_version, self.normalize(*pair), threshold) for pair in pairs]
+        results = [None] * len(pairs)
+        misses = []
+        for i, key in enumerate(keys):
+            result = self.cache.get(key)
+            if result is not None:
+                result['cache_hit'] = True
+                results[i] = result
+            else:
+                misses.append(i)
+
+        if misses:
+            fresh = self.predictor.predict_batch([pairs[i] for i in misses], threshold)
+            for i, result in zip(misses, fresh):
+                if result.get('prediction') != 'Error':
+                    self.cache.put(keys[i], result)
+                results[i] = {**result, 'cache_hit': False}
+        return results
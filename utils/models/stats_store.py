@@ -0,0 +1,254 @@
+"""
+Almacén de analítica en SQLite (modo WAL): eventos de análisis y agregados por hora y por día
+
+Cada análisis se guarda como evento (ruta, veredicto, banda de confianza,
+latencia y tamaño de la entrada) y, en la misma transacción, se suma a los
+agregados horarios y diarios y a los totales históricos. Las consultas de /stats
+leen agregados ya calculados, así que su coste no crece con los días de servicio.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Bandas de confianza de los eventos (límite inferior incluido)
+CONFIDENCE_BANDS = ((0.8, "high"), (0.6, "medium"), (0.0, "low"))
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS events ("
+    "id INTEGER PRIMARY KEY, ts REAL NOT NULL, route TEXT NOT NULL, verdict TEXT NOT NULL, "
+    "correct INTEGER NOT NULL, confidence REAL, confidence_band TEXT NOT NULL, "
+    "latency_ms REAL, input_chars INTEGER)",
+    "CREATE INDEX IF NOT EXISTS events_ts ON events (ts)",
+    "CREATE INDEX IF NOT EXISTS events_route_ts ON events (route, ts)",
+    # bucket: 'YYYY-MM-DD HH:00' (hourly) o 'YYYY-MM-DD' (daily), en hora local como el resto de estadísticas
+    *(
+        f"CREATE TABLE IF NOT EXISTS {table} ("
+        "bucket TEXT NOT NULL, route TEXT NOT NULL, verdict TEXT NOT NULL, confidence_band TEXT NOT NULL, "
+        "count INTEGER NOT NULL, correct INTEGER NOT NULL, latency_ms_sum REAL NOT NULL, "
+        "input_chars_sum INTEGER NOT NULL, "
+        "PRIMARY KEY (bucket, route, verdict, confidence_band)) WITHOUT ROWID"
+        for table in ("rollup_hourly", "rollup_daily")
+    ),
+    "CREATE TABLE IF NOT EXISTS totals (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+)
+
+_ROLLUPS = {"hourly": ("rollup_hourly", "%Y-%m-%d %H:00"), "daily": ("rollup_daily", "%Y-%m-%d")}
+
+
+def confidence_band(confidence):
+    """'high', 'medium' o 'low' según CONFIDENCE_BANDS"""
+    for lower, band in CONFIDENCE_BANDS:
+        if (confidence or 0.0) >= lower:
+            return band
+    return CONFIDENCE_BANDS[-1][1]
+
+
+class StatsStore:
+    """
+    Eventos y agregados de análisis en una base SQLite compartida por los workers
+
+    Los eventos se escriben por lotes (`record`). La retención se aplica como
+    mucho una vez por hora al escribir; 0 días = conservar para siempre.
+    """
+
+    def __init__(self, path, events_retention_days=30, hourly_retention_days=90, daily_retention_days=0):
+        self.path = path
+        self.events_retention_days = events_retention_days
+        self.hourly_retention_days = hourly_retention_days
+        self.daily_retention_days = daily_retention_days
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+
+    def record(self, events):
+        """
+        Guarda eventos y actualiza agregados y totales en una sola transacción
+
+        Args:
+            events: Lista de diccionarios con ts, route, verdict ('fake'/'real'),
+                correct (bool), confidence, latency_ms e input_chars
+        """
+        if not events:
+            return
+        rows = []
+        rollups = {name: {} for name in _ROLLUPS}
+        fakes = correctos = 0
+        for event in events:
+            band = confidence_band(event.get('confidence'))
+            correct = 1 if event.get('correct') else 0
+            latency = event.get('latency_ms') or 0.0
+            chars = event.get('input_chars') or 0
+            rows.append((event['ts'], event['route'], event['verdict'], correct,
+                         event.get('confidence'), band, event.get('latency_ms'), event.get('input_chars')))
+            moment = datetime.fromtimestamp(event['ts'])
+            for name, (_, bucket_format) in _ROLLUPS.items():
+                key = (moment.strftime(bucket_format), event['route'], event['verdict'], band)
+                totals = rollups[name].setdefault(key, [0, 0, 0.0, 0])
+                totals[0] += 1
+                totals[1] += correct
+                totals[2] += latency
+                totals[3] += chars
+            fakes += event['verdict'] == 'fake'
+            correctos += correct
+
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO events (ts, route, verdict, correct, confidence, confidence_band, latency_ms, "
+                "input_chars) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            for name, (table, _) in _ROLLUPS.items():
+                self._db.executemany(
+                    f"INSERT INTO {table} (bucket, route, verdict, confidence_band, count, correct, "
+                    "latency_ms_sum, input_chars_sum) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (bucket, route, verdict, confidence_band) DO UPDATE SET "
+                    "count = count + excluded.count, correct = correct + excluded.correct, "
+                    "latency_ms_sum = latency_ms_sum + excluded.latency_ms_sum, "
+                    "input_chars_sum = input_chars_sum + excluded.input_chars_sum",
+                    [(*key, *values) for key, values in rollups[name].items()]
+                )
+            self._db.executemany(
+                "INSERT INTO totals (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                [("total_analisis", len(events)), ("total_fakes", fakes), ("total_correctos", correctos)]
+            )
+
+        if time.monotonic() - self._last_prune > 3600:
+            self.prune()
+
+    def import_legacy(self, stats):
+        """
+        Carga los contadores de stats_analisis.json si el almacén está vacío
+
+        Los días se guardan en el agregado diario con ruta 'legacy' y banda
+        'unknown' (el archivo no tenía más detalle).
+
+        Returns:
+            bool: True si se importó algo
+        """
+        with self._lock, self._db:
+            # Bloqueo de escritura antes de comprobar: dos workers no pueden importar a la vez
+            self._db.execute("BEGIN IMMEDIATE")
+            if self._db.execute("SELECT 1 FROM totals LIMIT 1").fetchone() is not None:
+                return False
+            rows = []
+            fakes_diarios = stats.get('fakes_diarios', {})
+            for day, count in stats.get('analisis_diarios', {}).items():
+                fakes = min(fakes_diarios.get(day, 0), count)
+                for verdict, verdict_count in (("fake", fakes), ("real", count - fakes)):
+                    if verdict_count:
+                        rows.append((day, "legacy", verdict, "unknown", verdict_count, 0, 0.0, 0))
+            self._db.executemany(
+                "INSERT INTO rollup_daily (bucket, route, verdict, confidence_band, count, correct, "
+                "latency_ms_sum, input_chars_sum) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._db.executemany(
+                "INSERT INTO totals (name, value) VALUES (?, ?)",
+                [(name, int(stats.get(name, 0))) for name in ("total_analisis", "total_fakes", "total_correctos")]
+            )
+        return True
+
+    def prune(self, now=None):
+        """Aplica la retención de eventos y agregados"""
+        now = now or datetime.now()
+        with self._lock, self._db:
+            if self.events_retention_days:
+                cutoff = (now - timedelta(days=self.events_retention_days)).timestamp()
+                self._db.execute("DELETE FROM events WHERE ts < ?", (cutoff,))
+            for (table, bucket_format), days in (
+                (_ROLLUPS["hourly"], self.hourly_retention_days),
+                (_ROLLUPS["daily"], self.daily_retention_days),
+            ):
+                if days:
+                    cutoff = (now - timedelta(days=days)).strftime(bucket_format)
+                    self._db.execute(f"DELETE FROM {table} WHERE bucket < ?", (cutoff,))
+        self._last_prune = time.monotonic()
+
+    def totals(self):
+        """Totales históricos (no les afecta la retención)"""
+        with self._lock:
+            values = dict(self._db.execute("SELECT name, value FROM totals").fetchall())
+        return {
+            'total_analisis': values.get('total_analisis', 0),
+            'total_fakes': values.get('total_fakes', 0),
+            'total_correctos': values.get('total_correctos', 0),
+        }
+
+    def rollups(self, granularity="daily", start=None, end=None, route=None, group_by=("bucket",)):
+        """
+        Agregados en un rango de buckets (incluidos ambos extremos)
+
+        Args:
+            granularity: "hourly" o "daily"
+            start, end: Buckets en el formato de la granularidad (p. ej. '2025-01-31' o '2025-01-31 09:00')
+            route: Filtra por ruta
+            group_by: Columnas de agrupación entre bucket, route, verdict y confidence_band
+
+        Returns:
+            list: Diccionarios con las columnas agrupadas, count, fakes, correct,
+                avg_latency_ms y avg_input_chars
+        """
+        table, _ = _ROLLUPS[granularity]
+        columns = [column for column in group_by if column in ("bucket", "route", "verdict", "confidence_band")]
+        conditions, params = [], []
+        for condition, value in (("bucket >= ?", start), ("bucket <= ?", end), ("route = ?", route)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        group = f"GROUP BY {', '.join(columns)} ORDER BY {', '.join(columns)}" if columns else ""
+        query = (
+            f"SELECT {''.join(column + ', ' for column in columns)}SUM(count), "
+            "SUM(CASE WHEN verdict = 'fake' THEN count ELSE 0 END), SUM(correct), "
+            f"SUM(latency_ms_sum), SUM(input_chars_sum) FROM {table} {where} {group}"
+        )
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+
+        results = []
+        for row in rows:
+            count, fakes, correct, latency_sum, chars_sum = row[len(columns):]
+            if not count:
+                continue
+            results.append({
+                **dict(zip(columns, row)),
+                'count': count,
+                'fakes': fakes,
+                'correct': correct,
+                'avg_latency_ms': latency_sum / count,
+                'avg_input_chars': chars_sum / count,
+            })
+        return results
+
+    def events(self, start_ts=None, end_ts=None, route=None, limit=1000):
+        """Eventos individuales en un rango de timestamps (los más recientes primero)"""
+        conditions, params = [], []
+        for condition, value in (("ts >= ?", start_ts), ("ts < ?", end_ts), ("route = ?", route)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            cursor = self._db.execute(
+                "SELECT ts, route, verdict, correct, confidence, confidence_band, latency_ms, input_chars "
+                f"FROM events {where} ORDER BY ts DESC LIMIT ?", (*params, limit)
+            )
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def day_summary(self, day):
+        """Análisis y fakes de un día ('YYYY-MM-DD') desde el agregado diario"""
+        rows = self.rollups("daily", start=day, end=day, group_by=())
+        return {'analisis': rows[0]['count'], 'fakes': rows[0]['fakes']} if rows else {'analisis': 0, 'fakes': 0}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
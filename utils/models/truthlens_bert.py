@@ -1,17 +1,78 @@
 """
 Clase TruthLensBERT para predicción de noticias falsas
 """
-import torch
-import re
+import copy
 import os
+
+import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
+from utils.models.backends import BACKENDS, TorchBackend, OnnxBackend, model_fingerprint
+from utils.models.early_exit import EarlyExitHeads, forward_with_early_exit, heads_fingerprint
+from utils.models.precision import PRECISIONS, apply_precision
+from utils.metrics import stage
+from utils.text_cleaning import clean_text
+
 class TruthLensBERT:
     """Modelo BERT entrenado para detectar noticias falsas"""
+
+    # Calibración: límites de probability_difference y umbral de fake para cada nivel
+    CALIBRATION_BOUNDARIES = torch.tensor([0.3, 0.5], dtype=torch.float64)
+    CALIBRATION_THRESHOLDS = torch.tensor([0.85, 0.75, 0.65], dtype=torch.float64)
+    CALIBRATION_LEVELS = ("LOW", "MEDIUM", "HIGH")
+    LONG_DOC_AGGREGATIONS = ("mean", "max", "length_weighted")
     
-    def __init__(self, model_path):
-        """Inicializa el modelo BERT entrenado"""
+    def __init__(self, model_path, max_length=512, padding_mode="dynamic", length_buckets=None,
+                 batch_size=32, long_doc_max_windows=16, long_doc_batch_size=8,
+                 long_doc_overlap=128, long_doc_aggregation="mean", backend="torch",
+                 onnx_cache_dir=None, onnx_threads=0, precision="fp32",
+                 early_exit_heads_path=None, early_exit_threshold=0.5):
+        """
+        Inicializa el modelo BERT entrenado
+
+        Args:
+            model_path: Ruta del modelo fine-tuned
+            max_length: Longitud máxima de secuencia (tokens)
+            padding_mode: "dynamic" (relleno hasta el bucket de la longitud real) o "max_length"
+            length_buckets: Longitudes permitidas para el relleno dinámico
+            batch_size: Tamaño máximo de cada forward pass en predict_batch
+            long_doc_max_windows: Máximo de ventanas evaluadas por documento largo
+            long_doc_batch_size: Ventanas por forward pass en predict_long
+            long_doc_overlap: Tokens compartidos entre ventanas consecutivas
+            long_doc_aggregation: Regla de combinación por defecto ("mean", "max", "length_weighted")
+            backend: Motor de inferencia ("torch" u "onnx")
+            onnx_cache_dir: Directorio del grafo ONNX exportado (backend "onnx")
+            onnx_threads: Hilos intra-op de ONNX Runtime (0 = por defecto)
+            precision: "fp32", "int8" (cuantización dinámica) o "bf16" (solo backend torch en CPU)
+            early_exit_heads_path: Cabezas de salida temprana (.pt); None = recorrer todas las capas
+            early_exit_threshold: Diferencia de probabilidades a partir de la cual se sale en una capa intermedia
+        """
         print(f"🔥 Cargando modelo BERT desde: {model_path}")
+
+        if padding_mode not in ("dynamic", "max_length"):
+            raise ValueError(f"padding_mode no soportado: {padding_mode}")
+        if backend not in BACKENDS:
+            raise ValueError(f"backend no soportado: {backend}")
+        if precision not in PRECISIONS:
+            raise ValueError(f"precision no soportada: {precision}")
+        if precision != "fp32" and backend != "torch":
+            raise ValueError("precision reducida solo está disponible con el backend torch")
+        if early_exit_heads_path and backend != "torch":
+            raise ValueError("la salida temprana solo está disponible con el backend torch")
+        if long_doc_aggregation not in self.LONG_DOC_AGGREGATIONS:
+            raise ValueError(f"long_doc_aggregation no soportada: {long_doc_aggregation}")
+        if not 0 <= long_doc_overlap < max_length // 2:
+            raise ValueError("long_doc_overlap debe ser menor que la mitad de max_length")
+
+        self.max_length = max_length
+        self.padding_mode = padding_mode
+        self.batch_size = batch_size
+        self.long_doc_max_windows = max(1, long_doc_max_windows)
+        self.long_doc_batch_size = max(1, long_doc_batch_size)
+        self.long_doc_overlap = long_doc_overlap
+        self.long_doc_aggregation = long_doc_aggregation
+        # Buckets ordenados y acotados a max_length; max_length siempre es el último bucket
+        self.length_buckets = sorted({b for b in (length_buckets or []) if 0 < b < max_length} | {max_length})
         
         # Verificar que existe el modelo
         if not os.path.exists(model_path):
@@ -24,98 +85,411 @@ class TruthLensBERT:
         # Cargar tokenizer y modelo
         try:
             self.tokenizer = AutoTokenizer.from_pretrained(model_path)
-            self.model = AutoModelForSequenceClassification.from_pretrained(model_path)
-            self.model.to(self.device)
-            self.model.eval()
-            print("✅ Modelo BERT cargado exitosamente")
+            if backend == "onnx":
+                # El modelo PyTorch solo se carga si hay que exportar el grafo
+                self.model = None
+                self.backend = OnnxBackend(
+                    model_path,
+                    onnx_cache_dir or os.path.join(model_path, "onnx"),
+                    lambda: AutoModelForSequenceClassification.from_pretrained(model_path),
+                    intra_op_threads=onnx_threads
+                )
+            else:
+                self.model = AutoModelForSequenceClassification.from_pretrained(model_path)
+                self.model.eval()
+                if precision != "fp32" and self.device.type != "cpu":
+                    print(f"⚠️ Precisión {precision} solo soportada en CPU, se mantiene fp32")
+                    precision = "fp32"
+                self.model, precision = apply_precision(self.model, precision)
+                self.model.to(self.device)
+                self.backend = TorchBackend(self.model, self.device)
+            self.precision = precision
+            # Identifica pesos + configuración que afectan al resultado (claves de caché)
+            self.model_version = f"{model_fingerprint(model_path)}-{self.backend.name}-{precision}-{max_length}"
+
+            self.early_exit_heads = None
+            self.early_exit_threshold = early_exit_threshold
+            if early_exit_heads_path:
+                self.early_exit_heads = EarlyExitHeads.load(early_exit_heads_path).to(self.device)
+                self.model_version += f"-exit{heads_fingerprint(early_exit_heads_path)}-{early_exit_threshold}"
+                print(f"⚡ Salida temprana activada en capas {self.early_exit_heads.layers}")
+            print(f"✅ Modelo BERT cargado exitosamente (backend: {self.backend.name}, precisión: {self.precision})")
         except Exception as e:
             print(f"❌ Error cargando modelo BERT: {str(e)}")
             raise
     
-    def clean_text(self, text):
-        """Limpia el texto igual que en entrenamiento"""
-        if not text:
-            return ""
-        # Aplicar misma limpieza que en entrenamiento
-        text = re.sub(r'http\S+|www\S+|https\S+', '', text)
-        text = re.sub(r'@\w+|#\w+', '', text)
-        text = re.sub(r'[^a-zA-ZáéíóúÁÉÍÓÚñÑüÜ\s]', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
-    
-    def predict(self, headline, text="", threshold=0.7):
-        """Predice si una noticia es falsa o verdadera con umbral ajustable"""
-        try:
-            # Combinar y limpiar texto (igual que en entrenamiento)
-            headline_clean = self.clean_text(headline)
-            text_clean = self.clean_text(text)
-            # Repetir headline para darle más peso (como en entrenamiento)
-            combined_text = f"{headline_clean} {headline_clean} {text_clean}"
-            
-            # Tokenizar
-            inputs = self.tokenizer(
-                combined_text,
+    def replicate(self):
+        """
+        Crea una réplica que comparte los pesos (y el backend) pero con tokenizer propio
+
+        Los tokenizers rápidos de Hugging Face no son seguros entre hilos, así que
+        cada réplica de ModelPool necesita el suyo; los pesos se usan en solo lectura.
+        """
+        replica = copy.copy(self)
+        replica.tokenizer = copy.deepcopy(self.tokenizer)
+        return replica
+
+    def clean_text(self, text, max_words=None):
+        """Limpia el texto igual que en entrenamiento (ver utils.text_cleaning.clean_text)"""
+        return clean_text(text, max_words=max_words)
+
+    def bucket_length(self, length):
+        """Redondea una longitud de secuencia al bucket inmediatamente superior"""
+        for bucket in self.length_buckets:
+            if length <= bucket:
+                return bucket
+        return self.max_length
+
+    def tokenize(self, texts):
+        """
+        Tokeniza uno o varios textos según el modo de padding configurado
+
+        En modo "dynamic" las secuencias se rellenan solo hasta la longitud real
+        más larga del lote, redondeada al bucket correspondiente, de modo que un
+        titular corto no paga un forward pass de 512 tokens.
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+
+        if self.padding_mode == "max_length":
+            return self.tokenizer(
+                texts,
                 truncation=True,
                 padding='max_length',
-                max_length=512,
+                max_length=self.max_length,
                 return_tensors="pt"
             )
-            
-            # Mover a device
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # Predecir
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                probabilities = torch.nn.functional.softmax(outputs.logits, dim=-1)
-                prob_fake = probabilities[0][1].item()
-                prob_true = probabilities[0][0].item()
-                
-                # 🎯 CALIBRACIÓN INTELIGENTE
-                # Si las probabilidades están muy cerca, ser más conservador
-                prob_diff = abs(prob_fake - prob_true)
-                
-                if prob_diff < 0.3:  # Decisión incierta
-                    adjusted_threshold = 0.85  # Ser muy conservador
-                    decision_confidence = "LOW"
-                elif prob_diff < 0.5:  # Decisión moderada
-                    adjusted_threshold = 0.75  # Moderadamente conservador
-                    decision_confidence = "MEDIUM"
-                else:  # Decisión clara
-                    adjusted_threshold = 0.65  # Usar umbral normal
-                    decision_confidence = "HIGH"
-                
-                # Aplicar umbral calibrado
-                if prob_fake >= adjusted_threshold:
-                    prediction = 1  # Fake
-                    confidence = prob_fake
-                else:
-                    prediction = 0  # True
-                    confidence = prob_true
-                
-                # Raw prediction (sin calibración)
-                raw_prediction = 1 if prob_fake > prob_true else 0
-            
-            return {
-                'prediction': 'Fake' if prediction == 1 else 'True',
-                'label': prediction,
-                'confidence': confidence,
-                'probability_fake': prob_fake,
-                'probability_true': prob_true,
-                'threshold_used': adjusted_threshold,
-                'raw_prediction': raw_prediction,
-                'decision_confidence': decision_confidence,
-                'probability_difference': prob_diff,
-                'calibration_applied': adjusted_threshold != threshold
-            }
+
+        encodings = self.tokenizer(texts, truncation=True, max_length=self.max_length)
+        return self.pad_sequences(encodings["input_ids"])
+
+    def pad_sequences(self, sequences):
+        """
+        Convierte listas de ids (ya con tokens especiales) en tensores rellenados
+
+        El relleno llega hasta el bucket de la secuencia más larga (modo "dynamic")
+        o hasta max_length (modo "max_length").
+        """
+        longest = max((len(ids) for ids in sequences), default=1)
+        target = self.max_length if self.padding_mode == "max_length" else self.bucket_length(longest)
+
+        input_ids = torch.full((len(sequences), target), self.tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(sequences), target), dtype=torch.long)
+        for row, ids in enumerate(sequences):
+            input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, :len(ids)] = 1
+
+        return {
+            'input_ids': input_ids,
+            'attention_mask': attention_mask,
+            'token_type_ids': torch.zeros_like(input_ids)
+        }
+    
+    def build_input(self, headline, text="", max_words=None):
+        """
+        Combina y limpia título y contenido (igual que en entrenamiento)
+
+        La limpieza se detiene al alcanzar `max_words` palabras por componente
+        (por defecto max_length): lo que excede ese punto se truncaría igualmente
+        al tokenizar, así que la entrada del modelo no cambia.
+        """
+        max_words = max_words or self.max_length
+        headline_clean = self.clean_text(headline, max_words=max_words)
+        text_clean = self.clean_text(text, max_words=max_words)
+        # Repetir headline para darle más peso (como en entrenamiento)
+        return f"{headline_clean} {headline_clean} {text_clean}"
+
+    def predict_probabilities(self, texts):
+        """
+        Ejecuta un único forward pass sobre un lote de textos ya combinados
+
+        Returns:
+            torch.Tensor: Probabilidades (N, 2) en float64, columnas [true, fake]
+        """
+        # Tokenizar (relleno dinámico por buckets o hasta max_length)
+        return self.forward(self.tokenize(texts))
+
+    def forward(self, inputs):
+        """Forward pass sobre entradas ya tokenizadas; devuelve probabilidades (N, 2) en float64"""
+        return self.forward_with_exit(inputs)[0]
+
+    def forward_with_exit(self, inputs):
+        """
+        Forward pass que además informa de la capa en la que salió cada fila
+
+        Returns:
+            tuple: (probabilidades (N, 2) en float64, lista de capas de salida o None sin salida temprana)
+        """
+        exit_layers = None
+        if self.early_exit_heads is not None:
+            logits, exit_layers = forward_with_early_exit(
+                self.model, self.early_exit_heads, inputs, self.early_exit_threshold
+            )
+        else:
+            # Predecir con el backend configurado (torch u onnx)
+            logits = self.backend(inputs)
+        probabilities = torch.nn.functional.softmax(logits, dim=-1)
+
+        # float64 para que la calibración opere con los mismos valores que float(prob)
+        return probabilities.cpu().double(), exit_layers
+
+    @classmethod
+    def calibrate_batch(cls, probabilities, thresholds=0.7, calibration_thresholds=None):
+        """
+        Aplica la calibración inteligente a un lote completo de probabilidades
+
+        Args:
+            probabilities: Tensor (N, 2) con columnas [prob_true, prob_fake]
+            thresholds: Umbral solicitado (uno para todo el lote o uno por elemento)
+            calibration_thresholds: Umbrales (LOW, MEDIUM, HIGH) alternativos a CALIBRATION_THRESHOLDS
+
+        Returns:
+            list: Un diccionario de resultado por fila
+        """
+        probabilities = torch.as_tensor(probabilities, dtype=torch.float64)
+        prob_true = probabilities[:, 0]
+        prob_fake = probabilities[:, 1]
+
+        # 🎯 CALIBRACIÓN INTELIGENTE
+        # Si las probabilidades están muy cerca, ser más conservador
+        prob_diff = (prob_fake - prob_true).abs()
+        # 0: decisión incierta (< 0.3), 1: moderada (< 0.5), 2: clara
+        bands = torch.bucketize(prob_diff, cls.CALIBRATION_BOUNDARIES, right=True)
+        if calibration_thresholds is None:
+            calibration_thresholds = cls.CALIBRATION_THRESHOLDS
+        adjusted_threshold = torch.as_tensor(calibration_thresholds, dtype=torch.float64)[bands]
+
+        # Aplicar umbral calibrado
+        prediction = prob_fake >= adjusted_threshold
+        confidence = torch.where(prediction, prob_fake, prob_true)
+
+        # Raw prediction (sin calibración)
+        raw_prediction = prob_fake > prob_true
+
+        if not isinstance(thresholds, (list, tuple)):
+            thresholds = [thresholds] * len(probabilities)
+
+        results = []
+        for row in zip(prediction.tolist(), confidence.tolist(), prob_fake.tolist(),
+                       prob_true.tolist(), adjusted_threshold.tolist(), raw_prediction.tolist(),
+                       bands.tolist(), prob_diff.tolist(), thresholds):
+            is_fake, conf, p_fake, p_true, threshold_used, raw_fake, band, diff, threshold = row
+            results.append({
+                'prediction': 'Fake' if is_fake else 'True',
+                'label': int(is_fake),
+                'confidence': conf,
+                'probability_fake': p_fake,
+                'probability_true': p_true,
+                'threshold_used': threshold_used,
+                'raw_prediction': int(raw_fake),
+                'decision_confidence': cls.CALIBRATION_LEVELS[band],
+                'probability_difference': diff,
+                'calibration_applied': threshold_used != threshold
+            })
+        return results
+
+    @classmethod
+    def calibrate(cls, prob_fake, prob_true, threshold=0.7):
+        """Aplica la calibración inteligente a una sola predicción"""
+        return cls.calibrate_batch([[prob_true, prob_fake]], threshold)[0]
+
+    @staticmethod
+    def error_result(error):
+        """Respuesta segura cuando la predicción falla"""
+        return {
+            'prediction': 'Error',
+            'label': -1,
+            'confidence': 0.0,
+            'probability_fake': 0.5,
+            'probability_true': 0.5,
+            'error': str(error)
+        }
+
+    def predict_many(self, requests):
+        """
+        Predice varias noticias con un solo forward pass
+
+        Args:
+            requests: Lista de tuplas (headline, text, threshold)
+
+        Returns:
+            list: Un diccionario de resultado por petición, en el mismo orden
+        """
+        if not requests:
+            return []
+        try:
+            with stage("clean_text"):
+                texts = [self.build_input(headline, text) for headline, text, _ in requests]
+            with stage("tokenization"):
+                inputs = self.tokenize(texts)
+            with stage("forward"):
+                probabilities, exit_layers = self.forward_with_exit(inputs)
+            with stage("calibration"):
+                results = self.calibrate_batch(probabilities, [threshold for _, _, threshold in requests])
+            if exit_layers is not None:
+                num_layers = self.model.config.num_hidden_layers
+                for result, exit_layer in zip(results, exit_layers):
+                    result.update({'exit_layer': exit_layer, 'num_layers': num_layers})
+            return results
         except Exception as e:
             print(f"❌ Error en predicción BERT: {str(e)}")
             # Fallback a respuesta segura
-            return {
-                'prediction': 'Error',
-                'label': -1,
-                'confidence': 0.0,
-                'probability_fake': 0.5,
-                'probability_true': 0.5,
-                'error': str(e)
-            }
+            return [self.error_result(e) for _ in requests]
+
+    def predict_batch(self, items, threshold=0.7, batch_size=None):
+        """
+        Predice una lista arbitrariamente larga de noticias
+
+        Los elementos se ordenan por longitud antes de agruparlos para minimizar
+        el relleno de cada lote, y los resultados se devuelven en el orden original.
+
+        Args:
+            items: Lista de diccionarios {'title', 'text'} o tuplas (title, text)
+            threshold: Umbral solicitado para todos los elementos
+            batch_size: Tamaño de cada forward pass (por defecto self.batch_size)
+
+        Returns:
+            list: Un diccionario de resultado por elemento, en el mismo orden
+        """
+        pairs, chunks = self.plan_batches(items, batch_size or self.batch_size)
+        results = [None] * len(pairs)
+        for chunk in chunks:
+            chunk_results = self.predict_many([(*pairs[i], threshold) for i in chunk])
+            for i, result in zip(chunk, chunk_results):
+                results[i] = result
+        return results
+
+    @staticmethod
+    def item_pairs(items):
+        """Convierte diccionarios {'title', 'text'} o tuplas (title, text) en tuplas de cadenas"""
+        pairs = []
+        for item in items:
+            if isinstance(item, dict):
+                pairs.append((item.get('title') or '', item.get('text') or ''))
+            else:
+                title, text = item
+                pairs.append((title or '', text or ''))
+        return pairs
+
+    @classmethod
+    def plan_batches(cls, items, batch_size):
+        """
+        Agrupa los elementos en lotes de longitud parecida
+
+        Returns:
+            tuple: (pares (title, text), lista de lotes con los índices originales)
+        """
+        pairs = cls.item_pairs(items)
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][0]) * 2 + len(pairs[i][1]))
+        return pairs, [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+    def predict_long(self, headline, text="", threshold=0.7, aggregation=None):
+        """
+        Predice documentos largos mediante ventanas deslizantes de tokens
+
+        El texto limpio se divide en ventanas de max_length tokens que se solapan
+        `long_doc_overlap` tokens; las ventanas se evalúan en lotes y sus
+        probabilidades se combinan en un único veredicto calibrado.
+
+        Args:
+            headline: Título del documento
+            text: Contenido completo del documento
+            threshold: Umbral solicitado (igual que en predict)
+            aggregation: "mean", "max" o "length_weighted" (por defecto long_doc_aggregation)
+
+        Returns:
+            dict: Resultado de predict más los campos del modo documento largo
+        """
+        aggregation = aggregation or self.long_doc_aggregation
+        try:
+            if aggregation not in self.LONG_DOC_AGGREGATIONS:
+                raise ValueError(f"Agregación no soportada: {aggregation}")
+
+            body_length = self.max_length - self.tokenizer.num_special_tokens_to_add(pair=False)
+            stride = max(1, body_length - self.long_doc_overlap)
+            # No tokenizar más allá de lo que cabe en las ventanas permitidas
+            token_budget = body_length + stride * (self.long_doc_max_windows - 1)
+
+            with stage("clean_text"):
+                combined = self.build_input(headline, text, max_words=token_budget + 1)
+            with stage("tokenization"):
+                token_ids = self.tokenizer(
+                    combined,
+                    add_special_tokens=False,
+                    truncation=True,
+                    max_length=token_budget + 1
+                )["input_ids"]
+            truncated = len(token_ids) > token_budget
+            token_ids = token_ids[:token_budget]
+
+            windows = []
+            for start in range(0, max(len(token_ids), 1), stride):
+                windows.append((start, token_ids[start:start + body_length]))
+                if start + body_length >= len(token_ids):
+                    break
+
+            probabilities = []
+            for batch_start in range(0, len(windows), self.long_doc_batch_size):
+                batch = windows[batch_start:batch_start + self.long_doc_batch_size]
+                with stage("tokenization"):
+                    inputs = self.pad_sequences(
+                        [self.tokenizer.build_inputs_with_special_tokens(ids) for _, ids in batch]
+                    )
+                with stage("forward"):
+                    probabilities.append(self.forward(inputs))
+            probabilities = torch.cat(probabilities)
+
+            prob_fake_windows = probabilities[:, 1]
+            if aggregation == "max":
+                prob_fake = prob_fake_windows.max()
+            elif aggregation == "length_weighted":
+                weights = torch.tensor([len(ids) for _, ids in windows], dtype=torch.float64)
+                prob_fake = (prob_fake_windows * weights).sum() / weights.sum()
+            else:
+                prob_fake = prob_fake_windows.mean()
+            prob_fake = prob_fake.item()
+
+            with stage("calibration"):
+                result = self.calibrate(prob_fake, 1.0 - prob_fake, threshold)
+            result.update({
+                'long_document': True,
+                'aggregation': aggregation,
+                'tokens_analyzed': len(token_ids),
+                'windows_used': len(windows),
+                'windows_truncated': truncated,
+                'window_scores': [
+                    {'start_token': start, 'tokens': len(ids), 'probability_fake': score}
+                    for (start, ids), score in zip(windows, prob_fake_windows.tolist())
+                ]
+            })
+            return result
+        except Exception as e:
+            print(f"❌ Error en predicción BERT (documento largo): {str(e)}")
+            return self.error_result(e)
+
+    def warmup(self, batch_size=1):
+        """
+        Ejecuta un forward pass por cada bucket de longitud
+
+        Inicializa asignadores de memoria y kernels para todas las formas de
+        tensor que verá el servicio, de modo que la primera petición real no
+        pague ese coste.
+
+        Returns:
+            int: Número de forward passes ejecutados
+        """
+        for bucket in self.length_buckets:
+            # Relleno hasta el bucket para reproducir la forma exacta del tensor
+            inputs = self.tokenizer(
+                ["verificar noticia"] * batch_size,
+                padding='max_length',
+                max_length=bucket,
+                truncation=True,
+                return_tensors="pt"
+            )
+            self.forward(inputs)
+        return len(self.length_buckets)
+
+    def predict(self, headline, text="", threshold=0.7):
+        """Predice si una noticia es falsa o verdadera con umbral ajustable"""
+        return self.predict_many([(headline, text, threshold)])[0]
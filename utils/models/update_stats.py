@@ -1,62 +1,385 @@
+"""
+Estadísticas de análisis (totales, diarios, fakes y aciertos)
+
+Los análisis se acumulan en memoria y se vuelcan cada STATS_FLUSH_EVERY eventos o
+STATS_FLUSH_INTERVAL_SECONDS segundos, y al salir del proceso. Con
+STATS_BACKEND="sqlite" cada evento va al almacén de utils.models.stats_store
+(agregados por hora y por día con retención). Con "json" se mantiene
+src/static/stats_analisis.json: cada volcado suma los deltas a lo que haya en
+disco bajo un bloqueo de archivo (fcntl) y reemplaza el archivo de forma atómica,
+así que varios workers pueden compartirlo sin perder incrementos.
+"""
+import atexit
 import os
 import json
+import sqlite3
+import tempfile
+import threading
+import time
 from datetime import datetime
 
+from config.settings import (
+    STATS_FLUSH_EVERY, STATS_FLUSH_INTERVAL_SECONDS, STATS_BACKEND, STATS_DB_PATH,
+    STATS_EVENTS_RETENTION_DAYS, STATS_HOURLY_RETENTION_DAYS, STATS_DAILY_RETENTION_DAYS
+)
+from utils.models.stats_store import StatsStore
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # Windows: solo se serializan los hilos del proceso
+    fcntl = None
+
 STATS_FILE = 'src/static/stats_analisis.json'
 
-def cargar_stats():
-    if not os.path.exists(STATS_FILE):
-        hoy = datetime.now().strftime('%Y-%m-%d')
-        stats = {
-            'total_analisis': 0,
-            'analisis_diarios': {hoy: 0},
-            'total_fakes': 0,
-            'fakes_diarios': {hoy: 0},
-            'total_correctos': 0,
-            'total_predicciones': 0
-        }
-        guardar_stats(stats)
-        return stats
+_file_lock = threading.Lock()
+
+
+def _stats_vacias():
+    hoy = datetime.now().strftime('%Y-%m-%d')
+    return {
+        'total_analisis': 0,
+        'analisis_diarios': {hoy: 0},
+        'total_fakes': 0,
+        'fakes_diarios': {hoy: 0},
+        'total_correctos': 0,
+        'total_predicciones': 0
+    }
+
+
+class _BloqueoArchivo:
+    """Bloqueo exclusivo entre hilos (threading) y procesos (fcntl sobre STATS_FILE + '.lock')"""
+
+    def __enter__(self):
+        _file_lock.acquire()
+        self.handle = None
+        if fcntl is not None:
+            try:
+                self.handle = open(STATS_FILE + '.lock', 'a')
+                fcntl.flock(self.handle, fcntl.LOCK_EX)
+            except OSError:
+                if self.handle is not None:
+                    self.handle.close()
+                self.handle = None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.handle is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+        _file_lock.release()
+        return False
+
+
+def _leer_archivo():
+    """Estadísticas en disco, o None si el archivo no existe o está corrupto"""
     try:
         with open(STATS_FILE, 'r', encoding='utf-8') as f:
             return json.load(f)
+    except FileNotFoundError:
+        return None
     except (json.JSONDecodeError, ValueError):
-        print("Archivo JSON corrupto o vacío. Creando uno nuevo.")
+        print("⚠️ Archivo de estadísticas corrupto o vacío. Creando uno nuevo.")
+        return None
+
+
+def _escribir_archivo(stats):
+    """Escribe en un temporal del mismo directorio y lo renombra (nunca deja el archivo a medias)"""
+    directory = os.path.dirname(STATS_FILE) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.stats_analisis.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, STATS_FILE)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class StatsAggregator:
+    """
+    Contadores en memoria con volcado por lotes al archivo o al almacén SQLite
+
+    `add` solo toma un bloqueo y suma; el volcado ocurre en el hilo que alcanza
+    `flush_every` eventos pendientes o en un hilo de fondo cada `flush_interval`
+    segundos.
+    """
+
+    def __init__(self, flush_every=50, flush_interval=5.0, store=None):
+        """
+        Args:
+            flush_every: Eventos pendientes que fuerzan un volcado
+            flush_interval: Segundos entre volcados del hilo de fondo (0 = sin hilo)
+            store: StatsStore de destino (None = archivo JSON)
+        """
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.store = store
+        self._lock = threading.Lock()
+        self._pending = self._empty_deltas()
+        self._events = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _empty_deltas():
+        return {'total': 0, 'fakes': 0, 'correctos': 0, 'diarios': {}, 'fakes_diarios': {}, 'eventos': []}
+
+    def add(self, eventos):
+        """Suma eventos de `evento()` a los contadores del día de hoy"""
         hoy = datetime.now().strftime('%Y-%m-%d')
-        stats = {
-            'total_analisis': 0,
-            'analisis_diarios': {hoy: 0},
-            'total_fakes': 0,
-            'fakes_diarios': {hoy: 0},
-            'total_correctos': 0,
-            'total_predicciones': 0
+        total = len(eventos)
+        fakes = sum(1 for e in eventos if e['verdict'] == 'fake')
+        correctos = sum(1 for e in eventos if e['correct'])
+        with self._lock:
+            pending = self._pending
+            pending['total'] += total
+            pending['fakes'] += fakes
+            pending['correctos'] += correctos
+            pending['diarios'][hoy] = pending['diarios'].get(hoy, 0) + total
+            if fakes:
+                pending['fakes_diarios'][hoy] = pending['fakes_diarios'].get(hoy, 0) + fakes
+            if self.store is not None:
+                pending['eventos'].extend(eventos)
+            self._events += total
+            flush_now = self._events >= self.flush_every
+            if self._thread is None and self.flush_interval > 0:
+                self._thread = threading.Thread(target=self._run, name="truthlens-stats-flush", daemon=True)
+                self._thread.start()
+        for callback in _listeners:
+            callback()
+        if flush_now:
+            self.flush()
+
+    def pending(self):
+        """Copia de los deltas aún no volcados"""
+        with self._lock:
+            return {
+                **self._pending,
+                'diarios': dict(self._pending['diarios']),
+                'fakes_diarios': dict(self._pending['fakes_diarios']),
+                'eventos': list(self._pending['eventos'])
+            }
+
+    def flush(self):
+        """Vuelca los deltas pendientes al archivo (si falla, se conservan para el siguiente intento)"""
+        with self._lock:
+            if not self._events:
+                return False
+            pending = self._pending
+            self._pending = self._empty_deltas()
+            self._events = 0
+
+        try:
+            if self.store is not None:
+                self.store.record(pending['eventos'])
+            else:
+                with _BloqueoArchivo():
+                    stats = _leer_archivo() or _stats_vacias()
+                    _aplicar(stats, pending)
+                    _escribir_archivo(stats)
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ No se pudieron guardar las estadísticas: {str(e)}")
+            with self._lock:
+                self._restore(pending)
+            return False
+
+        return True
+
+    def _restore(self, pending):
+        current = self._pending
+        for key in ('total', 'fakes', 'correctos'):
+            current[key] += pending[key]
+        for key in ('diarios', 'fakes_diarios'):
+            for day, count in pending[key].items():
+                current[key][day] = current[key].get(day, 0) + count
+        current['eventos'][:0] = pending['eventos']
+        self._events += pending['total']
+
+    def close(self):
+        """Detiene el hilo de fondo y vuelca lo pendiente"""
+        self._stop.set()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+
+def _aplicar(stats, deltas):
+    """Suma unos deltas de StatsAggregator a un diccionario de estadísticas"""
+    stats['total_analisis'] = stats.get('total_analisis', 0) + deltas['total']
+    stats['total_fakes'] = stats.get('total_fakes', 0) + deltas['fakes']
+    stats['total_predicciones'] = stats.get('total_predicciones', 0) + deltas['total']
+    stats['total_correctos'] = stats.get('total_correctos', 0) + deltas['correctos']
+    for key, delta_key in (('analisis_diarios', 'diarios'), ('fakes_diarios', 'fakes_diarios')):
+        diarios = stats.setdefault(key, {})
+        for day, count in deltas[delta_key].items():
+            diarios[day] = diarios.get(day, 0) + count
+    return stats
+
+
+_aggregator = None
+_aggregator_lock = threading.Lock()
+_listeners = []
+
+
+def suscribir_cambios(callback):
+    """Llama a `callback()` (sin argumentos, debe ser rápido) cada vez que se registran análisis"""
+    _listeners.append(callback)
+
+
+def get_stats_aggregator():
+    """StatsAggregator del proceso (creación perezosa)"""
+    global _aggregator
+
+    if _aggregator is None:
+        with _aggregator_lock:
+            if _aggregator is None:
+                _aggregator = StatsAggregator(STATS_FLUSH_EVERY, STATS_FLUSH_INTERVAL_SECONDS, get_stats_store())
+    return _aggregator
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_stats_store():
+    """StatsStore del proceso, o None con STATS_BACKEND="json" """
+    global _store
+
+    if STATS_BACKEND != "sqlite":
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = StatsStore(
+                    STATS_DB_PATH, STATS_EVENTS_RETENTION_DAYS, STATS_HOURLY_RETENTION_DAYS,
+                    STATS_DAILY_RETENTION_DAYS
+                )
+                # Primera vez con SQLite: conservar los contadores del archivo JSON anterior
+                legacy = _leer_archivo()
+                if legacy is not None and store.import_legacy(legacy):
+                    print(f"📥 Estadísticas de {STATS_FILE} importadas en {STATS_DB_PATH}")
+                _store = store
+    return _store
+
+
+def _flush_at_exit():
+    # Usa el agregador actual: tras un fork, el del padre ya no es el de este proceso
+    if _aggregator is not None:
+        _aggregator.close()
+
+atexit.register(_flush_at_exit)
+
+
+def _reset_after_fork():
+    """El hijo empieza sin deltas ni hilo propios (lo pendiente del padre lo vuelca el padre)"""
+    global _aggregator, _aggregator_lock, _file_lock, _store, _store_lock
+
+    # La conexión SQLite del padre no debe usarse en el hijo
+    _store = None
+    _aggregator = None
+    _listeners.clear()
+    _aggregator_lock = threading.Lock()
+    _store_lock = threading.Lock()
+    _file_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _stats_desde_store(store):
+    """Diccionario con el formato de stats_analisis.json a partir de los agregados diarios"""
+    stats = {**store.totals(), 'analisis_diarios': {}, 'fakes_diarios': {}}
+    stats['total_predicciones'] = stats['total_analisis']
+    for row in store.rollups("daily"):
+        stats['analisis_diarios'][row['bucket']] = row['count']
+        stats['fakes_diarios'][row['bucket']] = row['fakes']
+    return stats
+
+def cargar_stats():
+    """Estadísticas guardadas más los análisis de este proceso aún no volcados"""
+    store = get_stats_store()
+    if store is not None:
+        stats = _stats_desde_store(store)
+    else:
+        stats = _leer_archivo()
+        if stats is None:
+            with _BloqueoArchivo():
+                # Otro proceso pudo crearlo mientras tanto
+                stats = _leer_archivo()
+                if stats is None:
+                    stats = _stats_vacias()
+                    _escribir_archivo(stats)
+    if _aggregator is not None:
+        _aplicar(stats, _aggregator.pending())
+    return stats
+
+def resumen_stats(dia=None):
+    """
+    Totales y cifras de un día para /stats
+
+    Con SQLite lee solo los totales y el agregado diario del día pedido, así que
+    el coste no depende de cuántos días lleve funcionando el servicio.
+    """
+    dia = dia or datetime.now().strftime('%Y-%m-%d')
+    store = get_stats_store()
+    if store is None:
+        stats = cargar_stats()
+        return {
+            'total_analisis': stats.get('total_analisis', 0),
+            'analisis_hoy': stats.get('analisis_diarios', {}).get(dia, 0),
+            'total_fakes': stats.get('total_fakes', 0),
+            'fakes_hoy': stats.get('fakes_diarios', {}).get(dia, 0)
         }
-        guardar_stats(stats)
-        return stats
+
+    totals = store.totals()
+    day = store.day_summary(dia)
+    pending = _aggregator.pending() if _aggregator is not None else StatsAggregator._empty_deltas()
+    return {
+        'total_analisis': totals['total_analisis'] + pending['total'],
+        'analisis_hoy': day['analisis'] + pending['diarios'].get(dia, 0),
+        'total_fakes': totals['total_fakes'] + pending['fakes'],
+        'fakes_hoy': day['fakes'] + pending['fakes_diarios'].get(dia, 0)
+    }
 
 def guardar_stats(stats):
-    print("Guardando estadísticas:", stats)
-    with open(STATS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(stats, f, ensure_ascii=False, indent=2)
+    """Reemplaza el archivo de estadísticas de forma atómica"""
+    with _BloqueoArchivo():
+        _escribir_archivo(stats)
 
-def registrar_analisis(es_fake, es_correcto):
-    stats = cargar_stats()
-    hoy = datetime.now().strftime('%Y-%m-%d')
-    # Total análisis
-    stats['total_analisis'] += 1
-    # Análisis diarios
-    stats['analisis_diarios'][hoy] = stats['analisis_diarios'].get(hoy, 0) + 1
-    # Fakes
-    if es_fake:
-        print("fake detectado")
-        print("Incrementando total_fakes")
-        stats['total_fakes'] += 1
-        stats['fakes_diarios'][hoy] = stats['fakes_diarios'].get(hoy, 0) + 1
-    # Precisión
-    stats['total_predicciones'] += 1
-    if es_correcto:
-        print("predicción correcta")
-        print("Incrementando total_correctos")
-        stats['total_correctos'] += 1
-    guardar_stats(stats)
+def evento(es_fake, es_correcto, route="desconocida", confidence=None, latency_ms=None, input_chars=None):
+    """Evento de análisis para StatsAggregator.add y StatsStore.record"""
+    return {
+        'ts': time.time(),
+        'route': route,
+        'verdict': 'fake' if es_fake else 'real',
+        'correct': bool(es_correcto),
+        'confidence': confidence,
+        'latency_ms': latency_ms,
+        'input_chars': input_chars,
+    }
+
+def registrar_analisis(es_fake, es_correcto, route="desconocida", confidence=None, latency_ms=None,
+                       input_chars=None):
+    get_stats_aggregator().add([evento(es_fake, es_correcto, route, confidence, latency_ms, input_chars)])
+
+def registrar_analisis_lote(resultados, route="batch", latency_ms=None):
+    """
+    Registra varios análisis de una vez
 
+    Args:
+        resultados: Iterable de tuplas (es_fake, es_correcto[, confianza[, caracteres de entrada]])
+        route: Origen de los análisis
+        latency_ms: Latencia atribuida a cada análisis (p. ej. la de la llamada repartida entre elementos)
+    """
+    eventos = []
+    for es_fake, es_correcto, *detalles in resultados:
+        confidence, input_chars = (list(detalles) + [None, None])[:2]
+        eventos.append(evento(es_fake, es_correcto, route, confidence, latency_ms, input_chars))
+    if eventos:
+        get_stats_aggregator().add(eventos)
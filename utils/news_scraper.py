@@ -10,47 +10,136 @@ import json
 from datetime import datetime
 import argparse
 
+from utils.async_fetcher import USER_AGENT, fetch_result
+
+# Subir al cambiar la extracción: las entradas de la caché de descargas se re-parsean desde su cuerpo
+PARSER_VERSION = 1
+
 class NewsExtractor:
-    def __init__(self):
+    def __init__(self, fetcher=None, cache=None):
+        """
+        Args:
+            fetcher: AsyncFetcher compartido (utils.async_fetcher); sin él se descarga con requests
+            cache: FetchCache (utils.fetch_cache) para no volver a descargar ni parsear las mismas URLs
+        """
+        self.fetcher = fetcher
+        self.cache = cache
         self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
-    
+        self.session.headers.update({'User-Agent': USER_AGENT})
+
+    def fetch(self, url, headers=None):
+        """Descarga una página; devuelve un diccionario de fetch_result"""
+        if self.fetcher is not None:
+            return self.fetcher.fetch(url, headers)
+        try:
+            response = self.session.get(url, headers=headers, timeout=10)
+            if response.status_code >= 400:
+                return fetch_result(url, response.url, response.status_code,
+                                    error=f"HTTP {response.status_code} {response.reason or ''}".strip())
+            return fetch_result(url, response.url, response.status_code, response.content, dict(response.headers))
+        except requests.RequestException as e:
+            return fetch_result(url, error=str(e))
+
+    def fetch_many(self, urls, headers=None):
+        """Descarga varias páginas (a la vez con el fetcher asíncrono, una a una con requests)"""
+        if self.fetcher is not None:
+            return self.fetcher.fetch_many(urls, headers)
+        return [self.fetch(url, extra) for url, extra in zip(urls, headers or [None] * len(urls))]
+
+    def parse(self, html, url, final_url=None):
+        """
+        Extrae los datos del artículo de un HTML ya descargado
+
+        Args:
+            html: Contenido de la página
+            url: URL pedida (se devuelve tal cual en 'url')
+            final_url: URL tras las redirecciones (base de las rutas relativas de las imágenes)
+        """
+        final_url = final_url or url
+        # Parsear el HTML
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Extraer información
+        return {
+            'url': url,
+            'final_url': final_url,
+            'title': self._extract_title(soup),
+            'content': self._extract_content(soup),
+            'author': self._extract_author(soup),
+            'publish_date': self._extract_date(soup),
+            'description': self._extract_description(soup),
+            'keywords': self._extract_keywords(soup),
+            'images': self._extract_images(soup, final_url),
+            'extracted_at': datetime.now().isoformat()
+        }
+
     def extract_content(self, url):
         """
         Extrae el contenido principal de una página de noticias
         """
+        article_data, error = self.extract_many([url])[0]
+        if error:
+            print(f"Error al extraer {url}: {error}")
+        return article_data
+
+    def extract_many(self, urls):
+        """
+        Descarga y extrae varias noticias
+
+        Con caché, las URLs con entrada fresca no se descargan ni se parsean, y
+        las caducadas se piden con GET condicional (un 304 reutiliza la entrada).
+        Si esa revalidación falla por red o por un 5xx, se devuelve la copia
+        caducada con 'stale': True.
+
+        Returns:
+            list: Tuplas (article_data o None, mensaje de error o None), en el mismo orden
+        """
+        results = [None] * len(urls)
+        pending, entries, headers = [], [], []
+        for i, url in enumerate(urls):
+            entry = self.cache.lookup(url) if self.cache is not None else None
+            if entry is not None and entry['fresh']:
+                results[i] = self._from_cache(entry, url)
+                continue
+            pending.append(i)
+            entries.append(entry)
+            headers.append(self.cache.conditional_headers(entry) if entry is not None else None)
+
+        pages = self.fetch_many([urls[i] for i in pending], headers) if pending else []
+        for i, entry, page in zip(pending, entries, pages):
+            if page['error'] and entry is not None and (page['status'] is None or page['status'] >= 500):
+                # Revalidación fallida (red o error del servidor): mejor la copia caducada que nada
+                self.cache.served_stale()
+                article_data, error = self._from_cache(entry, urls[i])
+                results[i] = ({**article_data, 'stale': True} if article_data else None, error)
+            elif page['error']:
+                results[i] = (None, f"Error al acceder a la URL: {page['error']}")
+            elif page['status'] == 304 and entry is not None:
+                self.cache.revalidated(entry['key'], page['headers'])
+                results[i] = self._from_cache(entry, urls[i])
+            else:
+                try:
+                    article_data = self.parse(page['content'], urls[i], page['final_url'])
+                except Exception as e:
+                    results[i] = (None, f"Error al procesar la página: {e}")
+                    continue
+                if self.cache is not None:
+                    self.cache.store(urls[i], page, article_data, PARSER_VERSION)
+                results[i] = (article_data, None)
+        return results
+
+    def _from_cache(self, entry, url):
+        """article_data de una entrada de caché para `url` (re-parseado del cuerpo si el extractor cambió)"""
+        if entry['parser_version'] == PARSER_VERSION:
+            # La clave es canónica: 'url' debe ser la que pidió este llamador, no la del primero
+            return {**entry['article'], 'url': url}, None
         try:
-            # Obtener la página
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            # Parsear el HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extraer información
-            article_data = {
-                'url': url,
-                'title': self._extract_title(soup),
-                'content': self._extract_content(soup),
-                'author': self._extract_author(soup),
-                'publish_date': self._extract_date(soup),
-                'description': self._extract_description(soup),
-                'keywords': self._extract_keywords(soup),
-                'images': self._extract_images(soup, url),
-                'extracted_at': datetime.now().isoformat()
-            }
-            
-            return article_data
-            
-        except requests.RequestException as e:
-            print(f"Error al acceder a la URL: {e}")
-            return None
+            article_data = self.parse(self.cache.body(entry['key']) or b"", url, entry['final_url'])
         except Exception as e:
-            print(f"Error al procesar la página: {e}")
-            return None
-    
+            return None, f"Error al procesar la página: {e}"
+        self.cache.update_article(entry['key'], article_data, PARSER_VERSION)
+        return article_data, None
+
     def _extract_title(self, soup):
         """Extrae el título del artículo"""
         # Buscar en meta tags primero
@@ -0,0 +1,54 @@
+"""
+Métricas de memoria del proceso actual (RSS, PSS y páginas compartidas)
+"""
+import sys
+
+try:
+    import resource  # type: ignore
+except Exception:  # Windows
+    resource = None
+
+
+def memory_usage_mb():
+    """
+    Uso de memoria del proceso en MB
+
+    En Linux se lee /proc/self/smaps_rollup, que distingue páginas compartidas
+    (p. ej. pesos heredados copy-on-write de un proceso maestro) de las privadas.
+    En otros sistemas solo se informa el pico de RSS.
+
+    Returns:
+        dict: rss, pss, shared, private y peak_rss (los no disponibles se omiten)
+    """
+    usage = {}
+    try:
+        with open('/proc/self/smaps_rollup', 'r', encoding='utf-8') as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) / 1024  # kB → MB
+        usage['rss'] = fields.get('Rss', 0.0)
+        usage['pss'] = fields.get('Pss', 0.0)
+        usage['shared'] = fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0)
+        usage['private'] = fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0)
+    except OSError:
+        pass
+
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss está en bytes en macOS y en kB en Linux
+        usage['peak_rss'] = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+    return usage
+
+
+def format_memory(usage=None):
+    """Texto corto para logs: 'RSS 812 MB (compartido 640 MB, privado 172 MB)'"""
+    usage = usage if usage is not None else memory_usage_mb()
+    if 'rss' in usage:
+        return (f"RSS {usage['rss']:.0f} MB (compartido {usage['shared']:.0f} MB, "
+                f"privado {usage['private']:.0f} MB, PSS {usage['pss']:.0f} MB)")
+    if 'peak_rss' in usage:
+        return f"pico RSS {usage['peak_rss']:.0f} MB"
+    return "memoria no disponible"
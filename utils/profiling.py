@@ -0,0 +1,234 @@
+"""
+Perfilador por muestreo para la app Flask (opcional, pensado para producción)
+
+Un hilo de fondo lee periódicamente las pilas de los hilos que atienden una
+petición perfilada (sys._current_frames) y cuenta cuántas veces aparece cada
+pila. Mientras haya peticiones perfiladas también se muestrean los hilos de
+trabajo del servicio (micro-lotes y trabajos asíncronos), que es donde corre el
+forward pass de TruthLensBERT. Las pilas se exportan en formato colapsado
+(flamegraph.pl, speedscope, inferno) o como archivo de speedscope.
+
+Con PROFILING_ENABLED=False no se registra ningún hook ni se crea el hilo.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from config.settings import (
+    PROFILING_ENABLED, PROFILING_SAMPLE_RATE, PROFILING_INTERVAL_MS, PROFILING_MAX_WINDOW_SECONDS,
+    PROFILING_MAX_STACKS
+)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Hilos de fondo propios (ver MicroBatchScheduler y JobManager)
+WORKER_THREAD_PREFIX = "truthlens-"
+
+
+class SamplingProfiler:
+    """
+    Muestrea las pilas de las peticiones elegidas y las agrega por ruta
+
+    Una petición se perfila con probabilidad `sample_rate`, o siempre mientras
+    esté abierta una ventana iniciada con `start_window`.
+    """
+
+    def __init__(self, interval_ms=5, sample_rate=0.0, max_window_seconds=300, max_stacks=20000):
+        self.interval = interval_ms / 1000.0
+        self.sample_rate = sample_rate
+        self.max_window_seconds = max_window_seconds
+        self.max_stacks = max_stacks
+
+        self._lock = threading.Lock()
+        self._active = {}  # thread id -> ruta
+        self._wakeup = threading.Event()
+        self._stacks = Counter()
+        self._labels = {}  # code object -> ((nombre, archivo, línea), es del proyecto)
+        self._samples = 0
+        self._profiled_requests = 0
+        self._dropped = 0
+        self._window_until = 0.0
+        self._started_at = time.time()
+        self._thread = None
+
+    def should_profile(self):
+        """Decide si perfilar la petición actual (ventana abierta o muestra aleatoria)"""
+        if self._window_until and time.monotonic() < self._window_until:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def begin(self, route):
+        """Empieza a muestrear el hilo actual con la ruta como raíz de sus pilas"""
+        with self._lock:
+            self._active[threading.get_ident()] = route
+            self._profiled_requests += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="truthlens-profiler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def end(self):
+        """Deja de muestrear el hilo actual"""
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+    def start_window(self, seconds):
+        """Perfila todas las peticiones durante `seconds` (acotado a max_window_seconds)"""
+        seconds = max(0.0, min(float(seconds), self.max_window_seconds))
+        self._window_until = time.monotonic() + seconds
+        return seconds
+
+    def reset(self):
+        """Descarta las pilas acumuladas"""
+        with self._lock:
+            self._stacks.clear()
+            self._samples = 0
+            self._profiled_requests = 0
+            self._dropped = 0
+            self._started_at = time.time()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "interval_ms": self.interval * 1000,
+                "sample_rate": self.sample_rate,
+                "window_remaining_seconds": max(0.0, self._window_until - time.monotonic()),
+                "profiled_requests": self._profiled_requests,
+                "active_requests": len(self._active),
+                "samples": self._samples,
+                "distinct_stacks": len(self._stacks),
+                "dropped_samples": self._dropped,
+                "since": self._started_at,
+            }
+
+    def _label(self, code):
+        cached = self._labels.get(code)
+        if cached is None:
+            filename = code.co_filename
+            in_project = filename.startswith(PROJECT_ROOT + os.sep)
+            if in_project:
+                filename = os.path.relpath(filename, PROJECT_ROOT)
+            cached = self._labels[code] = ((code.co_name, filename, code.co_firstlineno), in_project)
+        return cached
+
+    def _stack(self, frame):
+        """Pila de la raíz a la hoja, sin los marcos de servidor por encima del primer marco del proyecto"""
+        labels = []
+        outermost_project = None
+        while frame is not None:
+            label, in_project = self._label(frame.f_code)
+            labels.append(label)
+            if in_project:
+                outermost_project = len(labels)
+            frame = frame.f_back
+        if outermost_project is not None:
+            labels = labels[:outermost_project]
+        labels.reverse()
+        return tuple(labels)
+
+    def _sample(self):
+        with self._lock:
+            if not self._active:
+                return False
+            targets = dict(self._active)
+
+        for thread in threading.enumerate():
+            if thread.name.startswith(WORKER_THREAD_PREFIX) and thread.name != "truthlens-profiler":
+                # truthlens-batcher-0 -> [truthlens-batcher], truthlens-job-url_1 -> [truthlens-job-url]
+                targets.setdefault(thread.ident, f"[{thread.name.rstrip('0123456789').rstrip('-_')}]")
+
+        frames = sys._current_frames()
+        with self._lock:
+            for ident, root in targets.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                key = (root,) + self._stack(frame)
+                if key not in self._stacks and len(self._stacks) >= self.max_stacks:
+                    self._dropped += 1
+                    continue
+                self._stacks[key] += 1
+                self._samples += 1
+        return True
+
+    def _run(self):
+        while True:
+            if not self._sample():
+                # Sin peticiones perfiladas: dormir hasta la próxima
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _frame_name(label):
+        name, filename, line = label
+        return f"{name} ({filename}:{line})"
+
+    def export_collapsed(self):
+        """Formato colapsado: 'ruta;marco;marco N' por línea"""
+        with self._lock:
+            stacks = list(self._stacks.items())
+        lines = []
+        for (root, *frames), count in sorted(stacks):
+            names = [root] + [self._frame_name(label).replace(";", ":") for label in frames]
+            lines.append(f"{';'.join(names)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def export_speedscope(self):
+        """Archivo de speedscope con un perfil por ruta (pesos en milisegundos)"""
+        with self._lock:
+            stacks = list(self._stacks.items())
+
+        frames = []
+        frame_index = {}
+        profiles = {}
+        for (root, *labels), count in sorted(stacks):
+            indices = []
+            for label in labels:
+                if label not in frame_index:
+                    frame_index[label] = len(frames)
+                    name, filename, line = label
+                    frames.append({"name": name, "file": filename, "line": line})
+                indices.append(frame_index[label])
+            profile = profiles.setdefault(root, {"samples": [], "weights": []})
+            profile["samples"].append(indices)
+            profile["weights"].append(count * self.interval * 1000)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "exporter": "truthlens-profiler",
+            "name": "TruthLens",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": root,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": sum(profile["weights"]),
+                    "samples": profile["samples"],
+                    "weights": profile["weights"],
+                }
+                for root, profile in profiles.items()
+            ],
+        }
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    """SamplingProfiler del proceso (None si PROFILING_ENABLED es False)"""
+    global _profiler
+
+    if PROFILING_ENABLED and _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = SamplingProfiler(
+                    PROFILING_INTERVAL_MS, PROFILING_SAMPLE_RATE, PROFILING_MAX_WINDOW_SECONDS, PROFILING_MAX_STACKS
+                )
+    return _profiler
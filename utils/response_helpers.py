@@ -53,6 +53,11 @@ def create_debug_info(result, title="", text="", extraction_method="Manual", fil
         "has_content": bool(text),
     }
     
+    # Caché, cascada y salida temprana: solo si la función correspondiente está activa
+    for field in ('cache_hit', 'decided_by', 'exit_layer'):
+        if field in result:
+            debug_data[field] = result[field]
+    
     # Agregar file_info solo si existe
     if file_info:
         debug_data["file_info"] = file_info
@@ -83,6 +88,15 @@ def create_standard_response(result, **response_fields):
         "model_info": MODEL_INFO,
     }
     
+    # Etapa de la cascada que decidió (solo si la cascada está activa)
+    if 'decided_by' in result:
+        base_response["decided_by"] = result['decided_by']
+    
+    # Capa en la que terminó el forward pass (solo si la salida temprana está activa)
+    if 'exit_layer' in result:
+        base_response["exit_layer"] = result['exit_layer']
+        base_response["num_layers"] = result['num_layers']
+    
     # Agregar campos adicionales
     base_response.update(response_fields)
     
@@ -100,3 +114,19 @@ def create_error_response(error_message, status_code=500):
         tuple: (dict, int) para jsonify
     """
     return {"error": error_message}, status_code
+
+def create_overload_response(error):
+    """
+    Respuesta 503 para peticiones rechazadas por el control de admisión
+    
+    Args:
+        error: Excepción Overloaded con el Retry-After sugerido
+    
+    Returns:
+        tuple: (dict, int, dict) para jsonify, con la cabecera Retry-After
+    """
+    return (
+        {"error": f"Servicio saturado: {str(error)}", "retry_after": error.retry_after},
+        503,
+        {"Retry-After": str(error.retry_after)}
+    )
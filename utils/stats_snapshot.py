@@ -0,0 +1,111 @@
+"""
+Instantánea en memoria de /stats con ETag y notificación de cambios para Server-Sent Events
+
+Un hilo de fondo recalcula el resumen cada STATS_SNAPSHOT_INTERVAL_SECONDS (para
+ver lo que vuelcan otros workers y el cambio de día) o en cuanto este proceso
+registra un análisis. Las peticiones a /stats solo leen la instantánea, y los
+clientes de /stats/stream esperan en una condición hasta que cambia la versión.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from config.settings import STATS_SNAPSHOT_INTERVAL_SECONDS
+from utils.models.update_stats import resumen_stats, suscribir_cambios
+
+MIN_REFRESH_GAP_SECONDS = 0.25
+
+
+class StatsSnapshot:
+    """Último resumen de estadísticas serializado, con versión y ETag"""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._condition = threading.Condition()
+        self._start_lock = threading.Lock()
+        self._changed = threading.Event()
+        self._body = None
+        self._etag = None
+        self._version = 0
+        self._thread = None
+
+    def _refresh(self):
+        body = json.dumps(resumen_stats(), sort_keys=True, separators=(",", ":"))
+        with self._condition:
+            if body == self._body:
+                return
+            self._body = body
+            self._etag = hashlib.sha1(body.encode("utf-8")).hexdigest()
+            self._version += 1
+            self._condition.notify_all()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    # Primera lectura síncrona para que la primera petición no espere al hilo
+                    self._refresh()
+                    self._thread = threading.Thread(target=self._run, name="truthlens-stats-snapshot", daemon=True)
+                    self._thread.start()
+
+    def invalidate(self):
+        """Pide recalcular cuanto antes (este proceso acaba de registrar análisis)"""
+        self._changed.set()
+
+    def get(self):
+        """(cuerpo JSON, ETag, versión) actuales"""
+        self._ensure_started()
+        with self._condition:
+            return self._body, self._etag, self._version
+
+    def wait_for_change(self, version, timeout):
+        """
+        Espera hasta que la versión sea distinta de `version` o venza `timeout`
+
+        Returns:
+            tuple: (cuerpo JSON, ETag, versión), igual que get()
+        """
+        self._ensure_started()
+        with self._condition:
+            self._condition.wait_for(lambda: self._version != version, timeout)
+            return self._body, self._etag, self._version
+
+    def _run(self):
+        while True:
+            self._changed.wait(self.interval)
+            self._changed.clear()
+            try:
+                self._refresh()
+            except Exception as e:
+                print(f"⚠️ No se pudo actualizar la instantánea de estadísticas: {str(e)}")
+            # Con tráfico alto, como mucho unas pocas actualizaciones por segundo
+            time.sleep(min(MIN_REFRESH_GAP_SECONDS, self.interval))
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_stats_snapshot():
+    """StatsSnapshot del proceso (creación perezosa; se suscribe a los análisis registrados)"""
+    global _snapshot
+
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                snapshot = StatsSnapshot(STATS_SNAPSHOT_INTERVAL_SECONDS)
+                suscribir_cambios(snapshot.invalidate)
+                _snapshot = snapshot
+    return _snapshot
+
+
+def _reset_after_fork():
+    global _snapshot, _snapshot_lock
+
+    _snapshot = None
+    _snapshot_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,55 @@
+"""
+Normalización de texto para TruthLensBERT (misma limpieza que en entrenamiento)
+"""
+import re
+
+# Patrones precompilados de la limpieza de entrenamiento
+_URL_PATTERN = re.compile(r'http\S+|www\S+|https\S+')
+_MENTION_PATTERN = re.compile(r'@\w+|#\w+')
+# Fusiona "no-letra → espacio" y "colapsar espacios": toda racha de no-letras queda en un único espacio
+_NON_LETTER_RUN_PATTERN = re.compile(r'[^a-zA-ZáéíóúÁÉÍÓÚñÑüÜ]+')
+_WHITESPACE_PATTERN = re.compile(r'\s')
+
+# Caracteres de entrada examinados por palabra solicitada en la primera pasada acotada
+_CHARS_PER_WORD_HINT = 8
+
+
+def _clean_full(text):
+    text = _URL_PATTERN.sub('', text)
+    text = _MENTION_PATTERN.sub('', text)
+    return _NON_LETTER_RUN_PATTERN.sub(' ', text).strip()
+
+
+def clean_text(text, max_words=None):
+    """
+    Limpia el texto igual que en entrenamiento
+
+    Con `max_words` solo se limpia un prefijo de la entrada, cortado en un espacio
+    en blanco, que produzca al menos esa cantidad de palabras. Como cada palabra
+    genera al menos un token, pasar el presupuesto de tokens del modelo garantiza
+    la misma entrada truncada que limpiando el texto completo.
+
+    Args:
+        text: Texto original
+        max_words: Palabras mínimas a producir antes de detenerse (None = texto completo)
+
+    Returns:
+        str: Texto limpio (prefijo por palabras completas del resultado completo si se acota)
+    """
+    if not text:
+        return ""
+
+    if max_words is not None:
+        scan = max(max_words, 1) * _CHARS_PER_WORD_HINT
+        while scan < len(text):
+            # Cortar justo antes de un espacio: ningún patrón lo cruza, así que el
+            # prefijo limpio coincide con el inicio del resultado completo
+            match = _WHITESPACE_PATTERN.search(text, scan)
+            if match is None:
+                break
+            cleaned = _clean_full(text[:match.start()])
+            if cleaned and cleaned.count(' ') + 1 >= max_words:
+                return cleaned
+            scan = match.start() * 2
+
+    return _clean_full(text)